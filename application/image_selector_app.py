@@ -1,7 +1,9 @@
+import functools
 import logging
 import os
 
 from domain.file_manager import file_manager
+from domain.sort_keys import SortKeys, DEFAULT_SORT_MODE
 from utils.config_loader import app_config
 from utils.exceptions import FolderNotFoundError, NoImagePairsFoundError, InvalidIndexError, ImageSelectorError, \
     ExternalToolError
@@ -11,100 +13,176 @@ logger = logging.getLogger(__name__)
 class ImageSelectorApp:
     def __init__(self):
         logger.info("ImageSelectorApp initialized.")
+        # _image_pairs 按扫描顺序保存，下标即图片对的稳定编号（index），不随排序变化；
+        # _order 为显示顺序（稳定编号列表），_positions 为其反向映射（稳定编号 -> 显示位置）。
         self._image_pairs = []
+        self._order = []
+        self._positions = []
         self._current_index = -1
         self._jpg_folder = ""
         self._raw_folder = ""
         self._is_loaded = False
-        self._sort_order = "time_filename" # Default sort order
+        self._sort_order = DEFAULT_SORT_MODE # Default sort order
+        self._sort_keys = None # 每次扫描后预先计算的排序键
+        self._is_viewer_mode = False
+        self._load_generation = 0
+        self._navigation_direction = 1 # 最近一次上一张/下一张的方向，预取沿该方向多取几张
+
+    def load_folders(self, jpg_folder_path, raw_folder_path, initial_index=None, sort_order=None, rescan=False):
+        image_pairs_info = []
+        status = None
+        for message in self.iter_load_folders(jpg_folder_path, raw_folder_path, initial_index=initial_index,
+                                              sort_order=sort_order, rescan=rescan):
+            if message["type"] == "pairs":
+                image_pairs_info.extend(message["pairs"])
+            elif message["type"] == "done":
+                status = message
+
+        if status is None:
+            raise ImageSelectorError("加载已被新的加载请求取代。")
+
+        # 非流式响应直接按显示顺序返回图片对信息
+        status.pop("type", None)
+        order = status.pop("order")
+        status["image_pairs_info"] = [image_pairs_info[i] for i in order]
+        return status
 
-    def load_folders(self, jpg_folder_path, raw_folder_path, initial_index=None, sort_order=None):
-        logger.info(f"应用层尝试加载文件夹: JPG='{jpg_folder_path}', RAW='{raw_folder_path}', Initial Index={initial_index}, Sort Order={sort_order}")
+    def iter_load_folders(self, jpg_folder_path, raw_folder_path, initial_index=None, sort_order=None, rescan=False,
+                          preview_limit=None, include_order=True):
+        """
+        流式加载文件夹：扫描过程中逐批产出 {"type": "pairs", "pairs": [...]}，
+        全部扫描完成后产出 {"type": "done", **状态, "order": 显示顺序}。
+        每批中的 index 为图片对的稳定编号，产出后即可用于请求缩略图。
+        preview_limit 不为 None 时，只有前 preview_limit 个图片对随流返回，其余批次只产出
+        {"type": "progress", "total_images": 已找到数量}，完整列表通过 get_pairs_window 分页获取。
+        include_order=False 时 done 消息不附带完整的显示顺序。
+        """
+        logger.info(f"应用层尝试加载文件夹: JPG='{jpg_folder_path}', RAW='{raw_folder_path}', Initial Index={initial_index}, Sort Order={sort_order}, Rescan={rescan}")
 
         if not jpg_folder_path:
              logger.warning("尝试加载文件夹，但 JPG 路径为空。")
              raise FolderNotFoundError("JPG 文件夹路径不能为空。")
 
-        try:
-            # file_manager.find_image_pairs 已经在 domain 层实现了按时间+文件名排序
-            # 如果未来需要其他排序方式，可以在这里根据 sort_order 参数调用不同的排序逻辑
-            found_pairs = file_manager.find_image_pairs(jpg_folder_path, raw_folder_path)
-
-            self._image_pairs = found_pairs
+        self._load_generation += 1
+        generation = self._load_generation
+        self._reset_pairs()
+        self._jpg_folder = jpg_folder_path
+        self._raw_folder = raw_folder_path
+        self._is_viewer_mode = not bool(raw_folder_path) # 根据 raw_folder_path 是否为空设置看图模式
 
-            # Set sort order
-            self._sort_order = sort_order if sort_order is not None else "time_filename" # Use provided sort_order or default
-
-            # Set initial index
-            if initial_index is not None and 0 <= initial_index < len(self._image_pairs):
-                self._current_index = initial_index
+        try:
+            # 目录未变化时 iter_image_pairs 直接复用持久化索引，rescan=True 时强制完整扫描
+            for batch in file_manager.iter_image_pairs(jpg_folder_path, raw_folder_path, use_index=not rescan):
+                if generation != self._load_generation:
+                    logger.info("加载已被新的加载请求取代，停止产出。")
+                    return
+                start = len(self._image_pairs)
+                self._image_pairs.extend(batch)
+                if preview_limit is not None and start >= preview_limit:
+                    yield {"type": "progress", "total_images": len(self._image_pairs)}
+                    continue
+                yield {
+                    "type": "pairs",
+                    "pairs": [
+                        self._pair_info(start + offset, pair) # RAW 编辑状态已在扫描（或索引）中确定
+                        for offset, pair in enumerate(batch)
+                        if preview_limit is None or start + offset < preview_limit
+                    ],
+                    "total_images": len(self._image_pairs),
+                }
+
+            if generation != self._load_generation:
+                return
+
+            # 按排序方式确定显示顺序，图片对本身保持扫描顺序；排序键只在此计算一次
+            self._sort_order = SortKeys.normalize_mode(sort_order) # Use provided sort_order or default
+            self._sort_keys = SortKeys(self._image_pairs)
+            self._apply_sort_order()
+
+            # Set initial index（initial_index 为显示顺序中的位置）
+            if initial_index is not None and 0 <= initial_index < len(self._order):
+                self._current_index = self._order[initial_index]
                 logger.info(f"应用层根据历史记录设置初始索引为: {self._current_index}")
             else:
-                self._current_index = 0 if self._image_pairs else -1
+                self._current_index = self._order[0] if self._order else -1
                 if initial_index is not None: # Log if initial_index was provided but invalid
                      logger.warning(f"提供的初始索引 {initial_index} 无效，设置为默认索引 {self._current_index}。")
                 else:
                      logger.info(f"未提供初始索引，设置为默认索引 {self._current_index}。")
 
-
-            # 仅在加载时获取当前选中图片的元数据
-            if self._image_pairs and self._current_index != -1:
-                current_image_path = self._image_pairs[self._current_index]['jpg_path']
-                metadata = file_manager.get_image_metadata(current_image_path)
-                self._image_pairs[self._current_index]['metadata'] = metadata
-                logger.debug(f"加载时获取了索引 {self._current_index} 的图片元数据。")
-            elif self._image_pairs: # If there are images but index is -1 (shouldn't happen with current logic but for safety)
-                 # Ensure metadata is initialized for all pairs if no initial index is set
-                 for pair in self._image_pairs:
-                      pair['metadata'] = {}
-            else:
-                # 如果没有图片，确保元数据为空
-                pass # No images, no metadata to initialize
-
-            self._jpg_folder = jpg_folder_path
-            self._raw_folder = raw_folder_path
             self._is_loaded = len(self._image_pairs) > 0
-            self._is_viewer_mode = not bool(raw_folder_path) # 根据 raw_folder_path 是否为空设置看图模式
 
-            logger.info(f"应用层加载文件夹成功，找到 {len(self._image_pairs)} 对图片。当前索引设置为 {self._current_index}。看图模式: {self._is_viewer_mode}。排序方式: {self._sort_order}")
+            # 后台进程池从当前图片开始向两侧预生成缩略图，线程池从当前图片开始分批读取尚未缓存的 EXIF 元数据
+            if self._is_loaded:
+                file_manager.start_thumbnail_pregeneration(self._image_pairs, self._order,
+                                                           self._positions[self._current_index])
+                file_manager.start_metadata_loading(self._image_pairs, self._order,
+                                                    self._positions[self._current_index])
+                # 初始图片及其相邻图片的解码帧保留在内存中，并在后台预取相邻图片的预览图
+                self._navigation_direction = 1
+                self._prefetch_neighbours()
 
-            frontend_pairs_info = []
-            for i, pair in enumerate(self._image_pairs):
-                is_modified = False
-                if pair['raw_path']:
-                    is_modified = file_manager.check_raw_modified_status(pair['raw_path'])
-                frontend_pairs_info.append({
-                    "base_name": pair['base_name'],
-                    "index": i,
-                    "is_modified": is_modified, # 添加 is_modified 状态
-                })
+            logger.info(f"应用层加载文件夹成功，找到 {len(self._image_pairs)} 对图片。当前索引设置为 {self._current_index}。看图模式: {self._is_viewer_mode}。排序方式: {self._sort_order}")
 
             status = self.get_current_status()
-            status["image_pairs_info"] = frontend_pairs_info
+            status["type"] = "done"
+            if include_order:
+                status["order"] = list(self._order)
             status["is_viewer_mode"] = self._is_viewer_mode # 将看图模式状态添加到返回状态中
             status["sort_order"] = self._sort_order # 添加排序方式到返回状态中
 
-            return status
+            yield status
 
         except (FolderNotFoundError, NoImagePairsFoundError) as e:
              logger.warning(f"应用层加载文件夹失败（文件/对未找到）：{e}")
-             self._image_pairs = []
-             self._current_index = -1
-             self._is_loaded = False
+             self._reset_pairs()
              raise e
         except ImageSelectorError as e:
              logger.error(f"应用层加载文件夹时发生领域层错误: {e}", exc_info=True)
-             self._image_pairs = []
-             self._current_index = -1
-             self._is_loaded = False
+             self._reset_pairs()
              raise e
         except Exception as e:
             logger.error(f"应用层加载文件夹时发生未定义错误: {e}", exc_info=True)
-            self._image_pairs = []
-            self._current_index = -1
-            self._is_loaded = False
+            self._reset_pairs()
             raise ImageSelectorError(f"加载图片时发生意外错误: {e}") from e
 
+    def _apply_sort_order(self):
+        """按 self._sort_order 重新计算显示顺序及其反向映射；只排列下标，不访问磁盘（拍摄时间首次使用时除外）。"""
+        if self._sort_order == "capture_time" and not self._sort_keys.has_capture_times:
+            # 扫描时已从索引附加的元数据直接使用，其余图片只在首次按拍摄时间排序时读取一次 EXIF
+            file_manager.load_missing_metadata(self._image_pairs)
+            self._sort_keys.set_capture_times(self._image_pairs)
+
+        self._order = list(self._sort_keys.order(self._sort_order))
+        self._positions = [0] * len(self._order)
+        for position, index in enumerate(self._order):
+            self._positions[index] = position
+
+    def set_sort_order(self, sort_order):
+        """切换排序方式，当前选中的图片保持不变，返回新的状态（含其在新顺序中的位置）。"""
+        if not self._is_loaded or self._sort_keys is None:
+            raise InvalidIndexError("当前没有加载任何图片对，无法排序。")
+
+        self._sort_order = SortKeys.normalize_mode(sort_order)
+        self._apply_sort_order()
+        file_manager.prioritize_thumbnail_pregeneration(self._positions[self._current_index], order=self._order)
+        # 新顺序中的相邻图片不同，重新设置保留解码帧的图片与预取
+        self._prefetch_neighbours()
+        logger.info(f"排序方式已切换为 {self._sort_order}，当前索引 {self._current_index} 的位置为 {self._positions[self._current_index]}。")
+        return self.get_current_status()
+
+    def _reset_pairs(self):
+        file_manager.cancel_thumbnail_pregeneration()
+        file_manager.cancel_preview_prefetch()
+        file_manager.cancel_metadata_loading()
+        file_manager.set_frame_focus([])
+        self._image_pairs = []
+        self._order = []
+        self._positions = []
+        self._sort_keys = None
+        self._current_index = -1
+        self._is_loaded = False
+
     def get_current_status(self):
         current_pair = None
         jpg_name = None
@@ -115,23 +193,128 @@ class ImageSelectorApp:
              current_pair = self._image_pairs[self._current_index]
              jpg_name = os.path.basename(current_pair.get('jpg_path')) if current_pair.get('jpg_path') else None
              raw_name = os.path.basename(current_pair.get('raw_path')) if current_pair.get('raw_path') else None
-             metadata = current_pair.get('metadata', {}) # 获取元数据
+             metadata = current_pair.get('metadata') or {} # 获取元数据（仍在后台读取时为空）
+
+        current_version = None
+        if current_pair is not None:
+            try:
+                current_version = file_manager.get_image_version(current_pair['jpg_path'], current_pair.get('jpg_stat'))
+            except OSError as e:
+                logger.warning(f"无法计算当前图片的内容版本: {e}")
+
+        current_position = -1
+        if 0 <= self._current_index < len(self._positions):
+            current_position = self._positions[self._current_index]
 
         status = {
             "success": True,
             "current_index": self._current_index,
+            "current_position": current_position, # 当前图片在显示顺序中的位置
+            "current_version": current_version, # 当前图片的内容版本，用于预览图 URL
             "total_images": len(self._image_pairs),
             "jpg_file_name": jpg_name,
             "raw_file_name": raw_name,
             "jpg_folder": self._jpg_folder,
             "raw_folder": self._raw_folder,
             "is_loaded": self._is_loaded,
+            "load_id": self._load_generation, # 每次加载递增，前端据此丢弃旧加载的分页结果
             "current_image_metadata": metadata, # 添加元数据到状态中
+            # 当前图片的元数据仍在后台读取，前端稍后通过 /api/image/metadata 获取
+            "metadata_pending": current_pair is not None and current_pair.get('metadata') is None,
             "is_viewer_mode": self._is_viewer_mode if hasattr(self, '_is_viewer_mode') else False, # 添加看图模式状态
-            "sort_order": self._sort_order if hasattr(self, '_sort_order') else "time_filename" # 添加排序方式到状态中
+            "sort_order": self._sort_order # 添加排序方式到状态中
         }
         return status
 
+    def get_subsystem_stats(self):
+        """
+        后台任务与各级缓存的统计，只由 /api/status 返回：每项都要获取各自的锁，不放在导航请求的响应中。
+        """
+        return {
+            "thumbnail_pregeneration": file_manager.get_thumbnail_pregeneration_status(), # 后台缩略图预生成进度与队列深度
+            "thumbnail_memory_cache": file_manager.get_thumbnail_memory_cache_stats(), # 内存缩略图缓存命中/未命中/淘汰计数
+            "thumbnail_store": file_manager.get_thumbnail_store_stats(), # 磁盘缩略图缓存占用与回收计数
+            "preview_cache": file_manager.get_preview_cache_stats(), # 预览图内存/磁盘缓存命中率
+            "tile_cache": file_manager.get_tile_cache_stats(), # 深度缩放瓦片的磁盘缓存与已解码层级
+            "preview_prefetch": file_manager.get_preview_prefetch_stats(), # 相邻预览预取计数与导航命中率
+            "scheduler": file_manager.get_scheduler_stats(), # 解码调度：各优先级的并发、排队与平均等待
+            "decode_memory": file_manager.get_decode_memory_stats(), # 解码内存预算：占用、峰值与等待次数
+            "decoded_frames": file_manager.get_decoded_frame_stats(), # 当前与相邻图片保留的解码帧：占用、复用与淘汰
+            "metadata_loading": file_manager.get_metadata_loading_status(), # 后台 EXIF 读取进度
+        }
+
+    @staticmethod
+    def _pair_info(index, pair):
+        """前端网格使用的图片对信息；version 为内容版本，用于构造可永久缓存的图片 URL，无法计算时为 None。"""
+        try:
+            version = file_manager.get_image_version(pair['jpg_path'], pair.get('jpg_stat'))
+        except OSError:
+            version = None
+        return {
+            "base_name": pair['base_name'],
+            "index": index,
+            "is_modified": pair.get('is_modified', False),
+            "version": version,
+        }
+
+    def get_pairs_window(self, offset, limit, descending=False):
+        """
+        按显示顺序返回 [offset, offset + limit) 范围内的图片对信息，descending=True 时按倒序计算位置。
+        加载仍在进行（显示顺序尚未确定）时按扫描顺序返回已找到的图片对。
+        """
+        order = self._order
+        pairs = self._image_pairs
+        total = len(order) if order else len(pairs)
+        offset = max(0, offset)
+        end = min(total, offset + max(0, limit))
+
+        window = []
+        for display_index in range(offset, end):
+            position = total - 1 - display_index if descending else display_index
+            index = order[position] if order else position
+            window.append(self._pair_info(index, pairs[index]))
+
+        return {
+            "success": True,
+            "offset": offset,
+            "total_images": total,
+            "is_complete": bool(order) and self._is_loaded,
+            "descending": descending,
+            "load_id": self._load_generation,
+            "pairs": window,
+        }
+
+    def refresh_modified_status(self):
+        """
+        重新检测 RAW 编辑状态（例如在 Photoshop/ACR 中编辑后新出现的 .xmp/.acr），
+        返回 (状态发生变化的图片对 [{"index": 稳定编号, "is_modified": 新状态}], 显示顺序是否改变)。
+        当前按 edited_first 排序时重新计算显示顺序，当前选中的图片保持不变。RAW 文件夹未变化时只需一次 stat。
+        """
+        if not self._is_loaded or self._is_viewer_mode:
+            return [], False
+
+        sidecar_bases, refreshed = file_manager.get_sidecar_bases(self._raw_folder)
+        if not refreshed:
+            return [], False
+
+        changes = []
+        for index, pair in enumerate(self._image_pairs):
+            is_modified = pair['base_name'].lower() in sidecar_bases
+            if is_modified != pair.get('is_modified', False):
+                pair['is_modified'] = is_modified
+                self._sort_keys.set_modified(index, is_modified)
+                changes.append({"index": index, "is_modified": is_modified})
+
+        reordered = False
+        if changes:
+            logger.info(f"RAW 编辑状态已刷新，{len(changes)} 个图片对发生变化。")
+            if self._sort_order == "edited_first":
+                self._apply_sort_order()
+                file_manager.prioritize_thumbnail_pregeneration(self._positions[self._current_index], order=self._order)
+                self._prefetch_neighbours()
+                reordered = True
+        return changes, reordered
+
     def select_image(self, index):
         logger.info(f"应用层尝试选择图片对索引: {index}. 当前总数: {len(self._image_pairs)}")
 
@@ -145,31 +328,32 @@ class ImageSelectorApp:
         self._current_index = index
         logger.info(f"应用层图片对索引成功切换为: {self._current_index}")
 
-        # 获取当前选中图片的元数据（如果尚未加载）
-        current_pair = self._image_pairs[self._current_index]
-        if 'metadata' not in current_pair or not current_pair['metadata']:
-            metadata = file_manager.get_image_metadata(current_pair['jpg_path'])
-            current_pair['metadata'] = metadata
-            logger.debug(f"按需加载了索引 {self._current_index} 的图片元数据。")
+        # 跳转后让后台预生成从新位置向外推进（上一张/下一张本来就在当前推进范围附近，无需重排）
+        if 0 <= index < len(self._positions):
+            file_manager.prioritize_thumbnail_pregeneration(self._positions[index])
+
+        self._request_current_metadata()
+
+        # 跳转后取消旧位置附近尚未开始的预取，从新位置沿最近的浏览方向重新预取
+        self._prefetch_neighbours()
 
         return self.get_current_status()
 
     def next_image(self):
         logger.info(f"应用层前往下一张图片。当前索引: {self._current_index}, 总数: {len(self._image_pairs)}")
 
-        if not self._image_pairs:
+        if not self._order:
              logger.warning("应用层尝试前往下一张图片，但没有加载任何图片。")
              raise InvalidIndexError("当前没有加载任何图片对，无法前往下一张。")
 
-        if 0 <= self._current_index < len(self._image_pairs) - 1:
-            self._current_index += 1
+        # 按显示顺序移动，而不是按扫描顺序的稳定编号
+        position = self._positions[self._current_index] if 0 <= self._current_index < len(self._positions) else -1
+        if 0 <= position < len(self._order) - 1:
+            self._current_index = self._order[position + 1]
             logger.info(f"应用层下一张图片索引为: {self._current_index}")
-            # 获取当前选中图片的元数据（如果尚未加载）
-            current_pair = self._image_pairs[self._current_index]
-            if 'metadata' not in current_pair or not current_pair['metadata']:
-                metadata = file_manager.get_image_metadata(current_pair['jpg_path'])
-                current_pair['metadata'] = metadata
-                logger.debug(f"按需加载了索引 {self._current_index} 的图片元数据。")
+            self._navigation_direction = 1
+            self._prefetch_neighbours()
+            self._request_current_metadata()
         else:
             logger.warning("应用层已在最后一张图片，无法前往下一张。索引保持不变。")
 
@@ -178,24 +362,66 @@ class ImageSelectorApp:
     def prev_image(self):
         logger.info(f"应用层返回上一张图片。当前索引: {self._current_index}, 总数: {len(self._image_pairs)}")
 
-        if not self._image_pairs:
+        if not self._order:
             logger.warning("应用层尝试返回上一张图片，但没有加载任何图片。")
             raise InvalidIndexError("当前没有加载任何图片对，无法返回上一张。")
 
-        if self._current_index > 0:
-            self._current_index -= 1
+        position = self._positions[self._current_index] if 0 <= self._current_index < len(self._positions) else -1
+        if position > 0:
+            self._current_index = self._order[position - 1]
             logger.info(f"应用层上一张图片索引为: {self._current_index}")
-            # 获取当前选中图片的元数据（如果尚未加载）
-            current_pair = self._image_pairs[self._current_index]
-            if 'metadata' not in current_pair or not current_pair['metadata']:
-                metadata = file_manager.get_image_metadata(current_pair['jpg_path'])
-                current_pair['metadata'] = metadata
-                logger.debug(f"按需加载了索引 {self._current_index} 的图片元数据。")
+            self._navigation_direction = -1
+            self._prefetch_neighbours()
+            self._request_current_metadata()
         else:
             logger.warning("应用层已在第一张图片，无法返回上一张。索引保持不变。")
 
         return self.get_current_status()
 
+    def _request_current_metadata(self):
+        """当前图片的元数据尚未读取时交给后台尽快读取，不在导航请求中等待（见 get_image_metadata）。"""
+        current_pair = self._image_pairs[self._current_index]
+        if current_pair.get('metadata') is None:
+            file_manager.request_metadata(current_pair)
+
+    def get_image_metadata(self, index):
+        """
+        返回稳定编号为 index 的图片的元数据。状态中 metadata_pending 为真时由前端单独请求，
+        后台尚未读取到时在本次请求中读取（只读取文件头）。
+        """
+        if not (0 <= index < len(self._image_pairs)):
+            raise InvalidIndexError(f"无效的图片索引: {index}")
+        pair = self._image_pairs[index]
+        if pair.get('metadata') is None:
+            pair['metadata'] = file_manager.get_image_metadata(pair['jpg_path'], pair.get('jpg_stat'))
+        return pair['metadata']
+
+    def _prefetch_neighbours(self):
+        """
+        在后台预先生成当前图片沿浏览方向之后 PREVIEW_PREFETCH_AHEAD 张、之前 PREVIEW_PREFETCH_BEHIND 张的预览图与 EXIF，
+        离当前图片越近越先生成；同时取消上一次导航中尚未开始的预取。只有当前图片与这些相邻图片的解码帧保留在内存中。
+        """
+        if not (0 <= self._current_index < len(self._positions)):
+            return
+        position = self._positions[self._current_index]
+        direction = self._navigation_direction
+        ahead = app_config.get("PREVIEW_PREFETCH_AHEAD", 3)
+        behind = app_config.get("PREVIEW_PREFETCH_BEHIND", 1)
+        offsets = [direction * step for step in range(1, ahead + 1)] + [-direction * step for step in range(1, behind + 1)]
+        neighbours = [self._image_pairs[self._order[position + offset]]
+                      for offset in offsets if 0 <= position + offset < len(self._order)]
+        current_path = self._image_pairs[self._current_index]['jpg_path']
+        file_manager.set_frame_focus([current_path] + [pair['jpg_path'] for pair in neighbours])
+        tasks = [functools.partial(self._warm_pair, pair) for pair in neighbours]
+        file_manager.prefetch_previews(current_path, tasks)
+
+    @staticmethod
+    def _warm_pair(pair):
+        """在预取线程中执行：读取尚未加载的 EXIF，并生成预览图缓存。"""
+        if pair.get('metadata') is None:
+            pair['metadata'] = file_manager.get_image_metadata(pair['jpg_path'], pair.get('jpg_stat'))
+        file_manager.warm_preview(pair['jpg_path'], pair.get('jpg_stat'))
+
     def get_image_file_path(self, index, file_type='jpg'):
         if not (0 <= index < len(self._image_pairs)):
             logger.warning(f"尝试获取文件路径时索引无效: {index}. 总数: {len(self._image_pairs)}")
@@ -216,6 +442,34 @@ class ImageSelectorApp:
 
         return file_path
 
+    def get_image_file_stat(self, index, file_type='jpg'):
+        """返回扫描时记录的文件状态 {"size", "mtime", "inode"}，不可用时返回 None。"""
+        if not (0 <= index < len(self._image_pairs)):
+            logger.warning(f"尝试获取文件状态时索引无效: {index}. 总数: {len(self._image_pairs)}")
+            raise InvalidIndexError(f"无效的图片索引: {index}")
+
+        return self._image_pairs[index].get(f"{file_type}_stat")
+
+    def get_thumbnail_sources(self, indices):
+        """
+        一次取得多个稳定编号对应的 JPG 路径与文件状态，返回 (加载编号, [(稳定编号, 路径, 文件状态)])。
+        批量缩略图接口在生成前先取得全部路径，生成过程中加载了新的文件夹也不会错配；无效编号的路径为 None。
+        """
+        pairs = self._image_pairs
+        sources = []
+        for index in indices:
+            if 0 <= index < len(pairs):
+                pair = pairs[index]
+                sources.append((index, pair.get('jpg_path'), pair.get('jpg_stat')))
+            else:
+                sources.append((index, None, None))
+        return self._load_generation, sources
+
+    def get_image_version(self, index):
+        """返回稳定编号对应图片的内容版本（见 FileManager.get_image_version）。"""
+        return file_manager.get_image_version(self.get_image_file_path(index, 'jpg'),
+                                              self.get_image_file_stat(index, 'jpg'))
+
     def get_current_jpg_path(self):
          if self._current_index != -1 and 0 <= self._current_index < len(self._image_pairs):
               try:
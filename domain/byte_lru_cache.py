@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+
+class ByteLRUCache:
+    """
+    按总字节数限制大小的进程内 LRU 缓存，值为编码后的图片字节（bytes）。
+    Flask 以多线程处理请求，所有操作都在锁内完成；max_bytes <= 0 时不缓存任何内容。
+    """
+
+    def __init__(self, max_bytes):
+        self._max_bytes = max(0, max_bytes)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self):
+        return self._max_bytes > 0
+
+    def get(self, key, count=True):
+        """命中时返回字节并将其移到最近使用的位置，未命中返回 None；count=False 时不计入命中统计。"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                if count:
+                    self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self._hits += 1
+            return value
+
+    def contains(self, key):
+        """只判断是否存在，不更新使用顺序与命中统计。"""
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, value):
+        """放入（或替换）一项，超出预算时淘汰最久未使用的项；单项超过整个预算时不缓存。"""
+        size = len(value)
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._current_bytes -= len(previous)
+            self._entries[key] = value
+            self._current_bytes += size
+            while self._current_bytes > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._current_bytes -= len(evicted)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,96 @@
+import contextlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DecodeMemoryGovernor:
+    """
+    按内存预算放行解码：每次解码前按文件头估算所需字节数（见 estimate_decode_bytes），
+    正在进行的解码合计超出预算时等待其它解码结束，避免多张超大图片（如 100 MP 全景图）同时完整解码把进程推入交换区。
+
+    调用方按偏好顺序提供若干种解码方式（例如不同的按比例解码倍数，输出结果相同）：预算足够时使用第一种；
+    内存紧张时改用放得下的更小的方式，都放不下时才等待。单个解码超出整个预算时，在没有其它解码进行时单独放行。
+    budget_bytes <= 0 时不做限制（仍统计）。
+    """
+
+    def __init__(self, budget_bytes):
+        self._budget = max(0, budget_bytes)
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._in_flight_count = 0
+        self._peak_in_flight = 0
+        self._stats = {"admitted": 0, "waited": 0, "reduced": 0, "oversized": 0}
+        self._wait_seconds = 0.0
+
+    @property
+    def enabled(self):
+        return self._budget > 0
+
+    @contextlib.contextmanager
+    def admit(self, options, file_path=""):
+        """
+        options 为按偏好排列的 [(估算字节数, 值), ...]，在 with 块中占用所选方式的预算，产出其对应的值。
+        """
+        estimate, value = self.acquire(options, file_path)
+        try:
+            yield value
+        finally:
+            self.release(estimate)
+
+    def acquire(self, options, file_path=""):
+        """等待并占用预算，返回 (占用的字节数, 所选的值)，之后必须以占用的字节数调用 release。"""
+        start = time.perf_counter()
+        waited = False
+        with self._condition:
+            while True:
+                index = self._choose(options)
+                if index is not None:
+                    break
+                waited = True
+                self._condition.wait()
+            estimate, value = options[index]
+            self._in_flight += estimate
+            self._in_flight_count += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            self._stats["admitted"] += 1
+            if waited:
+                self._stats["waited"] += 1
+                self._wait_seconds += time.perf_counter() - start
+            if index > 0:
+                self._stats["reduced"] += 1
+                logger.debug(f"解码内存紧张，改用缩小的解码方式 ({estimate / 1e6:.0f} MB): {file_path}")
+            if self.enabled and estimate > self._budget:
+                self._stats["oversized"] += 1
+                logger.info(f"图片解码预计需要 {estimate / 1e6:.0f} MB，超出解码内存预算，单独解码: {file_path}")
+        return estimate, value
+
+    def release(self, estimate):
+        with self._condition:
+            self._in_flight -= estimate
+            self._in_flight_count -= 1
+            self._condition.notify_all()
+
+    def get_stats(self):
+        with self._condition:
+            admitted = self._stats["admitted"]
+            return {
+                **self._stats,
+                "enabled": self.enabled,
+                "budget_bytes": self._budget,
+                "in_flight_bytes": self._in_flight,
+                "in_flight": self._in_flight_count,
+                "peak_in_flight_bytes": self._peak_in_flight,
+                "average_wait_ms": self._wait_seconds * 1000 / admitted if admitted else 0.0,
+            }
+
+    def _choose(self, options):
+        """返回可以立即开始的方式的下标，需要等待时返回 None。"""
+        if not self.enabled or self._in_flight_count == 0:
+            return 0
+        for index, (estimate, _) in enumerate(options):
+            if self._in_flight + estimate <= self._budget:
+                return index
+        return None
@@ -0,0 +1,188 @@
+import contextlib
+import logging
+import threading
+from collections import OrderedDict
+
+from domain.image_decoder import open_image_for_size, get_display_size, estimate_decode_bytes, fit_size
+from domain.keyed_locks import KeyedLocks
+
+logger = logging.getLogger(__name__)
+
+
+def frame_bytes(img):
+    """Pillow 在内存中以每像素 1 字节保存 1、L、P 模式，多通道模式按每像素 4 字节对齐。"""
+    return img.width * img.height * (1 if img.mode in ('1', 'L', 'P') else 4)
+
+
+class _Frame:
+    __slots__ = ("image", "display_size", "leases", "evicted", "retained")
+
+    def __init__(self, image, display_size):
+        self.image = image
+        self.display_size = display_size # 原图在显示方向上的尺寸
+        self.leases = 0 # 正在 with 块中使用该帧的调用方数量
+        self.evicted = False # 已不在缓存中，最后一个调用方结束使用时关闭
+        self.retained = False # 曾保留在缓存中，关闭前计入缓存占用
+
+    @property
+    def full(self):
+        return self.image.size == self.display_size
+
+    def covers(self, box_size, reducing_gap):
+        """能否代替以 box_size、reducing_gap 调用 open_image_for_size 的解码结果（不小于其尺寸）。"""
+        if self.full:
+            return True
+        if not box_size:
+            return False
+        target_width, target_height = fit_size(self.display_size, box_size)
+        # JPEG 按比例解码向上取整，按整数比较时允许 1 像素误差
+        return (self.image.width + 1 >= int(target_width * reducing_gap)
+                and self.image.height + 1 >= int(target_height * reducing_gap))
+
+
+class DecodedFrameCache:
+    """
+    已解码、已按 EXIF 方向校正的原图帧，供同一张图片的预览、缩略图与瓦片层级共用，避免每种尺寸各自重新解码。
+
+    只保留当前图片及其相邻图片（由 set_focus 指定，随导航更新）的帧，导航离开后立即淘汰；
+    每张图片只保留一帧，按目前需要的最大尺寸解码（之后需要更大的尺寸时重新解码并替换），
+    合计按像素字节数不超过 max_bytes，超出时淘汰最久未使用的帧。
+    新的解码向 governor（DecodeMemoryGovernor）申请内存预算；保留下来的帧不再占用解码预算，而是计入本缓存的上限
+    （调用方从总预算中扣除本缓存的上限后再交给 governor）。
+    帧在调用方使用期间不会关闭：被淘汰时如仍有调用方在使用，等最后一个调用方结束后关闭，在此之前仍计入上限。
+    """
+
+    def __init__(self, max_bytes, governor):
+        self._max_bytes = max(0, max_bytes)
+        self._governor = governor
+        self._frames = OrderedDict() # (路径, mtime, 大小) -> _Frame
+        self._bytes = 0 # 保留的帧与已淘汰、仍在使用中的帧
+        self._focus = frozenset()
+        self._lock = threading.Lock()
+        self._decode_locks = KeyedLocks() # 按 (路径, mtime, 大小) 加锁，同一张图片同时只解码一次
+        self._stats = {"hits": 0, "decodes": 0, "upgrades": 0, "evictions": 0}
+
+    def set_focus(self, file_paths):
+        """设置需要保留帧的图片（通常为当前图片及其相邻图片），其它图片的帧立即淘汰。"""
+        focus = frozenset(file_paths)
+        with self._lock:
+            self._focus = focus
+            for key in [key for key in self._frames if key[0] not in focus]:
+                self._evict(key)
+
+    @contextlib.contextmanager
+    def frame(self, file_path, file_stat, box_size=None, reducing_gaps=(1.0,), before_decode=None):
+        """
+        在 with 块中产出一帧图像，尺寸不小于以 box_size 和 reducing_gaps 中所选的值调用 open_image_for_size 的结果。
+        缓存中已有足够大的帧时直接使用，否则解码：reducing_gaps 按偏好排列，内存紧张时由 governor 选择更小的值；
+        before_decode 在获得内存预算之后、开始解码之前调用（可抛出异常放弃解码）。
+        产出的图像可能由缓存与其它线程共用：只能读取或由它生成新图像，不能修改或关闭，也不能在 with 块之外使用。
+        """
+        key = (file_path, file_stat['mtime'], file_stat['size'])
+        cached = self._lease(key, box_size, reducing_gaps[-1])
+        if cached is not None:
+            try:
+                yield cached.image
+            finally:
+                self._release(cached)
+            return
+
+        options = [(estimate_decode_bytes(file_path, box_size, gap), gap) for gap in reducing_gaps]
+        with self._governor.admit(options, file_path) as reducing_gap:
+            with self._decode_locks.hold(key):
+                # 等待期间另一个线程可能已解码了足够大的帧
+                frame = self._lease(key, box_size, reducing_gaps[-1])
+                if frame is None:
+                    if before_decode is not None:
+                        before_decode()
+                    display_size = get_display_size(file_path)
+                    frame = _Frame(open_image_for_size(file_path, box_size, reducing_gap), display_size)
+                    frame.leases = 1
+                    self._retain(key, frame)
+            try:
+                yield frame.image
+            finally:
+                self._release(frame)
+
+    @contextlib.contextmanager
+    def peek(self, file_path, file_stat, box_size, reducing_gap):
+        """
+        只查缓存：在 with 块中产出已保留的、足够大的帧（使用规则同 frame），没有时产出 None，不解码。
+        """
+        frame = self._lease((file_path, file_stat['mtime'], file_stat['size']), box_size, reducing_gap)
+        try:
+            yield frame.image if frame is not None else None
+        finally:
+            if frame is not None:
+                self._release(frame)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._frames):
+                self._evict(key)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "frames": len(self._frames),
+                "focus": len(self._focus),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+            }
+
+    def _lease(self, key, box_size, reducing_gap):
+        """返回已保留的、足够大的帧并登记一次使用（之后必须调用 _release），没有时返回 None。"""
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None or not frame.covers(box_size, reducing_gap):
+                return None
+            self._frames.move_to_end(key)
+            self._stats["hits"] += 1
+            frame.leases += 1
+            return frame
+
+    def _release(self, frame):
+        with self._lock:
+            frame.leases -= 1
+            if frame.leases == 0 and frame.evicted:
+                self._close(frame)
+
+    def _retain(self, key, frame):
+        """
+        记录一次解码，在图片属于当前焦点且放得下时保留帧，返回是否保留；
+        不保留的帧在调用方结束使用时关闭。
+        """
+        size = frame_bytes(frame.image)
+        with self._lock:
+            self._stats["decodes"] += 1
+            if key[0] in self._focus and size <= self._max_bytes:
+                if key in self._frames:
+                    # 之前保留的帧不够大，换成新解码的更大的帧
+                    self._stats["upgrades"] += 1
+                    self._evict(key, count=False)
+                while self._frames and self._bytes + size > self._max_bytes:
+                    self._evict(next(iter(self._frames)))
+            # 已淘汰但仍在使用中的帧关闭前也计入上限
+            if key[0] not in self._focus or self._bytes + size > self._max_bytes:
+                frame.evicted = True
+                return False
+            self._frames[key] = frame
+            frame.retained = True
+            self._bytes += size
+        logger.debug(f"保留已解码的帧 {frame.image.width}x{frame.image.height}: {key[0]}")
+        return True
+
+    def _evict(self, key, count=True):
+        frame = self._frames.pop(key)
+        frame.evicted = True
+        if count:
+            self._stats["evictions"] += 1
+        # 其它线程仍在 with 块中使用时，由最后一个结束使用的线程关闭
+        if frame.leases == 0:
+            self._close(frame)
+
+    def _close(self, frame):
+        if frame.retained:
+            self._bytes -= frame_bytes(frame.image)
+        frame.image.close()
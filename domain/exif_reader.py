@@ -0,0 +1,177 @@
+import logging
+import struct
+
+logger = logging.getLogger(__name__)
+
+# 本模块只用标准库解析 EXIF，不打开 Pillow 图像对象：JPEG 只读取 APP1 之前的标记段与 APP1 本身（通常几十 KB），
+# PNG 只读取图像数据之前的数据块，TIFF 结构的文件只读取文件头部。
+
+# 读取 TIFF 结构文件头部的字节数，IFD0 与 Exif IFD 几乎总在其中
+TIFF_HEAD_BYTES = 256 * 1024
+
+_EXIF_HEADER = b'Exif\x00\x00'
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_TIFF_HEADERS = (b'II*\x00', b'MM\x00*')
+
+# 独立标记（没有长度字段）：TEM 与 RST0-RST7
+_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+_MARKER_SOS = 0xDA
+_MARKER_EOI = 0xD9
+_MARKER_APP1 = 0xE1
+
+# IFD0 与 Exif IFD 中用到的标签
+_TAG_MAKE = 0x010F
+_TAG_MODEL = 0x0110
+_TAG_DATETIME = 0x0132
+_TAG_EXIF_IFD = 0x8769
+_TAG_DATETIME_ORIGINAL = 0x9003
+_TAG_DATETIME_DIGITIZED = 0x9004
+_TAG_LENS_MODEL = 0xA434
+
+_TYPE_ASCII = 2
+_TYPE_LONG = 4
+_TYPE_UNDEFINED = 7
+_TYPE_IFD = 13
+
+
+class ExifFormatError(ValueError):
+    """EXIF 数据结构损坏。"""
+
+
+def empty_metadata():
+    return {
+        "date_taken": None,
+        "camera_make": None,
+        "camera_model": None,
+        "lens_model": None
+    }
+
+
+def read_exif_metadata(file_path):
+    """
+    只读取文件头部，返回 {"date_taken", "camera_make", "camera_model", "lens_model"}（与 empty_metadata 相同的键）。
+    没有 EXIF 的文件（包括不支持的格式）各项为 None；EXIF 损坏时抛出 ExifFormatError，文件无法读取时抛出 OSError。
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(8)
+        if head[:2] == b'\xff\xd8':
+            f.seek(2)
+            tiff_data = _read_jpeg_app1(f)
+        elif head == _PNG_SIGNATURE:
+            tiff_data = _read_png_exif(f)
+        elif head[:4] in _TIFF_HEADERS:
+            f.seek(0)
+            tiff_data = f.read(TIFF_HEAD_BYTES)
+        else:
+            tiff_data = None
+    if not tiff_data:
+        return empty_metadata()
+    return _metadata_from_tiff(tiff_data)
+
+
+def _read_jpeg_app1(f):
+    """逐个跳过标记段，返回 EXIF APP1 段中的 TIFF 数据；在图像数据（SOS）之前没有找到时返回 None。"""
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            raise ExifFormatError(f"JPEG 标记错误: {byte!r}")
+        marker = f.read(1)
+        while marker == b'\xff': # 标记前允许填充字节
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker in _STANDALONE_MARKERS:
+            continue
+        if marker in (_MARKER_SOS, _MARKER_EOI):
+            return None
+        length_bytes = f.read(2)
+        if len(length_bytes) != 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0] - 2
+        if length < 0:
+            raise ExifFormatError(f"JPEG 标记段长度错误: {length + 2}")
+        if marker == _MARKER_APP1:
+            segment = f.read(length)
+            if segment.startswith(_EXIF_HEADER):
+                return segment[len(_EXIF_HEADER):]
+            # XMP 等其它 APP1 段
+            continue
+        f.seek(length, 1)
+
+
+def _read_png_exif(f):
+    """逐个跳过数据块，返回图像数据（IDAT）之前的 eXIf 块内容，没有时返回 None。"""
+    while True:
+        header = f.read(8)
+        if len(header) != 8:
+            return None
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type == b'eXIf':
+            data = f.read(length)
+            # 早期写入程序会保留 JPEG 的 "Exif\0\0" 前缀
+            return data[len(_EXIF_HEADER):] if data.startswith(_EXIF_HEADER) else data
+        if chunk_type in (b'IDAT', b'IEND'):
+            return None
+        f.seek(length + 4, 1) # 数据与 CRC
+
+
+def _metadata_from_tiff(data):
+    if data[:4] not in _TIFF_HEADERS:
+        raise ExifFormatError("TIFF 头错误")
+    endian = '<' if data[:2] == b'II' else '>'
+    ifd0 = _read_ifd(data, endian, struct.unpack(endian + 'I', data[4:8])[0])
+    exif_ifd = {}
+    exif_offset = ifd0.get(_TAG_EXIF_IFD)
+    if isinstance(exif_offset, int):
+        exif_ifd = _read_ifd(data, endian, exif_offset)
+
+    # 与 Pillow 的 _getexif 相同，Exif IFD 中的同名标签优先
+    tags = {**ifd0, **exif_ifd}
+    metadata = empty_metadata()
+    for tag in (_TAG_DATETIME_ORIGINAL, _TAG_DATETIME_DIGITIZED, _TAG_DATETIME):
+        if tags.get(tag) is not None:
+            metadata["date_taken"] = tags[tag]
+            break
+    metadata["camera_make"] = tags.get(_TAG_MAKE)
+    metadata["camera_model"] = tags.get(_TAG_MODEL)
+    metadata["lens_model"] = tags.get(_TAG_LENS_MODEL)
+    return metadata
+
+
+_WANTED_TAGS = {_TAG_MAKE, _TAG_MODEL, _TAG_DATETIME, _TAG_EXIF_IFD, _TAG_DATETIME_ORIGINAL, _TAG_DATETIME_DIGITIZED,
+                _TAG_LENS_MODEL}
+
+
+def _read_ifd(data, endian, offset):
+    """读取 offset 处的 IFD，只解码用到的标签：ASCII 值返回 str，Exif IFD 指针返回 int。"""
+    if offset < 8 or offset + 2 > len(data):
+        raise ExifFormatError(f"IFD 偏移超出范围: {offset}")
+    count = struct.unpack_from(endian + 'H', data, offset)[0]
+    values = {}
+    for index in range(count):
+        entry = offset + 2 + index * 12
+        if entry + 12 > len(data):
+            raise ExifFormatError("IFD 条目超出范围")
+        tag, value_type, value_count = struct.unpack_from(endian + 'HHI', data, entry)
+        if tag not in _WANTED_TAGS:
+            continue
+        if tag == _TAG_EXIF_IFD:
+            if value_type in (_TYPE_LONG, _TYPE_IFD):
+                values[tag] = struct.unpack_from(endian + 'I', data, entry + 8)[0]
+            continue
+        if value_type not in (_TYPE_ASCII, _TYPE_UNDEFINED):
+            continue
+        if value_count <= 4:
+            raw = data[entry + 8:entry + 8 + value_count]
+        else:
+            value_offset = struct.unpack_from(endian + 'I', data, entry + 8)[0]
+            if value_offset + value_count > len(data):
+                logger.debug(f"EXIF 标签 0x{tag:04X} 的值超出读取范围，忽略")
+                continue
+            raw = data[value_offset:value_offset + value_count]
+        # 字符串以 NUL 结尾，部分相机还会用 NUL 填充到固定长度
+        values[tag] = raw.split(b'\x00', 1)[0].decode('utf-8', 'replace')
+    return values
@@ -1,26 +1,92 @@
+import atexit
 import os
 import logging
-from PIL import Image, ImageOps, ExifTags
+from PIL import Image
 import subprocess
 import platform
+import functools
 import hashlib
-import io
+import math
 import sys
+import threading
+import time
 
 from utils.exceptions import FolderNotFoundError, NoImagePairsFoundError, ImageProcessingError, ExternalToolError, \
-    ImageSelectorError
+    ImageSelectorError, RenderSupersededError
 from utils.config_loader import app_config
+from domain.folder_index import FolderIndex, DIR_MTIME_GRANULARITY
+from domain.sort_keys import SortKeys, DEFAULT_SORT_MODE
+from domain.thumbnail_renderer import render_thumbnail, encode_thumbnail, downscale_thumbnail, thumbnail_from_frame
+from domain.image_decoder import fit_size, read_passthrough_info, passthrough_fits, estimate_decode_bytes, REDUCING_GAP, PREVIEW_REDUCING_GAP
+from domain.decode_governor import DecodeMemoryGovernor
+from domain.decoded_frame_cache import DecodedFrameCache
+from domain.exif_reader import read_exif_metadata, empty_metadata
+from domain.metadata_loader import MetadataLoader
+from domain.thumbnail_pregenerator import ThumbnailPregenerator
+from domain.preview_prefetcher import PreviewPrefetcher
+from domain.request_supersession import RequestSupersession
+from domain.keyed_locks import KeyedLocks
+from domain.work_scheduler import WorkScheduler, INTERACTIVE, VISIBLE, BACKGROUND
+from domain.byte_lru_cache import ByteLRUCache
+from domain.thumbnail_store import ThumbnailStore
+from domain.tile_pyramid import TilePyramid
+from domain.image_encoder import available_formats, choose_format, encode_image, DEFAULT_IMAGE_FORMAT
 
 logger = logging.getLogger(__name__)
 
+# Photoshop / Camera Raw 编辑 RAW 后在同一目录写入的旁车文件
+SIDECAR_EXTENSIONS = ('.xmp', '.acr')
+
+# 缩略图与预览的生成方式（尺寸、编码参数等）变化时递增，使浏览器中按内容版本永久缓存的旧图片失效
+RENDITION_VERSION = 4
+
 class FileManager:
     def __init__(self):
-        self._thumbnail_bounding_box_size = (150, 150)
         logger.info("FileManager initialized.")
         self._cache_dir_name = app_config.get("CACHE_DIR_NAME") or "app_cache"
         # self._cache_dir_name = "app_cache"
+        # 网格中缩略图的基准尺寸（正方形边界框的边长），也是后台预生成的尺寸
         self._thumbnail_width = app_config.get("THUMBNAIL_WIDTH") or 150
+        self._thumbnail_bounding_box_size = (self._thumbnail_width, self._thumbnail_width)
+        # 可请求的缩略图尺寸阶梯（升序，总是包含基准尺寸），供高分辨率屏幕和前端 srcset 选择
+        self._thumbnail_sizes = sorted({self._thumbnail_width,
+                                        *(size for size in app_config.get("THUMBNAIL_SIZES", []) if size > 0)})
+        # 按视口请求预览时的最长边档位（升序），见 resolve_preview_size
+        self._preview_sizes = sorted({size for size in app_config.get("PREVIEW_SIZES", []) if size > 0})
         self._photoshop_path = app_config.get("PHOTOSHOP_PATH")
+        # 所有读取并解码原图的工作按优先级（交互预览 > 可见缩略图 > 后台）与存储设备限制并发
+        cpu_count = os.cpu_count() or 1
+        self._scheduler = WorkScheduler(
+            [app_config.get("PREVIEW_RENDER_CONCURRENCY") or cpu_count,
+             app_config.get("THUMBNAIL_RENDER_CONCURRENCY") or cpu_count,
+             app_config.get("BACKGROUND_RENDER_CONCURRENCY") or max(1, cpu_count - 1)],
+            app_config.get("DECODE_CAPACITY") or cpu_count,
+            app_config.get("STORAGE_DEVICE_CONCURRENCY") or 4)
+        # 正在进行的解码按文件头估算的内存合计不超过预算，超大图片同时请求时排队而不是一起完整解码
+        decode_memory_mb = app_config.get("DECODE_MEMORY_BUDGET_MB")
+        if decode_memory_mb is None:
+            decode_memory_mb = 1024
+        # 当前图片及其相邻图片的已解码帧，预览、缩略图与瓦片从同一次解码生成（见 DecodedFrameCache）
+        frame_cache_mb = app_config.get("DECODED_FRAME_CACHE_MB")
+        if frame_cache_mb is None:
+            frame_cache_mb = 256
+        # 放大查看时保留在内存中的瓦片层级（见 TilePyramid）
+        tile_decode_cache_mb = app_config.get("TILE_DECODE_CACHE_MB")
+        if tile_decode_cache_mb is None:
+            tile_decode_cache_mb = 256
+        if decode_memory_mb > 0:
+            # 保留的帧与瓦片层级计入解码内存预算：合计最多占一半，其余留给正在进行的解码
+            if frame_cache_mb > decode_memory_mb // 2:
+                logger.warning(f"DECODED_FRAME_CACHE_MB ({frame_cache_mb}) 超过解码内存预算的一半，"
+                               f"改为 {decode_memory_mb // 2} MB。")
+                frame_cache_mb = decode_memory_mb // 2
+            if tile_decode_cache_mb > decode_memory_mb // 2 - frame_cache_mb:
+                logger.warning(f"TILE_DECODE_CACHE_MB ({tile_decode_cache_mb}) 与 DECODED_FRAME_CACHE_MB 合计超过"
+                               f"解码内存预算的一半，改为 {decode_memory_mb // 2 - frame_cache_mb} MB。")
+                tile_decode_cache_mb = decode_memory_mb // 2 - frame_cache_mb
+            decode_memory_mb -= frame_cache_mb + tile_decode_cache_mb
+        self._decode_governor = DecodeMemoryGovernor(decode_memory_mb * 1024 * 1024)
+        self._decoded_frames = DecodedFrameCache(frame_cache_mb * 1024 * 1024, self._decode_governor)
 
         this_dir = os.path.dirname(os.path.abspath(__file__))
         self._cache_dir = os.path.join(this_dir, '..', self._cache_dir_name)
@@ -28,6 +94,89 @@ class FileManager:
         self._ensure_cache_dir_exists()
         logger.info(f"缩略图缓存目录设置为: {self._cache_dir}")
 
+        cache_max_mb = app_config.get("THUMBNAIL_CACHE_MAX_MB")
+        if cache_max_mb is None:
+            cache_max_mb = 2048
+        self._thumbnail_store = ThumbnailStore(self._cache_dir, cache_max_mb * 1024 * 1024)
+        atexit.register(self._thumbnail_store.close)
+        # 旧版本每个缩略图一个文件，现在的缓存键不会再用到它们；只在配置允许时删除，否则只在日志中提示数量。在后台进行，不阻塞启动
+        threading.Thread(target=ThumbnailStore.remove_legacy_files,
+                         args=(self._cache_dir, not app_config.get("THUMBNAIL_LEGACY_CLEANUP", False)),
+                         name="thumbnail-cache-cleanup", daemon=True).start()
+
+        index_file_name = app_config.get("FOLDER_INDEX_FILE") or "folder_index.sqlite3"
+        self._folder_index = FolderIndex(os.path.join(this_dir, '..', index_file_name))
+
+        # 加载后在后台线程池中分批读取 EXIF 元数据
+        metadata_workers = app_config.get("METADATA_WORKERS")
+        if metadata_workers is None:
+            metadata_workers = 4
+        self._metadata_loader = MetadataLoader(self._read_exif_metadata, self._folder_index.save_metadata_many,
+                                               metadata_workers, app_config.get("METADATA_BATCH_SIZE") or 64)
+
+        # 规范化的 RAW 文件夹路径 -> (目录 mtime, 收集时间, 旁车文件小写基名集合)，供增量刷新编辑状态
+        self._sidecar_snapshots = {}
+
+        # 最近使用的缩略图字节，键为 (原图路径, mtime, 大小, 输出格式)；命中时不再计算缓存键、访问磁盘缓存
+        memory_cache_mb = app_config.get("THUMBNAIL_MEMORY_CACHE_MB")
+        if memory_cache_mb is None:
+            memory_cache_mb = 64
+        self._thumbnail_memory_cache = ByteLRUCache(memory_cache_mb * 1024 * 1024)
+
+        # 编码后的预览图：内存中保存最近查看的几张（来回切换时直接返回），磁盘上保存在缓存目录的 previews 子目录中
+        preview_memory_mb = app_config.get("PREVIEW_MEMORY_CACHE_MB")
+        if preview_memory_mb is None:
+            preview_memory_mb = 128
+        self._preview_memory_cache = ByteLRUCache(preview_memory_mb * 1024 * 1024)
+        preview_cache_max_mb = app_config.get("PREVIEW_CACHE_MAX_MB")
+        if preview_cache_max_mb is None:
+            preview_cache_max_mb = 1024
+        self._preview_store = ThumbnailStore(os.path.join(self._cache_dir, "previews"),
+                                             preview_cache_max_mb * 1024 * 1024, label="预览图")
+        atexit.register(self._preview_store.close)
+        # 按预览图缓存键加锁：前台请求与后台预取同时需要同一张预览时只生成一次
+        self._preview_render_locks = KeyedLocks()
+        self._preview_supersession = RequestSupersession()
+        # 导航时按方向预取相邻图片的预览图；按浏览器最近一次请求的预览规格（最长边、格式）生成
+        prefetch_workers = app_config.get("PREVIEW_PREFETCH_WORKERS")
+        if prefetch_workers is None:
+            prefetch_workers = 2
+        self._preview_prefetcher = PreviewPrefetcher(prefetch_workers)
+        self._prefetch_rendition = (None, DEFAULT_IMAGE_FORMAT)
+
+        # 放大查看时按需生成的深度缩放瓦片，编码结果保存在缓存目录的 tiles 子目录中
+        tile_cache_max_mb = app_config.get("TILE_CACHE_MAX_MB")
+        if tile_cache_max_mb is None:
+            tile_cache_max_mb = 1024
+        self._tile_store = ThumbnailStore(os.path.join(self._cache_dir, "tiles"), tile_cache_max_mb * 1024 * 1024,
+                                          label="瓦片")
+        atexit.register(self._tile_store.close)
+        self._tile_pyramid = TilePyramid(app_config.get("TILE_SIZE") or 512, tile_decode_cache_mb * 1024 * 1024,
+                                         self._decoded_frames)
+
+        # 除 JPEG 外可按 Accept 头选择的输出格式（按优先级），以及各格式的编码参数
+        self._output_formats = {
+            "thumbnail": available_formats(app_config.get("THUMBNAIL_OUTPUT_FORMATS", [])),
+            "preview": available_formats(app_config.get("PREVIEW_OUTPUT_FORMATS", [])),
+        }
+        self._encode_options = {
+            'jpeg': {"quality": app_config.get("JPEG_QUALITY", 80)},
+            'webp': {"quality": app_config.get("WEBP_QUALITY", 80), "method": app_config.get("WEBP_METHOD", 4)},
+            'avif': {"quality": app_config.get("AVIF_QUALITY", 60), "speed": app_config.get("AVIF_SPEED", 8)},
+        }
+        for rendition, formats in self._output_formats.items():
+            logger.info(f"{rendition} 输出格式: {', '.join(formats + [DEFAULT_IMAGE_FORMAT])}")
+
+        pregenerate_workers = app_config.get("THUMBNAIL_PREGENERATE_WORKERS")
+        if pregenerate_workers is None:
+            pregenerate_workers = 1
+        # 预生成无法得知浏览器支持哪些格式，按优先级最高的格式生成，这是现代浏览器通常会选中的格式
+        thumbnail_formats = self._output_formats["thumbnail"]
+        self._pregenerate_format = thumbnail_formats[0] if thumbnail_formats else DEFAULT_IMAGE_FORMAT
+        self._thumbnail_pregenerator = ThumbnailPregenerator(
+            self._resolve_thumbnail_job, self._thumbnail_store.put, self._thumbnail_bounding_box_size,
+            pregenerate_workers, self._pregenerate_format, self._encode_options, self._scheduler)
+
     def _ensure_cache_dir_exists(self):
         logger.debug(f"检查缓存目录是否存在: {self._cache_dir}")
         if not os.path.exists(self._cache_dir):
@@ -38,8 +187,24 @@ class FileManager:
                 logger.error(f"无法创建缓存目录 {self._cache_dir}: {e}", exc_info=True)
                 pass
 
-    def find_image_pairs(self, jpg_folder_path, raw_folder_path):
-        logger.info(f"开始在文件夹中查找图片对: JPG='{jpg_folder_path}', RAW='{raw_folder_path}'")
+    def find_image_pairs(self, jpg_folder_path, raw_folder_path, use_index=True):
+        """查找全部图片对，并按修改时间和文件名排序后返回。"""
+        image_pairs = []
+        for batch in self.iter_image_pairs(jpg_folder_path, raw_folder_path, use_index=use_index):
+            image_pairs.extend(batch)
+
+        order = self.compute_display_order(image_pairs)
+        image_pairs = [image_pairs[i] for i in order]
+
+        logger.info(f"图片对查找完成，找到 {len(image_pairs)} 对。")
+        return image_pairs
+
+    def iter_image_pairs(self, jpg_folder_path, raw_folder_path, use_index=True, batch_size=200):
+        """
+        按扫描顺序分批产出图片对（每批为一个列表），不做排序，供流式加载边扫描边返回。
+        排序请在全部产出后调用 compute_display_order。没有找到任何图片对时抛出 NoImagePairsFoundError。
+        """
+        logger.info(f"开始在文件夹中查找图片对: JPG='{jpg_folder_path}', RAW='{raw_folder_path}', 使用索引={use_index}")
 
         if not os.path.isdir(jpg_folder_path):
             logger.error(f"JPG 文件夹不存在或不是目录: {jpg_folder_path}")
@@ -53,72 +218,105 @@ class FileManager:
         jpg_extensions = ('.jpg', '.jpeg', '.png')
         raw_extensions = ('.cr2', '.nef', '.arw', '.dng', '.orf', '.rw2', '.3fr', '.ari', '.bmq', '.cap', '.cin', '.cxr', '.drf', '.dcs', '.dcr', '.dqf', '.efw', '.erf', '.fff', '.iiq', '.jpeg', '.j6f', '.kdc', '.mos', '.mrf', '.nrw', '.pef', '.pxn', '.qtk', '.raf', '.raw', '.rdc', '.sr2', '.srf', '.srw', '.x3f')
 
-        jpg_files = {}
-        logger.debug(f"扫描 JPG 文件夹: {jpg_folder_path}")
-        try:
-            for filename in os.listdir(jpg_folder_path):
-                name, ext = os.path.splitext(filename)
-                if ext.lower() in jpg_extensions:
-                    jpg_files[name.lower()] = os.path.join(jpg_folder_path, filename)
-        except OSError as e:
-             logger.error(f"扫描 JPG 文件夹时发生错误: {jpg_folder_path}, 错误: {e}", exc_info=True)
-             raise ImageSelectorError(f"无法读取 JPG 文件夹内容: {jpg_folder_path}") from e
-
+        # 先完整扫描 RAW 文件夹（只需文件名），再流式扫描 JPG 文件夹，只对能配对的 JPG 记录文件状态。
+        # 目录 mtime 未变化时直接复用持久化索引中的条目；RAW 条目变化后，JPG 条目（按 RAW 基名过滤）也需重新扫描。
         raw_files = {}
+        raw_listing_reused = False
+        raw_listing_dirty = False
         if not is_viewer_mode:
-            logger.debug(f"扫描 RAW 文件夹: {raw_folder_path}")
+            raw_files, raw_dir_mtime = self._get_indexed_listing(raw_folder_path, 'raw', use_index)
+            raw_listing_reused = raw_files is not None
+            if not raw_listing_reused:
+                logger.debug(f"扫描 RAW 文件夹: {raw_folder_path}")
+                scanned_at = time.time()
+                sidecar_bases = set()
+                try:
+                    raw_files = self._scan_folder(raw_folder_path, raw_extensions, with_stat=False,
+                                                  sidecar_bases=sidecar_bases)
+                except OSError as e:
+                    logger.error(f"扫描 RAW 文件夹时发生错误: {raw_folder_path}, 错误: {e}", exc_info=True)
+                    raise ImageSelectorError(f"无法读取 RAW 文件夹内容: {raw_folder_path}") from e
+                # 编辑状态直接由同一次遍历得到的旁车文件集合确定，不再对每个 RAW 文件检查 .acr/.xmp 是否存在
+                for base_name_lower, raw_entry in raw_files.items():
+                    raw_entry['is_modified'] = base_name_lower in sidecar_bases
+                self._sidecar_snapshots[self._normalize_folder(raw_folder_path)] = (raw_dir_mtime, scanned_at, sidecar_bases)
+                self._folder_index.save_listing(raw_folder_path, 'raw', raw_dir_mtime, raw_files, scanned_at=scanned_at)
+        else:
+            logger.info(f"处于看图模式，只加载 JPG 文件: {jpg_folder_path}")
+
+        jpg_kind = 'jpg' if is_viewer_mode else f"jpg_paired:{os.path.normcase(os.path.abspath(raw_folder_path))}"
+        jpg_files, jpg_dir_mtime = self._get_indexed_listing(
+            jpg_folder_path, jpg_kind, use_index and (is_viewer_mode or raw_listing_reused))
+        jpg_listing_reused = jpg_files is not None
+        if jpg_listing_reused:
+            # 原地覆盖同名文件不会改变目录 mtime：重新读取每个条目的文件状态，只更新发生变化的条目
             try:
-                for filename in os.listdir(raw_folder_path):
-                    name, ext = os.path.splitext(filename)
-                    if ext.lower() in raw_extensions:
-                        raw_files[name.lower()] = os.path.join(raw_folder_path, filename)
+                changed = self._refresh_listing_stats(jpg_folder_path, jpg_files)
             except OSError as e:
-                logger.error(f"扫描 RAW 文件夹时发生错误: {raw_folder_path}, 错误: {e}", exc_info=True)
-                raise ImageSelectorError(f"无法读取 RAW 文件夹内容: {raw_folder_path}") from e
-
-        image_pairs = []
-        if is_viewer_mode:
-            # 看图模式：只加载 JPG 文件
-            logger.info(f"处于看图模式，只加载 JPG 文件: {jpg_folder_path}")
-            sorted_jpg_bases = sorted(list(jpg_files.keys()))
-            for base_name_lower in sorted_jpg_bases:
-                jpg_path = jpg_files.get(base_name_lower)
-                if jpg_path:
-                    original_base_name_jpg = os.path.splitext(os.path.basename(jpg_path))[0]
-                    image_pairs.append({
-                        "base_name": original_base_name_jpg,
-                        "jpg_path": jpg_path,
-                        "raw_path": None, # RAW 路径为空
-                    })
+                logger.error(f"扫描 JPG 文件夹时发生错误: {jpg_folder_path}, 错误: {e}", exc_info=True)
+                raise ImageSelectorError(f"无法读取 JPG 文件夹内容: {jpg_folder_path}") from e
+            if changed:
+                logger.info(f"索引中 {changed} 个 JPG 条目的文件状态已变化: {jpg_folder_path}")
+                self._folder_index.update_listing_entries(jpg_folder_path, jpg_kind, jpg_files)
+            jpg_entries = iter(list(jpg_files.items()))
         else:
-            # 正常模式：查找 JPG 和 RAW 对
-            common_bases_lower = set(jpg_files.keys()).intersection(set(raw_files.keys()))
-            logger.debug(f"找到的共有图片基名（忽略大小写）数量: {len(common_bases_lower)}")
-            sorted_common_bases_lower = sorted(list(common_bases_lower))
-
-            for base_name_lower in sorted_common_bases_lower:
-                jpg_path = jpg_files.get(base_name_lower)
-                raw_path = raw_files.get(base_name_lower)
-
-                if jpg_path and raw_path:
-                    original_base_name_jpg = os.path.splitext(os.path.basename(jpg_path))[0]
-                    image_pairs.append({
-                        "base_name": original_base_name_jpg,
-                        "jpg_path": jpg_path,
-                        "raw_path": raw_path,
-                    })
-                else:
-                    logger.warning(f"找到匹配的低层级基名 '{base_name_lower}' 但无法在字典中找到原始文件路径。逻辑错误或异常文件。跳过。")
-
-        # Sort image pairs by modification time and then by filename
+            logger.debug(f"扫描 JPG 文件夹: {jpg_folder_path}")
+            jpg_files = {}
+            jpg_scanned_at = time.time()
+            jpg_entries = self._iter_folder(jpg_folder_path, jpg_extensions,
+                                            wanted_bases=None if is_viewer_mode else raw_files.keys())
+
+        # 索引中仍然有效（size/mtime 未变化）的 EXIF 元数据随图片对一起返回
+        known_metadata = self._folder_index.get_folder_metadata(jpg_folder_path)
+
+        total_found = 0
+        batch = []
         try:
-            image_pairs.sort(key=lambda pair: (os.path.getmtime(pair['jpg_path']), os.path.basename(pair['jpg_path'])))
-            logger.debug("图片对已按修改时间和文件名排序。")
-        except Exception as e:
-            logger.error(f"排序图片对时发生错误: {e}", exc_info=True)
-            # Continue without sorting if an error occurs
+            for base_name_lower, jpg_entry in jpg_entries:
+                if not jpg_listing_reused:
+                    jpg_files[base_name_lower] = jpg_entry
+
+                pair = {
+                    "base_name": jpg_entry['base_name'],
+                    "jpg_path": jpg_entry['path'],
+                    "raw_path": None, # 看图模式下 RAW 路径为空
+                    "jpg_stat": jpg_entry['stat'],
+                    "is_modified": False,
+                }
+                if not is_viewer_mode:
+                    raw_entry = raw_files.get(base_name_lower)
+                    if raw_entry is None:
+                        continue
+                    # RAW 编辑状态在扫描时确定并随条目保存在索引中；只有旧版本索引的条目才需要单独检查
+                    if 'is_modified' not in raw_entry:
+                        raw_entry['is_modified'] = self.check_raw_modified_status(raw_entry['path'])
+                        raw_listing_dirty = True
+                    pair["raw_path"] = raw_entry['path']
+                    pair["is_modified"] = raw_entry['is_modified']
+
+                known = known_metadata.get(pair['jpg_path'])
+                if known and pair['jpg_stat'] and known[0] == pair['jpg_stat']['size'] and known[1] == pair['jpg_stat']['mtime']:
+                    pair['metadata'] = known[2]
+
+                batch.append(pair)
+                if len(batch) >= batch_size:
+                    total_found += len(batch)
+                    yield batch
+                    batch = []
+        except OSError as e:
+            logger.error(f"扫描 JPG 文件夹时发生错误: {jpg_folder_path}, 错误: {e}", exc_info=True)
+            raise ImageSelectorError(f"无法读取 JPG 文件夹内容: {jpg_folder_path}") from e
 
-        if not image_pairs:
+        if batch:
+            total_found += len(batch)
+            yield batch
+
+        if not jpg_listing_reused:
+            self._folder_index.save_listing(jpg_folder_path, jpg_kind, jpg_dir_mtime, jpg_files, scanned_at=jpg_scanned_at)
+        if raw_listing_dirty:
+            self._folder_index.update_listing_entries(raw_folder_path, 'raw', raw_files)
+
+        if total_found == 0:
             if is_viewer_mode:
                 logger.warning(f"在文件夹 '{jpg_folder_path}' 中没有找到 JPG 图片。")
                 raise NoImagePairsFoundError("在指定的 JPG 文件夹中没有找到图片。")
@@ -126,146 +324,337 @@ class FileManager:
                 logger.warning(f"在文件夹 '{jpg_folder_path}' 和 '{raw_folder_path}' 中没有找到匹配的图片对。")
                 raise NoImagePairsFoundError("在指定的文件夹中没有找到匹配的图片对。")
 
-        logger.info(f"图片对查找完成，找到 {len(image_pairs)} 对。")
-        return image_pairs
+        logger.info(f"图片对扫描完成，共产出 {total_found} 对。")
 
-    def _get_cache_path(self, original_file_path, suffix="thumb"):
+    def compute_display_order(self, image_pairs, sort_mode=DEFAULT_SORT_MODE):
+        """
+        返回按 sort_mode 排序后的下标列表（image_pairs 本身不变），默认按修改时间和文件名排序。
+        需要反复切换排序方式时请直接持有 SortKeys，避免重复计算排序键。
+        """
+        try:
+            sort_keys = SortKeys(image_pairs)
+            if sort_mode == "capture_time":
+                self.load_missing_metadata(image_pairs)
+                sort_keys.set_capture_times(image_pairs)
+            order = sort_keys.order(sort_mode)
+            logger.debug(f"图片对已按 {sort_mode} 排序。")
+            return order
+        except Exception as e:
+            logger.error(f"排序图片对时发生错误: {e}", exc_info=True)
+            # Continue without sorting if an error occurs
+            return list(range(len(image_pairs)))
+
+    def _get_indexed_listing(self, folder_path, kind, use_index):
+        """
+        返回 (索引中的条目字典或 None, 当前目录 mtime)。目录 mtime 与索引一致时才复用索引条目。
+        """
+        try:
+            dir_mtime = os.stat(folder_path).st_mtime
+        except OSError as e:
+            logger.error(f"读取文件夹状态时发生错误: {folder_path}, 错误: {e}", exc_info=True)
+            raise ImageSelectorError(f"无法读取文件夹内容: {folder_path}") from e
+
+        if use_index:
+            entries = self._folder_index.get_listing(folder_path, kind, dir_mtime)
+            if entries is not None:
+                logger.info(f"文件夹未变化，复用索引中的 {len(entries)} 个条目: {folder_path}")
+                return entries, dir_mtime
+        return None, dir_mtime
+
+    @staticmethod
+    def _refresh_listing_stats(folder_path, entries):
+        """
+        用 os.scandir 单次遍历重新读取索引条目（_iter_folder 的格式）的文件状态：size 或 mtime 变化的条目更新 stat，
+        已不存在的条目删除。不读取文件内容，也不检查新出现的文件（新文件会改变目录 mtime，索引不会被复用）。
+        返回变化的条目数。
+        """
+        changed = 0
+        seen = set()
+        with os.scandir(folder_path) as dir_entries:
+            for dir_entry in dir_entries:
+                base_lower = os.path.splitext(dir_entry.name)[0].lower()
+                entry = entries.get(base_lower)
+                if entry is None or entry['stat'] is None or os.path.basename(entry['path']) != dir_entry.name:
+                    continue
+                try:
+                    entry_stat = dir_entry.stat()
+                except OSError as e:
+                    logger.warning(f"读取文件状态失败，跳过: {dir_entry.path}, 错误: {e}")
+                    continue
+                seen.add(base_lower)
+                if entry['stat']['size'] != entry_stat.st_size or entry['stat']['mtime'] != entry_stat.st_mtime:
+                    entry['stat'] = {"size": entry_stat.st_size, "mtime": entry_stat.st_mtime, "inode": entry_stat.st_ino}
+                    changed += 1
+        for base_lower in [base_lower for base_lower, entry in entries.items()
+                           if entry['stat'] is not None and base_lower not in seen]:
+            del entries[base_lower]
+            changed += 1
+        return changed
+
+    def _scan_folder(self, folder_path, extensions, wanted_bases=None, with_stat=True, sidecar_bases=None):
+        """使用 os.scandir 单次遍历目录，返回 {小写基名: 条目}，条目格式见 _iter_folder。"""
+        return dict(self._iter_folder(folder_path, extensions, wanted_bases=wanted_bases, with_stat=with_stat,
+                                      sidecar_bases=sidecar_bases))
+
+    def _iter_folder(self, folder_path, extensions, wanted_bases=None, with_stat=True, sidecar_bases=None):
+        """
+        使用 os.scandir 单次遍历目录，逐个产出 (小写基名, {"base_name": 原始基名, "path": 路径, "stat": 文件状态})。
+        文件状态 {"size", "mtime", "inode"} 取自 DirEntry，在同一次遍历中记录，供排序、缓存键和过期检查复用。
+        wanted_bases 不为 None 时，只保留基名在其中的文件；with_stat=False 时不读取文件状态（stat 为 None）。
+        sidecar_bases 不为 None 时，同一次遍历中遇到的 .xmp/.acr 旁车文件的小写基名会加入该集合。
+        """
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                name, ext = os.path.splitext(entry.name)
+                ext = ext.lower()
+                if sidecar_bases is not None and ext in SIDECAR_EXTENSIONS:
+                    sidecar_bases.add(name.lower())
+                    continue
+                if ext not in extensions:
+                    continue
+                base_lower = name.lower()
+                if wanted_bases is not None and base_lower not in wanted_bases:
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    entry_stat = entry.stat() if with_stat else None
+                except OSError as e:
+                    logger.warning(f"读取文件状态失败，跳过: {entry.path}, 错误: {e}")
+                    continue
+                yield base_lower, {
+                    "base_name": name,
+                    "path": entry.path,
+                    "stat": {
+                        "size": entry_stat.st_size,
+                        "mtime": entry_stat.st_mtime,
+                        "inode": entry_stat.st_ino,
+                    } if entry_stat is not None else None,
+                }
+
+    def _get_cache_key(self, original_file_path, suffix="thumb", file_stat=None):
+        """缓存存储中的键：原图路径、mtime 与 suffix（区分尺寸与输出格式）的 SHA-256。"""
         try:
             abs_file_path = os.path.abspath(original_file_path)
-            mtime = os.path.getmtime(abs_file_path)
+            mtime = file_stat['mtime'] if file_stat else os.path.getmtime(abs_file_path)
             unique_string = f"{abs_file_path}-{mtime}-{self._thumbnail_width}-{suffix}"
-            cache_hash = hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
-
-            original_name = os.path.basename(original_file_path)
-            base, _ = os.path.splitext(original_name)
-
-            cache_filename = f"{cache_hash}_{base}_{suffix}.jpeg"
-
-            cache_file_path = os.path.join(self._cache_dir, cache_filename)
-
-            return cache_file_path
+            return hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
         except Exception as e:
-             logger.error(f"生成缓存路径时发生错误 for '{original_file_path}': {e}", exc_info=True)
-             raise ImageSelectorError(f"无法生成缓存文件路径: {os.path.basename(original_file_path)}") from e
-
-    def get_thumbnail(self, file_path):
-        logger.info(f"尝试获取缩略图 for: {os.path.basename(file_path)}")
+             logger.error(f"生成缓存键时发生错误 for '{original_file_path}': {e}", exc_info=True)
+             raise ImageSelectorError(f"无法生成缓存键: {os.path.basename(original_file_path)}") from e
+
+    @staticmethod
+    def _thumbnail_cache_suffix(size, image_format):
+        """缩略图缓存键的后缀，区分尺寸与输出格式。"""
+        return f"thumb-{size}.{image_format}"
+
+    def get_thumbnail_width(self):
+        return self._thumbnail_width
+
+    def get_thumbnail_sizes(self):
+        """缩略图尺寸阶梯（升序）。"""
+        return list(self._thumbnail_sizes)
+
+    def resolve_thumbnail_size(self, size=None):
+        """把请求的尺寸对齐到阶梯中不小于它的最小一级（超出时取最大一级）；None 表示基准尺寸。"""
+        if size is None:
+            return self._thumbnail_width
+        for ladder_size in self._thumbnail_sizes:
+            if ladder_size >= size:
+                return ladder_size
+        return self._thumbnail_sizes[-1]
+
+    def resolve_preview_size(self, width, height, device_pixel_ratio=1.0):
+        """
+        把预览区域（CSS 像素）与设备像素比换算为覆盖它所需的最长边，对齐到 PREVIEW_SIZES 中不小于它的最小一档；
+        超过最大一档（或未配置档位）时返回 None，即原始分辨率。
+        """
+        needed = math.ceil(max(width or 0, height or 0) * device_pixel_ratio)
+        for preview_size in self._preview_sizes:
+            if preview_size >= needed:
+                return preview_size
+        return None
+
+    def choose_image_format(self, rendition, accept_mimetypes):
+        """根据请求的 Accept 头选择 rendition（"thumbnail" 或 "preview"）的输出格式（见 choose_format）。"""
+        return choose_format(self._output_formats[rendition], accept_mimetypes)
+
+    def start_thumbnail_pregeneration(self, image_pairs, order, focus_position=0):
+        """加载完成后在后台进程池中预生成全部缩略图，从 focus_position（显示位置）开始向两侧推进。"""
+        self._thumbnail_pregenerator.start(
+            [(pair['jpg_path'], pair.get('jpg_stat')) for pair in image_pairs], order, focus_position)
+
+    def prioritize_thumbnail_pregeneration(self, focus_position, order=None):
+        """用户跳转（或显示顺序变化，此时提供 order）后，从新的显示位置重新向外预生成。"""
+        if order is not None:
+            self._thumbnail_pregenerator.set_order(order, focus_position)
+        else:
+            self._thumbnail_pregenerator.prioritize(focus_position)
 
-        if not os.path.exists(file_path):
-             logger.error(f"尝试获取缩略图时文件未找到: {file_path}")
-             raise FileNotFoundError(f"图片文件未找到: {os.path.basename(file_path)}")
+    def cancel_thumbnail_pregeneration(self):
+        self._thumbnail_pregenerator.cancel()
 
-        cache_path = self._get_cache_path(file_path, suffix="thumb")
+    def get_thumbnail_pregeneration_status(self):
+        return self._thumbnail_pregenerator.get_status()
 
-        if os.path.exists(cache_path):
-            try:
-                original_mtime = os.path.getmtime(file_path)
-                cache_mtime = os.path.getmtime(cache_path)
-                cache_size = os.path.getsize(cache_path)
-
-                if cache_mtime >= original_mtime and cache_size > 0:
-                    logger.debug(f"缩略图缓存命中且未过期: {os.path.basename(file_path)}")
-                    with open(cache_path, 'rb') as f:
-                        img_bytes = io.BytesIO(f.read())
-                    img_bytes.seek(0)
-                    return img_bytes
-                else:
-                    logger.debug(f"缩略图缓存过期或无效，将重新生成: {os.path.basename(file_path)}")
-            except Exception as e:
-                 logger.warning(f"读取或检查缩略图缓存时发生错误 ({cache_path}): {e}. 将重新生成。", exc_info=True)
+    def get_thumbnail_memory_cache_stats(self):
+        """内存缩略图缓存的命中、未命中与淘汰计数。"""
+        return self._thumbnail_memory_cache.get_stats()
 
-        logger.debug(f"生成缩略图: {os.path.basename(file_path)}")
-        img = None
-        try:
-            try:
-                with Image.open(file_path) as original_img_handle:
-                    img = ImageOps.exif_transpose(original_img_handle)
+    def get_thumbnail_store_stats(self):
+        """磁盘缩略图缓存的包文件数量、占用空间与回收计数。"""
+        return self._thumbnail_store.get_stats()
 
-                if img is None:
-                    logger.error(f"使用 with Image.open 打开图片后 img 对象为 None: {file_path}")
-                    print(f"--- Image.open returned None after with block: {file_path} ---", file=sys.stderr,
-                          flush=True)
-                    return None
-
-            except RecursionError as re:
-                print(f"--- Thumbnail generator RecursionError (suppressed): {file_path} ---", file=sys.stderr,
-                      flush=True)
-                try:
-                    logger.error(f"生成缩略图时捕获到 RecursionError: {file_path}")
-                except Exception:
-                    pass
-                return None
-
-            except FileNotFoundError:
-                logger.error(f"生成缩略图文件未找到: {file_path}")
-                print(f"--- Thumbnail FileNotFoundError: {file_path} ---", file=sys.stderr, flush=True)
-                return None
-
-            except Exception as e:
-                logger.error(f"打开或转置图片 '{file_path}' 时发生错误: {e}")
-                print(f"--- Error opening/transposing thumbnail {file_path}: {e} ---", file=sys.stderr, flush=True)
-                return None
+    def get_preview_cache_stats(self):
+        """预览图内存缓存与磁盘缓存的命中率、占用与淘汰计数，以及被更新的请求取代而放弃的渲染次数。"""
+        return {
+            "memory": self._preview_memory_cache.get_stats(),
+            "disk": self._preview_store.get_stats(),
+            "requests": self._preview_supersession.get_stats(),
+        }
 
-            img_width, img_height = img.size
-            if img_width <= 0 or img_height <= 0:
-                logger.warning(f"图片尺寸无效 ({img_width}x{img_height})，无法生成缩略图: {file_path}")
-                print(f"--- Thumbnail invalid size {file_path}: {img_width}x{img_height} ---", file=sys.stderr,
-                      flush=True)
-                return None
+    def begin_preview_request(self, client_id):
+        """登记浏览器标签页 client_id 的一次预览请求，返回传给 get_preview_image 的 is_superseded。"""
+        return self._preview_supersession.begin(client_id)
 
-            box_width, box_height = self._thumbnail_bounding_box_size
-            scale = min(box_width / img_width, box_height / img_height)
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
-            new_width = max(1, new_width)
-            new_height = max(1, new_height)
+    def prefetch_previews(self, navigated_path, tasks):
+        """导航到 navigated_path 后在后台依次执行 tasks（见 PreviewPrefetcher.schedule），取消上一次导航的预取。"""
+        self._preview_prefetcher.schedule(navigated_path, tasks)
 
-            resized_img = None
-            try:
-                resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            except Exception as e:
-                logger.error(f"缩放图片 '{file_path}' 时发生错误: {e}")
-                print(f"--- Error resizing thumbnail {file_path}: {e} ---", file=sys.stderr, flush=True)
-                return None
+    def cancel_preview_prefetch(self):
+        self._preview_prefetcher.cancel()
 
-            if resized_img is None:
-                logger.error(f"缩放图片后 resized_img 对象为 None: {file_path}")
-                print(f"--- Resized image is None: {file_path} ---", file=sys.stderr, flush=True)
-                return None
+    def get_preview_prefetch_stats(self):
+        """预取任务计数，以及导航后预览已在缓存中的比例。"""
+        return self._preview_prefetcher.get_stats()
 
-            padding_color = (249, 249, 249, 0)
-            padded_img = Image.new("RGBA", self._thumbnail_bounding_box_size, padding_color)
+    def record_preview_request(self, file_path, max_size, image_format, outcome):
+        """
+        记录一次预览请求：之后的预取按同样的最长边与格式生成（浏览器窗口与支持的格式通常不变），
+        并把结果（'hit'、'miss' 或 'passthrough'）计入预取命中率。
+        """
+        self._prefetch_rendition = (max_size, image_format)
+        self._preview_prefetcher.record_request(file_path, outcome)
+
+    def warm_preview(self, file_path, file_stat=None):
+        """按最近一次请求的预览规格预先生成并缓存预览图；原图可直接发送时无需生成。"""
+        max_size, image_format = self._prefetch_rendition
+        if self.get_preview_passthrough_path(file_path, max_size, image_format, file_stat) is not None:
+            return
+        self.get_preview_image(file_path, max_size, image_format, file_stat, priority=BACKGROUND)
+
+    def is_preview_cached(self, file_path, max_size=None, image_format=DEFAULT_IMAGE_FORMAT, file_stat=None):
+        """预览图是否已在内存或磁盘缓存中，不读取缓存内容也不计入缓存命中统计。"""
+        if file_stat is None:
+            original_stat = os.stat(file_path)
+            file_stat = {"size": original_stat.st_size, "mtime": original_stat.st_mtime, "inode": original_stat.st_ino}
+        memory_key = (file_path, file_stat['mtime'], file_stat['size'], max_size, image_format)
+        if self._preview_memory_cache.contains(memory_key):
+            return True
+        cache_key = self._get_cache_key(file_path, suffix=f"preview-{max_size or 'full'}.{image_format}",
+                                        file_stat=file_stat)
+        return self._preview_store.contains(cache_key)
+
+    def get_scheduler_stats(self):
+        """各优先级正在执行、等待中的任务数与平均等待时间。"""
+        return self._scheduler.get_stats()
+
+    def set_frame_focus(self, file_paths):
+        """导航后指定需要保留已解码帧的图片（当前图片及其相邻图片），其余的帧立即释放。"""
+        self._decoded_frames.set_focus(file_paths)
+
+    def get_decoded_frame_stats(self):
+        """已保留的解码帧数量与占用，以及复用、解码、换成更大帧与淘汰的次数。"""
+        return self._decoded_frames.get_stats()
+
+    def get_decode_memory_stats(self):
+        """解码内存预算、正在进行的解码占用与峰值，以及等待、改用缩小解码的次数。"""
+        return self._decode_governor.get_stats()
+
+    def get_tile_cache_stats(self):
+        """瓦片磁盘缓存与已解码层级的占用。"""
+        return {
+            "decoded": self._tile_pyramid.get_stats(),
+            "disk": self._tile_store.get_stats(),
+        }
 
-            paste_x = (box_width - new_width) // 2
-            paste_y = (box_height - new_height) // 2
+    def _resolve_thumbnail_job(self, file_path, file_stat):
+        """返回预生成需要写入的缓存键；缓存中已存在时返回 None。"""
+        if file_stat is None:
+            original_stat = os.stat(file_path)
+            file_stat = {"size": original_stat.st_size, "mtime": original_stat.st_mtime, "inode": original_stat.st_ino}
+        cache_key = self._get_cache_key(
+            file_path, suffix=self._thumbnail_cache_suffix(self._thumbnail_width, self._pregenerate_format),
+            file_stat=file_stat)
+        if self._thumbnail_store.contains(cache_key):
+            return None
+        return cache_key
+
+    def get_image_version(self, file_path, file_stat=None):
+        """
+        图片内容版本：由路径、mtime、大小和渲染参数计算，用于内容寻址的图片 URL 与 ETag，不读取图片内容。
+        file_stat 为扫描时记录的文件状态，未提供时 stat 一次。
+        """
+        if file_stat is None:
+            original_stat = os.stat(file_path)
+            file_stat = {"size": original_stat.st_size, "mtime": original_stat.st_mtime, "inode": original_stat.st_ino}
+        source = (f"{file_path}\0{file_stat['mtime']}\0{file_stat['size']}\0{RENDITION_VERSION}\0"
+                  f"{self._thumbnail_width}\0{self._thumbnail_sizes}\0{self._tile_pyramid.tile_size}")
+        return hashlib.blake2b(source.encode('utf-8'), digest_size=8).hexdigest()
+
+    def get_thumbnail(self, file_path, file_stat=None, image_format=DEFAULT_IMAGE_FORMAT, size=None, priority=VISIBLE):
+        """
+        获取按 image_format 编码的缩略图字节（bytes），无法生成时返回 None。file_stat 为扫描时记录的 {"size", "mtime", "inode"}，
+        提供时直接用于缓存键和过期检查，不再对原图重复 stat。size 为请求的尺寸，按 resolve_thumbnail_size 对齐到阶梯。
+        缓存未命中时按 priority 向调度器申请名额后再生成。
+        """
+        size = self.resolve_thumbnail_size(size)
+        logger.debug(f"尝试获取缩略图 for: {os.path.basename(file_path)}")
 
+        if file_stat is None:
             try:
-                padded_img.paste(resized_img, (paste_x, paste_y))
-
-            except Exception as e:
-                logger.error(f"粘贴缩放后的图片到填充背景时发生错误: {file_path}, {e}")
-                print(f"--- Error pasting thumbnail {file_path}: {e} ---", file=sys.stderr, flush=True)
-                return None
-
-            img_thumb = padded_img
+                original_stat = os.stat(file_path)
+            except FileNotFoundError:
+                logger.error(f"尝试获取缩略图时文件未找到: {file_path}")
+                raise FileNotFoundError(f"图片文件未找到: {os.path.basename(file_path)}") from None
+            file_stat = {"size": original_stat.st_size, "mtime": original_stat.st_mtime, "inode": original_stat.st_ino}
+
+        memory_key = (file_path, file_stat['mtime'], file_stat['size'], size, image_format)
+        cached_bytes = self._thumbnail_memory_cache.get(memory_key)
+        if cached_bytes is not None:
+            return cached_bytes
+
+        # 缓存键包含原图 mtime，原图修改后自然不会命中旧的缩略图
+        cache_key = self._get_cache_key(file_path, suffix=self._thumbnail_cache_suffix(size, image_format),
+                                        file_stat=file_stat)
+        cached_bytes = self._thumbnail_store.get(cache_key)
+        if cached_bytes is not None:
+            logger.debug(f"缩略图缓存命中: {os.path.basename(file_path)}")
+            self._thumbnail_memory_cache.put(memory_key, cached_bytes)
+            return cached_bytes
 
-            # 如果是 RGBA 模式，转换为 RGB，因为 JPEG 不支持 Alpha 通道
-            if img_thumb.mode == 'RGBA':
-                img_thumb = img_thumb.convert('RGB')
+        logger.debug(f"生成缩略图: {os.path.basename(file_path)}")
+        try:
+            with self._scheduler.slot(priority, file_path):
+                img_thumb = self._downscale_larger_rendition(file_path, file_stat, size)
+                if img_thumb is None:
+                    img_thumb = self._thumbnail_from_decoded_frame(file_path, file_stat, size)
+                if img_thumb is None:
+                    decode_options = self._thumbnail_decode_options(file_path, size)
+                    with self._decode_governor.admit(decode_options, file_path) as reducing_gap:
+                        img_thumb = render_thumbnail(file_path, (size, size), reducing_gap)
+                if img_thumb is None:
+                    return None
 
-            if cache_path:
                 try:
-                    img_thumb.save(cache_path, "JPEG") # 将缓存格式改为 JPEG
-                except Exception as e:
-                    logger.error(f"保存缩略图到缓存失败: {cache_path}: {e}")
-                    print(f"--- Error saving thumbnail cache {cache_path}: {e} ---", file=sys.stderr, flush=True)
-
-            img_byte_stream = io.BytesIO()
-            img_thumb.save(img_byte_stream, format='JPEG')
-            img_byte_stream.seek(0)
+                    thumbnail_bytes = encode_thumbnail(img_thumb, image_format, self._encode_options)
+                finally:
+                    img_thumb.close()
+            self._thumbnail_store.put(cache_key, thumbnail_bytes)
+            self._thumbnail_memory_cache.put(memory_key, thumbnail_bytes)
 
-            logger.debug(f"生成带填充的缩略图成功并转换为字节流: {file_path}")
-            return img_byte_stream
+            logger.debug(f"生成 {size}px 缩略图成功: {file_path}")
+            return thumbnail_bytes
 
         except Exception as e:
             logger.error(f"生成缩略图: '{file_path}' 时发生未预料错误 (处理阶段): {e}", exc_info=True)
@@ -273,89 +662,291 @@ class FileManager:
                   flush=True)
             raise ImageProcessingError(f"生成缩略图失败: {os.path.basename(file_path)}") from e
 
-    def get_image_metadata(self, file_path):
-        logger.info(f"尝试获取图片元数据 for: {os.path.basename(file_path)}")
-        metadata = {
-            "date_taken": None,
-            "camera_make": None,
-            "camera_model": None,
-            "lens_model": None
-        }
+    @staticmethod
+    def _thumbnail_decode_options(file_path, size):
+        """
+        缩略图解码方式（供 DecodeMemoryGovernor 选择）：通常多解码一倍再缩放以保证画质，
+        内存紧张时改为只解码到缩略图尺寸（reducing_gap 为 1），结果尺寸相同。
+        """
         try:
-            with Image.open(file_path) as img:
-                exif_data = img._getexif()
-                if exif_data:
-                    exif = {
-                        ExifTags.TAGS[k]: v
-                        for k, v in exif_data.items()
-                        if k in ExifTags.TAGS
-                    }
-
-                    # 拍摄日期
-                    if 'DateTimeOriginal' in exif:
-                        metadata['date_taken'] = exif['DateTimeOriginal']
-                    elif 'DateTimeDigitized' in exif:
-                        metadata['date_taken'] = exif['DateTimeDigitized']
-                    elif 'DateTime' in exif:
-                        metadata['date_taken'] = exif['DateTime']
-
-                    # 相机制造商和型号
-                    if 'Make' in exif:
-                        metadata['camera_make'] = exif['Make']
-                    if 'Model' in exif:
-                        metadata['camera_model'] = exif['Model']
-
-                    # 镜头型号 (通常在 Exif IFD 或 MakerNote 中，这里只尝试常见的标签)
-                    if 'LensModel' in exif:
-                        metadata['lens_model'] = exif['LensModel']
-                    elif 'Lens' in exif: # Some cameras might use 'Lens'
-                        metadata['lens_model'] = exif['Lens']
+            return [(estimate_decode_bytes(file_path, (size, size), gap), gap)
+                    for gap in (REDUCING_GAP, PREVIEW_REDUCING_GAP)]
+        except Exception:
+            # 无法读取的文件交给 render_thumbnail 报告
+            return [(0, REDUCING_GAP)]
+
+    def _thumbnail_from_decoded_frame(self, file_path, file_stat, size):
+        """当前或相邻图片已有足够大的解码帧（通常来自预览）时由它缩小得到缩略图，不再读取原图；没有时返回 None。"""
+        with self._decoded_frames.peek(file_path, file_stat, (size, size), REDUCING_GAP) as frame:
+            if frame is None:
+                return None
+            logger.debug(f"由已解码的帧生成 {size}px 缩略图: {os.path.basename(file_path)}")
+            return thumbnail_from_frame(frame, (size, size))
 
-        except Exception as e:
-            logger.warning(f"无法从文件 '{file_path}' 读取 EXIF 数据: {e}", exc_info=True)
-            # 如果无法读取，则返回 None 或默认值
-            return {
-                "date_taken": None,
-                "camera_make": None,
-                "camera_model": None,
-                "lens_model": None
-            }
+    def _downscale_larger_rendition(self, file_path, file_stat, size):
+        """
+        从磁盘缓存中最接近的更大一级缩略图（任意输出格式）缩小得到 size 尺寸的缩略图，不再解码原图；
+        没有更大的缓存时返回 None。
+        """
+        formats = dict.fromkeys(self._output_formats["thumbnail"] + self._output_formats["preview"] + [DEFAULT_IMAGE_FORMAT])
+        for larger_size in self._thumbnail_sizes:
+            if larger_size <= size:
+                continue
+            for image_format in formats:
+                cache_key = self._get_cache_key(file_path, suffix=self._thumbnail_cache_suffix(larger_size, image_format),
+                                                file_stat=file_stat)
+                data = self._thumbnail_store.get(cache_key)
+                if data is None:
+                    continue
+                try:
+                    img = downscale_thumbnail(data, (size, size))
+                except Exception as e:
+                    logger.warning(f"无法从 {larger_size}px 缓存缩略图生成 {size}px 缩略图: {file_path}: {e}")
+                    continue
+                logger.debug(f"由 {larger_size}px 缓存缩略图生成 {size}px 缩略图: {os.path.basename(file_path)}")
+                return img
+        return None
+
+    def get_image_metadata(self, file_path, file_stat=None):
+        logger.info(f"尝试获取图片元数据 for: {os.path.basename(file_path)}")
+        cached_metadata = self._folder_index.get_metadata(file_path, file_stat)
+        if cached_metadata is not None:
+            logger.debug(f"元数据索引命中: {os.path.basename(file_path)}")
+            return cached_metadata
+
+        metadata = self._read_exif_metadata(file_path)
+        if metadata is None:
+            # 如果无法读取，则返回默认值（不写入索引，下次仍会重试）
+            return empty_metadata()
+        self._folder_index.save_metadata(file_path, file_stat, metadata)
         return metadata
 
-    def get_preview_image(self, file_path):
-        logger.info(f"尝试获取预览图片 for: {os.path.basename(file_path)}")
+    def load_missing_metadata(self, image_pairs):
+        """
+        为尚未附带 metadata 的图片对读取 EXIF 元数据（扫描时已从索引附加的不会重复读取），在线程池中分批并行读取，
+        结果写回 pair['metadata']，并按批在一个事务中保存到索引。等待全部读取完成，返回新读取的数量。
+        """
+        loaded = self._metadata_loader.load_all(image_pairs)
+        if loaded:
+            logger.info(f"批量读取了 {loaded} 张图片的 EXIF 元数据。")
+        return loaded
 
-        if not os.path.exists(file_path):
-             logger.error(f"尝试获取预览图片时文件未找到: {file_path}")
-             raise FileNotFoundError(f"图片文件未找到: {os.path.basename(file_path)}")
+    def start_metadata_loading(self, image_pairs, order, focus_position=0):
+        """加载文件夹后在后台从当前位置向两侧分批读取所有图片的 EXIF 元数据（见 MetadataLoader）。"""
+        self._metadata_loader.start(image_pairs, order, focus_position)
 
-        try:
-            img = Image.open(file_path)
-            logger.debug(f"Pillow 成功打开图片: {os.path.basename(file_path)}, 模式: {img.mode}, 尺寸: {img.size}")
+    def request_metadata(self, pair):
+        """让后台尽快读取 pair 的元数据（用户切换到了尚未读取的图片），不等待。"""
+        self._metadata_loader.request(pair)
 
-            img = ImageOps.exif_transpose(img)
-            logger.debug("应用 EXIF 转置。")
+    def cancel_metadata_loading(self):
+        self._metadata_loader.cancel()
 
-            if img.mode in ('RGBA', 'P'):
-                 logger.debug("Converting image mode to RGB for preview.")
-                 img = img.convert('RGB')
-            elif img.mode != 'RGB':
-                 logger.debug(f"Converting image mode {img.mode} to RGB for preview.")
-                 img = img.convert('RGB')
+    def get_metadata_loading_status(self):
+        """后台 EXIF 读取的进度与队列深度。"""
+        return self._metadata_loader.get_status()
 
-            byte_io = io.BytesIO()
-            img.save(byte_io, format='JPEG', optimize=True, quality=80)
-            byte_io.seek(0)
-            logger.debug(f"预览图片生成并返回成功: {os.path.basename(file_path)}, BytesIO size: {byte_io.getbuffer().nbytes} bytes")
+    def _read_exif_metadata(self, file_path):
+        """只读取文件头部的 EXIF（见 exif_reader），无法读取时返回 None。"""
+        try:
+            return read_exif_metadata(file_path)
+        except Exception as e:
+            logger.warning(f"无法从文件 '{file_path}' 读取 EXIF 数据: {e}")
+            return None
 
-            return byte_io
+    def get_preview_passthrough_path(self, file_path, max_size=None, image_format=DEFAULT_IMAGE_FORMAT, file_stat=None):
+        """
+        原图无需解码和重新编码即可作为预览时（见 read_passthrough_info）返回其路径，由 Web 服务器直接发送文件；
+        否则返回 None，由 get_preview_image 生成。
+        浏览器接受更小的格式时，限定尺寸的预览仍重新编码以减少传输量；原始分辨率的预览重新编码代价太高，总是直接发送。
+        判断按文件状态保存在文件夹索引中，每个文件版本只用 Pillow 读取一次文件头，之后（包括 304 重新验证）不再打开文件。
+        """
+        if max_size and image_format != DEFAULT_IMAGE_FORMAT:
+            return None
+        box_size = (max_size, max_size) if max_size else None
+        try:
+            if passthrough_fits(self._get_passthrough_info(file_path, file_stat), box_size):
+                return file_path
+        except FileNotFoundError:
+            logger.error(f"尝试获取预览图片时文件未找到: {file_path}")
+            raise FileNotFoundError(f"图片文件未找到: {os.path.basename(file_path)}") from None
+        except Exception as e:
+            # 无法识别的文件交给 get_preview_image 处理并报告错误
+            logger.debug(f"无法读取文件头判断能否直接发送原图: {file_path}, 错误: {e}")
+        return None
+
+    def _get_passthrough_info(self, file_path, file_stat=None):
+        if file_stat is None:
+            original_stat = os.stat(file_path)
+            file_stat = {"size": original_stat.st_size, "mtime": original_stat.st_mtime, "inode": original_stat.st_ino}
+        info = self._folder_index.get_passthrough_info(file_path, file_stat)
+        if info is None:
+            info = read_passthrough_info(file_path)
+            self._folder_index.save_passthrough_info(file_path, file_stat, info)
+        return info
+
+    def get_preview_image(self, file_path, max_size=None, image_format=DEFAULT_IMAGE_FORMAT, file_stat=None,
+                          is_superseded=None, priority=INTERACTIVE):
+        """
+        获取预览图片的字节（bytes，按 image_format 编码）。max_size 为最长边上限（像素），提供时只解码到所需分辨率并缩放；
+        为 None 时保持原始分辨率。结果与缩略图一样先查内存缓存、再查磁盘缓存，都未命中时才解码原图；
+        file_stat 为扫描时记录的文件状态，用于缓存键。
+        缓存未命中时按 priority（后台预取为 BACKGROUND）向调度器申请名额后再解码。
+        is_superseded 为浏览器请求提供（见 RequestSupersession）：在等待名额、解码前与编码前被取代时抛出 RenderSupersededError；
+        缓存命中的预览总是直接返回。
+        """
+        logger.info(f"尝试获取预览图片 for: {os.path.basename(file_path)}")
 
+        if file_stat is None:
+            try:
+                original_stat = os.stat(file_path)
+            except FileNotFoundError:
+                logger.error(f"尝试获取预览图片时文件未找到: {file_path}")
+                raise FileNotFoundError(f"图片文件未找到: {os.path.basename(file_path)}") from None
+            file_stat = {"size": original_stat.st_size, "mtime": original_stat.st_mtime, "inode": original_stat.st_ino}
+
+        memory_key = (file_path, file_stat['mtime'], file_stat['size'], max_size, image_format)
+        cached_bytes = self._preview_memory_cache.get(memory_key)
+        if cached_bytes is not None:
+            logger.debug(f"预览图片内存缓存命中: {os.path.basename(file_path)}")
+            return cached_bytes
+
+        cache_key = self._get_cache_key(file_path, suffix=f"preview-{max_size or 'full'}.{image_format}",
+                                        file_stat=file_stat)
+        cached_bytes = self._preview_store.get(cache_key)
+        if cached_bytes is not None:
+            logger.debug(f"预览图片磁盘缓存命中: {os.path.basename(file_path)}")
+            self._preview_memory_cache.put(memory_key, cached_bytes)
+            return cached_bytes
+
+        self._raise_if_superseded(is_superseded, file_path)
+        # 先取得调度名额再加锁：持有锁的总是已经在生成的线程，交互请求不会在锁上等待仍在排队的后台预取
+        with self._scheduler.slot(priority, file_path):
+            with self._preview_render_locks.hold(cache_key):
+                # 等待期间另一个线程（通常是后台预取）可能已生成同一张预览；本次请求的未命中已在上面统计过
+                cached_bytes = self._preview_memory_cache.get(memory_key, count=False)
+                if cached_bytes is None:
+                    cached_bytes = self._preview_store.get(cache_key, count=False)
+                    if cached_bytes is not None:
+                        self._preview_memory_cache.put(memory_key, cached_bytes)
+                if cached_bytes is not None:
+                    logger.debug(f"预览图片已由其它请求生成: {os.path.basename(file_path)}")
+                    return cached_bytes
+                self._raise_if_superseded(is_superseded, file_path)
+                return self._render_preview(file_path, file_stat, max_size, image_format, memory_key, cache_key,
+                                            is_superseded)
+
+    @staticmethod
+    def _raise_if_superseded(is_superseded, file_path):
+        if is_superseded is not None and is_superseded():
+            logger.info(f"预览请求已被更新的请求取代，放弃生成: {os.path.basename(file_path)}")
+            raise RenderSupersededError(f"预览请求已被取代: {os.path.basename(file_path)}")
+
+    def _render_preview(self, file_path, file_stat, max_size, image_format, memory_key, cache_key, is_superseded=None):
+        """
+        由解码帧生成预览图字节，写入内存与磁盘缓存。当前或相邻图片已有足够大的帧（见 DecodedFrameCache）时不再读取原图；
+        否则解码前向 DecodeMemoryGovernor 申请内存预算，预览尺寸是 URL 的一部分（浏览器永久缓存），
+        不能改用更小的解码比例，内存紧张时只能等待。中间结果在不再需要时立即关闭，不等垃圾回收。
+        """
+        img = None
+        frame = None
+        try:
+            box_size = (max_size, max_size) if max_size else None
+            # 等待内存预算期间可能已被更新的请求取代
+            before_decode = functools.partial(self._raise_if_superseded, is_superseded, file_path)
+            with self._decoded_frames.frame(file_path, file_stat, box_size, (PREVIEW_REDUCING_GAP,),
+                                            before_decode) as frame:
+                logger.debug(f"预览使用的解码帧: {os.path.basename(file_path)}, 模式: {frame.mode}, 尺寸: {frame.size}")
+
+                # 帧可能与缩略图、瓦片共用，不修改也不关闭
+                img = frame
+                if box_size and (img.width > max_size or img.height > max_size):
+                    img = img.resize(fit_size(img.size, box_size), Image.Resampling.LANCZOS)
+
+                if img.mode != 'RGB':
+                    logger.debug(f"Converting image mode {img.mode} to RGB for preview.")
+                    converted = img.convert('RGB')
+                    if img is not frame:
+                        img.close()
+                    img = converted
+
+                # 解码已完成，但编码（尤其是 AVIF）仍占大头，被取代时不再继续
+                self._raise_if_superseded(is_superseded, file_path)
+
+                options = self._encode_options
+                if image_format == DEFAULT_IMAGE_FORMAT:
+                    # 只有 JPEG 回退路径做哈夫曼表优化：预览较大，值得多花一点编码时间
+                    options = {**options, DEFAULT_IMAGE_FORMAT: {**options[DEFAULT_IMAGE_FORMAT], "optimize": True}}
+                preview_bytes = encode_image(img, image_format, options)
+            logger.debug(f"预览图片生成并返回成功: {os.path.basename(file_path)}, size: {len(preview_bytes)} bytes")
+
+            self._preview_store.put(cache_key, preview_bytes)
+            self._preview_memory_cache.put(memory_key, preview_bytes)
+            return preview_bytes
+
+        except RenderSupersededError:
+            raise
         except (FileNotFoundError, Image.UnidentifiedImageError) as e:
              logger.error(f"预览图片处理失败（文件不存在或不支持/损坏的格式）: {file_path}, 错误: {e}", exc_info=True)
              raise ImageProcessingError(f"无法处理预览图片文件或文件损坏: {os.path.basename(file_path)}") from e
         except Exception as e:
              logger.error(f"生成预览图片时发生意外错误: {file_path}, 错误: {e}", exc_info=True)
              raise ImageProcessingError(f"生成预览图片失败: {os.path.basename(file_path)}") from e
+        finally:
+            if img is not None and img is not frame:
+                img.close()
+
+    def get_tile_info(self, file_path):
+        """原图（显示方向）的尺寸、瓦片边长与最高层级（Deep Zoom 层级，最高层级为原始分辨率），只读取文件头。"""
+        try:
+            return self._tile_pyramid.get_info(file_path)
+        except FileNotFoundError:
+            logger.error(f"尝试获取瓦片信息时文件未找到: {file_path}")
+            raise FileNotFoundError(f"图片文件未找到: {os.path.basename(file_path)}") from None
+        except Exception as e:
+            logger.error(f"读取图片尺寸失败: {file_path}, 错误: {e}", exc_info=True)
+            raise ImageProcessingError(f"无法读取图片尺寸: {os.path.basename(file_path)}") from e
+
+    def get_tile(self, file_path, level, x, y, image_format=DEFAULT_IMAGE_FORMAT, file_stat=None):
+        """
+        获取 level 层级第 (x, y) 个瓦片的字节（按 image_format 编码），层级或坐标超出范围时返回 None。
+        先查磁盘缓存；未命中时只解码所需层级（见 TilePyramid），同一层级的其它瓦片复用解码结果。
+        """
+        if file_stat is None:
+            try:
+                original_stat = os.stat(file_path)
+            except FileNotFoundError:
+                logger.error(f"尝试获取瓦片时文件未找到: {file_path}")
+                raise FileNotFoundError(f"图片文件未找到: {os.path.basename(file_path)}") from None
+            file_stat = {"size": original_stat.st_size, "mtime": original_stat.st_mtime, "inode": original_stat.st_ino}
+
+        tile_size = self._tile_pyramid.tile_size
+        cache_key = self._get_cache_key(file_path, suffix=f"tile{tile_size}-{level}-{x}-{y}.{image_format}",
+                                        file_stat=file_stat)
+        cached_bytes = self._tile_store.get(cache_key)
+        if cached_bytes is not None:
+            return cached_bytes
+
+        info = self.get_tile_info(file_path)
+        box = self._tile_pyramid.tile_box(info, level, x, y)
+        if box is None:
+            return None
+        try:
+            with self._scheduler.slot(INTERACTIVE, file_path):
+                tile = self._tile_pyramid.render_tile(file_path, file_stat, info, level, box)
+                try:
+                    tile_bytes = encode_image(tile, image_format, self._encode_options)
+                finally:
+                    tile.close()
+        except (FileNotFoundError, Image.UnidentifiedImageError) as e:
+            logger.error(f"瓦片生成失败（文件不存在或不支持/损坏的格式）: {file_path}, 错误: {e}", exc_info=True)
+            raise ImageProcessingError(f"无法处理图片文件或文件损坏: {os.path.basename(file_path)}") from e
+        except Exception as e:
+            logger.error(f"生成瓦片 {level}/{x}/{y} 时发生意外错误: {file_path}, 错误: {e}", exc_info=True)
+            raise ImageProcessingError(f"生成瓦片失败: {os.path.basename(file_path)}") from e
+
+        self._tile_store.put(cache_key, tile_bytes)
+        return tile_bytes
 
     def open_file_with_default_app(self, file_path):
         logger.info(f"尝试使用系统默认程序打开文件: {file_path}")
@@ -419,6 +1010,7 @@ class FileManager:
     def check_raw_modified_status(self, raw_file_path):
         """
         检查给定的 RAW 文件是否有对应的 .acr 或 .xmp 编辑文件。
+        只用于单个文件；批量判断请使用扫描时收集的旁车文件集合（见 get_sidecar_bases）。
         """
         if not raw_file_path:
             return False
@@ -426,11 +1018,45 @@ class FileManager:
         base_name = os.path.splitext(os.path.basename(raw_file_path))[0]
         raw_dir = os.path.dirname(raw_file_path)
 
-        acr_path = os.path.join(raw_dir, f"{base_name}.acr")
-        xmp_path = os.path.join(raw_dir, f"{base_name}.xmp")
-
-        is_modified = os.path.exists(acr_path) or os.path.exists(xmp_path)
-        logger.debug(f"检查 RAW 文件 '{os.path.basename(raw_file_path)}' 的修改状态: ACR 存在={os.path.exists(acr_path)}, XMP 存在={os.path.exists(xmp_path)}. 结果: {is_modified}")
+        is_modified = any(os.path.exists(os.path.join(raw_dir, f"{base_name}{ext}")) for ext in SIDECAR_EXTENSIONS)
+        logger.debug(f"检查 RAW 文件 '{os.path.basename(raw_file_path)}' 的修改状态: {is_modified}")
         return is_modified
 
+    def get_sidecar_bases(self, raw_folder_path):
+        """
+        返回 (RAW 文件夹中 .xmp/.acr 旁车文件的小写基名集合, 相比上次是否重新收集)。
+        目录 mtime 与上次收集时一致（且超出时间粒度）时直接返回上次的集合，只需一次 stat；
+        否则单次 scandir 重新收集。新增或删除旁车文件都会改变目录 mtime。
+        """
+        folder_key = self._normalize_folder(raw_folder_path)
+        try:
+            dir_mtime = os.stat(raw_folder_path).st_mtime
+        except OSError as e:
+            logger.error(f"读取 RAW 文件夹状态时发生错误: {raw_folder_path}, 错误: {e}", exc_info=True)
+            raise ImageSelectorError(f"无法读取 RAW 文件夹内容: {raw_folder_path}") from e
+
+        snapshot = self._sidecar_snapshots.get(folder_key)
+        if snapshot and snapshot[0] == dir_mtime and dir_mtime < snapshot[1] - DIR_MTIME_GRANULARITY:
+            return snapshot[2], False
+
+        checked_at = time.time()
+        sidecar_bases = set()
+        try:
+            with os.scandir(raw_folder_path) as entries:
+                for entry in entries:
+                    name, ext = os.path.splitext(entry.name)
+                    if ext.lower() in SIDECAR_EXTENSIONS:
+                        sidecar_bases.add(name.lower())
+        except OSError as e:
+            logger.error(f"扫描 RAW 文件夹时发生错误: {raw_folder_path}, 错误: {e}", exc_info=True)
+            raise ImageSelectorError(f"无法读取 RAW 文件夹内容: {raw_folder_path}") from e
+
+        self._sidecar_snapshots[folder_key] = (dir_mtime, checked_at, sidecar_bases)
+        logger.debug(f"RAW 文件夹旁车文件已重新收集: {raw_folder_path}, 共 {len(sidecar_bases)} 个")
+        return sidecar_bases, True
+
+    @staticmethod
+    def _normalize_folder(folder_path):
+        return os.path.normcase(os.path.abspath(folder_path))
+
 file_manager = FileManager()
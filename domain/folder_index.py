@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 目录 mtime 的最粗时间粒度（FAT/exFAT 存储卡为 2 秒）。
+# 扫描时刻与目录 mtime 相差不足该值时，同一时间片内的后续修改无法被察觉，此时不信任索引。
+DIR_MTIME_GRANULARITY = 2.0
+
+
+class FolderIndex:
+    """
+    持久化的文件夹索引（SQLite），位于缓存目录旁。
+
+    folder_listings 表按文件夹路径保存上次扫描得到的条目（路径、文件状态、RAW 编辑状态）及当时的目录 mtime；
+    image_metadata 表按 JPG 路径保存 EXIF 元数据，passthrough_info 表保存原图能否直接作为预览发送的判断
+    （见 read_passthrough_info），都以 (size, mtime) 校验其是否仍然有效。
+    目录 mtime 未变化时复用保存的条目，调用方只需重新读取各条目的文件状态（原地覆盖同名文件不改变目录 mtime）。
+    """
+
+    def __init__(self, db_path):
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS folder_listings (
+                    folder TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    dir_mtime REAL NOT NULL,
+                    scanned_at REAL NOT NULL,
+                    entries TEXT NOT NULL,
+                    PRIMARY KEY (folder, kind)
+                );
+                CREATE TABLE IF NOT EXISTS image_metadata (
+                    jpg_path TEXT PRIMARY KEY,
+                    folder TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_image_metadata_folder ON image_metadata (folder);
+                CREATE TABLE IF NOT EXISTS passthrough_info (
+                    jpg_path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    displayable INTEGER NOT NULL,
+                    width INTEGER NOT NULL,
+                    height INTEGER NOT NULL
+                );
+            """)
+            self._conn.commit()
+            logger.info(f"文件夹索引已打开: {db_path}")
+        except sqlite3.Error as e:
+            logger.error(f"无法打开文件夹索引 {db_path}: {e}. 将退化为每次完整扫描。", exc_info=True)
+            self._conn = None
+
+    @staticmethod
+    def _normalize(folder_path):
+        return os.path.normcase(os.path.abspath(folder_path))
+
+    def get_listing(self, folder_path, kind, dir_mtime):
+        """
+        返回保存的文件夹条目字典；索引中不存在、目录 mtime 已变化或无法信任时返回 None。
+        kind 区分同一路径作为 'jpg' 或 'raw' 文件夹时的不同扫描结果。
+        """
+        if self._conn is None:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT dir_mtime, scanned_at, entries FROM folder_listings WHERE folder = ? AND kind = ?",
+                    (self._normalize(folder_path), kind)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取文件夹索引失败 ({folder_path}): {e}")
+            return None
+
+        if row is None:
+            return None
+        stored_mtime, scanned_at, entries = row
+        if stored_mtime != dir_mtime or dir_mtime >= scanned_at - DIR_MTIME_GRANULARITY:
+            logger.debug(f"文件夹索引已过期或不可信: {folder_path}")
+            return None
+        return json.loads(entries)
+
+    def save_listing(self, folder_path, kind, dir_mtime, entries, scanned_at=None):
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO folder_listings (folder, kind, dir_mtime, scanned_at, entries) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self._normalize(folder_path), kind, dir_mtime,
+                     scanned_at if scanned_at is not None else time.time(),
+                     json.dumps(entries, ensure_ascii=False, separators=(',', ':'))))
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入文件夹索引失败 ({folder_path}): {e}")
+
+    def update_listing_entries(self, folder_path, kind, entries):
+        """只更新已保存条目的内容（例如补充 RAW 编辑状态），保留原有的目录 mtime 与扫描时间。"""
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE folder_listings SET entries = ? WHERE folder = ? AND kind = ?",
+                    (json.dumps(entries, ensure_ascii=False, separators=(',', ':')),
+                     self._normalize(folder_path), kind))
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"更新文件夹索引失败 ({folder_path}): {e}")
+
+    def get_folder_metadata(self, folder_path):
+        """返回 {jpg_path: (size, mtime, metadata)}，供扫描后批量附加仍然有效的 EXIF 元数据。"""
+        if self._conn is None:
+            return {}
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT jpg_path, size, mtime, data FROM image_metadata WHERE folder = ?",
+                    (self._normalize(folder_path),)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"读取元数据索引失败 ({folder_path}): {e}")
+            return {}
+        return {jpg_path: (size, mtime, json.loads(data)) for jpg_path, size, mtime, data in rows}
+
+    def get_metadata(self, jpg_path, file_stat):
+        if self._conn is None or not file_stat:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT size, mtime, data FROM image_metadata WHERE jpg_path = ?", (jpg_path,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取元数据索引失败 ({jpg_path}): {e}")
+            return None
+        if row is None or row[0] != file_stat['size'] or row[1] != file_stat['mtime']:
+            return None
+        return json.loads(row[2])
+
+    def save_metadata(self, jpg_path, file_stat, metadata):
+        self.save_metadata_many([(jpg_path, file_stat, metadata)])
+
+    def save_metadata_many(self, items):
+        """items 为 (jpg_path, file_stat, metadata) 的可迭代对象，在一个事务中写入。"""
+        if self._conn is None:
+            return
+        rows = [(jpg_path, self._normalize(os.path.dirname(jpg_path)), file_stat['size'], file_stat['mtime'],
+                 json.dumps(metadata, ensure_ascii=False, default=str))
+                for jpg_path, file_stat, metadata in items if file_stat]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO image_metadata (jpg_path, folder, size, mtime, data) VALUES (?, ?, ?, ?, ?)",
+                    rows)
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入元数据索引失败: {e}")
+
+    def get_passthrough_info(self, jpg_path, file_stat):
+        """返回保存的 {"displayable", "width", "height"}；没有或文件已变化时返回 None。"""
+        if self._conn is None or not file_stat:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT size, mtime, displayable, width, height FROM passthrough_info WHERE jpg_path = ?",
+                    (jpg_path,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取直接发送判断索引失败 ({jpg_path}): {e}")
+            return None
+        if row is None or row[0] != file_stat['size'] or row[1] != file_stat['mtime']:
+            return None
+        return {"displayable": bool(row[2]), "width": row[3], "height": row[4]}
+
+    def save_passthrough_info(self, jpg_path, file_stat, info):
+        if self._conn is None or not file_stat:
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO passthrough_info (jpg_path, size, mtime, displayable, width, height) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (jpg_path, file_stat['size'], file_stat['mtime'], int(info["displayable"]),
+                     info["width"], info["height"]))
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入直接发送判断索引失败 ({jpg_path}): {e}")
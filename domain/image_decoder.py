@@ -0,0 +1,194 @@
+import io
+import logging
+
+from PIL import Image, ExifTags
+
+logger = logging.getLogger(__name__)
+
+# 解码阶段只缩小到目标尺寸的 REDUCING_GAP 倍，最后一步再用 LANCZOS 缩放，效果与对原图直接缩放几乎一致
+# （与 Pillow Image.thumbnail 的默认值相同）。
+REDUCING_GAP = 2.0
+# 预览尺寸远大于缩略图，解码结果只需不小于目标尺寸；否则 24 MP 原图在常见预览尺寸下根本用不上按比例解码。
+PREVIEW_REDUCING_GAP = 1.0
+
+# EXIF Orientation -> 转为正向所需的变换（与 ImageOps.exif_transpose 相同）
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# 内嵌缩略图与主图宽高比的允许误差。不少相机为 3:2 的照片内嵌带黑边的 4:3 缩略图（160x120），这类缩略图不能直接使用
+EMBEDDED_THUMBNAIL_ASPECT_TOLERANCE = 0.02
+
+# EXIF IFD1 中内嵌 JPEG 缩略图的位置（相对 TIFF 头的偏移）与长度
+_TAG_THUMBNAIL_OFFSET = 0x0201
+_TAG_THUMBNAIL_LENGTH = 0x0202
+_EXIF_HEADER = b'Exif\x00\x00'
+
+# Image.reduce 支持的模式；其它模式（P、1、CMYK 等）不做整数倍缩小，直接完整解码
+_REDUCIBLE_MODES = ('L', 'LA', 'RGB', 'RGBA')
+
+# 浏览器能按原样正确显示的 JPEG 色彩模式（CMYK JPEG 在部分浏览器中颜色错误）
+_PASSTHROUGH_MODES = ('L', 'RGB')
+
+
+def fit_size(size, box_size):
+    """按比例缩放 size 使其恰好放入 box_size，返回 (宽, 高)，至少为 1 像素。"""
+    width, height = size
+    box_width, box_height = box_size
+    scale = min(box_width / width, box_height / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def open_image_for_size(file_path, box_size=None, reducing_gap=REDUCING_GAP):
+    """
+    打开图片并只解码到生成 box_size（显示方向上的边界框）所需的分辨率，返回已按 EXIF 方向校正、与文件无关的图像。
+    JPEG 在解码时由 libjpeg 按 1/2、1/4、1/8 缩小（Image.draft），不会分配原图大小的缓冲区；
+    PNG 等其它格式只能完整解码，之后用 Image.reduce 做整数倍缩小。
+    结果不小于目标尺寸的 reducing_gap 倍，由调用方再缩放到最终尺寸；box_size 为 None 时完整解码。
+    """
+    with Image.open(file_path) as handle:
+        orientation = handle.getexif().get(ExifTags.Base.Orientation, 1)
+        transpose = _ORIENTATION_TRANSPOSE.get(orientation)
+        wanted_size = _wanted_size(handle.size, orientation, box_size, reducing_gap)
+
+        if wanted_size and handle.format == 'JPEG':
+            handle.draft(None, wanted_size)
+            logger.debug(f"JPEG 按比例解码: {handle.size}")
+
+        handle.load()
+        img = handle
+
+        if wanted_size and handle.format != 'JPEG' and handle.mode in _REDUCIBLE_MODES:
+            factor = int(min(handle.width / wanted_size[0], handle.height / wanted_size[1]))
+            if factor > 1:
+                img = handle.reduce(factor)
+
+        if transpose is not None:
+            transposed = img.transpose(transpose)
+            if img is not handle:
+                img.close() # Image.reduce 的中间结果
+            return transposed
+        # 关闭文件后原图像对象不可再用，返回一份独立的副本
+        return img.copy() if img is handle else img
+
+
+def estimate_decode_bytes(file_path, box_size=None, reducing_gap=REDUCING_GAP):
+    """
+    只读取文件头，估算 open_image_for_size 以相同参数解码时占用的内存峰值（字节）：
+    解码缓冲区（JPEG 按 Image.draft 选择的比例缩小）加上一份同样大小的 RGB 中间结果（方向校正、缩放或模式转换）。
+    """
+    with Image.open(file_path) as handle:
+        orientation = handle.getexif().get(ExifTags.Base.Orientation, 1)
+        width, height = handle.size
+        mode = handle.mode
+        wanted_size = _wanted_size(handle.size, orientation, box_size, reducing_gap)
+        if wanted_size and handle.format == 'JPEG':
+            # 与 JpegImageFile.draft 相同：不小于目标尺寸的最大的 1/2、1/4、1/8 缩小，比目标尺寸还小的图片不缩小
+            scale = max(1, min(width // wanted_size[0], height // wanted_size[1]))
+            scale = next(factor for factor in (8, 4, 2, 1) if scale >= factor)
+            width, height = -(-width // scale), -(-height // scale)
+    # Pillow 在内存中以每像素 1 字节保存 1、L、P 模式，多通道模式按每像素 4 字节对齐
+    bytes_per_pixel = 1 if mode in ('1', 'L', 'P') else 4
+    return width * height * (bytes_per_pixel + 4)
+
+
+def replace_image(old, new):
+    """返回 new；new 是新生成的图像时立即关闭 old，释放其像素缓冲区，而不是等到垃圾回收。"""
+    if new is not old:
+        old.close()
+    return new
+
+
+def _wanted_size(size, orientation, box_size, reducing_gap):
+    """生成 box_size（显示方向）所需的最小解码尺寸（存储方向），box_size 为 None 时返回 None。"""
+    if not box_size:
+        return None
+    box_width, box_height = box_size
+    if orientation in (5, 6, 7, 8):
+        # 旋转 90° 的图片存储方向与显示方向宽高互换
+        box_width, box_height = box_height, box_width
+    target_width, target_height = fit_size(size, (box_width, box_height))
+    return int(target_width * reducing_gap), int(target_height * reducing_gap)
+
+
+def get_display_size(file_path):
+    """只读取文件头，返回按 EXIF 方向校正后的 (宽, 高)。"""
+    with Image.open(file_path) as handle:
+        orientation = handle.getexif().get(ExifTags.Base.Orientation, 1)
+        width, height = handle.size
+    if orientation in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def read_passthrough_info(file_path):
+    """
+    只读取文件头，返回判断原图能否直接作为预览发送所需的信息 {"displayable", "width", "height"}：
+    displayable 表示 JPEG、色彩模式浏览器可直接显示且无需按 EXIF 方向旋转（不考虑尺寸，见 passthrough_fits）。
+    结果只取决于文件内容，可按文件状态保存下来复用。
+    """
+    with Image.open(file_path) as handle:
+        displayable = (handle.format == 'JPEG' and handle.mode in _PASSTHROUGH_MODES
+                       and handle.getexif().get(ExifTags.Base.Orientation, 1) == 1)
+        return {"displayable": displayable, "width": handle.width, "height": handle.height}
+
+
+def passthrough_fits(info, box_size=None):
+    """由 read_passthrough_info 的结果判断原图能否直接发送：可直接显示且不超过 box_size（为 None 时不限尺寸）。"""
+    if not info["displayable"]:
+        return False
+    return not box_size or (info["width"] <= box_size[0] and info["height"] <= box_size[1])
+
+
+def open_embedded_thumbnail(file_path, box_size):
+    """
+    读取 JPEG 的 EXIF（APP1）中内嵌的缩略图，返回已按 EXIF 方向校正的图像。
+    只解析文件头部的标记段（通常为几十 KB），不解码主图像；没有内嵌缩略图、缩略图比 box_size 对应的目标尺寸小，
+    或宽高比与主图不一致（带黑边）时返回 None，由调用方改为解码原图。
+    """
+    with Image.open(file_path) as handle:
+        if handle.format != 'JPEG':
+            return None
+        exif_bytes = handle.info.get('exif')
+        if not exif_bytes:
+            return None
+        exif = handle.getexif()
+        thumbnail_ifd = exif.get_ifd(ExifTags.IFD.IFD1)
+        offset = thumbnail_ifd.get(_TAG_THUMBNAIL_OFFSET)
+        length = thumbnail_ifd.get(_TAG_THUMBNAIL_LENGTH)
+        orientation = exif.get(ExifTags.Base.Orientation, 1)
+        main_width, main_height = handle.size
+
+    if not offset or not length:
+        return None
+    tiff_data = exif_bytes[len(_EXIF_HEADER):] if exif_bytes.startswith(_EXIF_HEADER) else exif_bytes
+    thumbnail_data = tiff_data[offset:offset + length]
+    if len(thumbnail_data) != length:
+        logger.debug(f"内嵌缩略图超出 EXIF 数据范围: {file_path}")
+        return None
+
+    thumbnail = Image.open(io.BytesIO(thumbnail_data))
+    thumb_width, thumb_height = thumbnail.size
+    if thumb_width <= 0 or thumb_height <= 0:
+        return None
+    main_ratio = main_width / main_height
+    if abs(thumb_width / thumb_height - main_ratio) > main_ratio * EMBEDDED_THUMBNAIL_ASPECT_TOLERANCE:
+        logger.debug(f"内嵌缩略图宽高比与主图不一致 ({thumb_width}x{thumb_height})，不使用: {file_path}")
+        return None
+
+    box_width, box_height = box_size
+    if orientation in (5, 6, 7, 8):
+        box_width, box_height = box_height, box_width
+    target_width, target_height = fit_size((main_width, main_height), (box_width, box_height))
+    if thumb_width < target_width or thumb_height < target_height:
+        return None
+
+    thumbnail.load()
+    transpose = _ORIENTATION_TRANSPOSE.get(orientation)
+    return thumbnail.transpose(transpose) if transpose is not None else thumbnail
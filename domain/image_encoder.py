@@ -0,0 +1,67 @@
+import io
+import logging
+
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+# 输出格式名 -> (Pillow 编码器名, MIME 类型)；JPEG 始终可用，作为不支持其它格式的浏览器的回退
+IMAGE_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+    'avif': ('AVIF', 'image/avif'),
+}
+DEFAULT_IMAGE_FORMAT = 'jpeg'
+
+# 新编码格式的文件头，用于校验缓存数据（JPEG 以 SOI 开头；WebP 为 RIFF 容器；AVIF 为 ISO BMFF，第 4-8 字节为 ftyp）
+_JPEG_SOI = b'\xff\xd8'
+_RIFF_HEADER = b'RIFF'
+_FTYP_BOX = b'ftyp'
+
+
+def available_formats(preferred):
+    """
+    按 preferred 的顺序返回当前 Pillow 能编码的输出格式（不含 JPEG）。未知或缺少编码库的格式记录警告后跳过。
+    """
+    formats = []
+    for image_format in preferred:
+        if image_format == DEFAULT_IMAGE_FORMAT or image_format in formats:
+            continue
+        if image_format not in IMAGE_FORMATS:
+            logger.warning(f"未知的图片输出格式: '{image_format}'，已忽略。")
+            continue
+        if not features.check(image_format):
+            logger.warning(f"当前 Pillow 不支持编码 {image_format.upper()}，该格式已禁用。")
+            continue
+        formats.append(image_format)
+    return formats
+
+
+def choose_format(formats, accept_mimetypes):
+    """
+    根据请求的 Accept 头（werkzeug MIMEAccept）从 formats 中选出第一个浏览器明确接受的格式，都不接受时返回 JPEG。
+    只认明确列出的 MIME 类型：fetch 等请求默认发送 */*，不能据此认为浏览器能解码 AVIF。
+    """
+    accepted = {value for value, quality in accept_mimetypes if quality > 0}
+    for image_format in formats:
+        if IMAGE_FORMATS[image_format][1] in accepted:
+            return image_format
+    return DEFAULT_IMAGE_FORMAT
+
+
+def mimetype_for(image_format):
+    return IMAGE_FORMATS[image_format][1]
+
+
+def encode_image(img, image_format, options):
+    """
+    把 RGB / L 图像编码为 image_format 格式的字节。options 为 {格式: Pillow save 参数}，由配置生成。
+    """
+    buffer = io.BytesIO()
+    img.save(buffer, format=IMAGE_FORMATS[image_format][0], **options.get(image_format, {}))
+    return buffer.getvalue()
+
+
+def is_encoded_image(data):
+    """粗略校验字节是否为本模块编码的图片（用于发现损坏的缓存条目）。"""
+    return data.startswith(_JPEG_SOI) or data.startswith(_RIFF_HEADER) or data[4:8] == _FTYP_BOX
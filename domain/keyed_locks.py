@@ -0,0 +1,30 @@
+import contextlib
+import threading
+
+
+class KeyedLocks:
+    """
+    按键区分的互斥锁：同一个键同一时间只有一个线程持有，不同的键互不影响。
+    锁对象在最后一个持有或等待它的线程离开后才删除，等待中的线程与之后到来的线程总是使用同一把锁。
+    """
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {} # 键 -> [锁, 持有与等待的线程数]
+
+    @contextlib.contextmanager
+    def hold(self, key):
+        """在 with 块中持有 key 的锁，等待期间阻塞当前线程。"""
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
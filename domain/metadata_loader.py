@@ -0,0 +1,156 @@
+import atexit
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from domain.exif_reader import empty_metadata
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataLoader:
+    """
+    加载文件夹后在后台线程池中分批读取所有图片的 EXIF 元数据，结果写回图片对的 'metadata' 并按批保存到索引，
+    状态接口与导航从此不必同步读取文件。只读取文件头（见 exif_reader），在线程中即可充分利用磁盘并发。
+
+    调度线程按显示顺序从当前位置向两侧推进；request 提交的图片（用户刚切换到、元数据尚未读取的图片）排在最前面。
+    已附带元数据的图片对（扫描时从索引附加）直接跳过。
+    """
+
+    def __init__(self, read_metadata, save_metadata_many, workers, batch_size):
+        """
+        read_metadata(file_path) 返回元数据，无法读取时返回 None（以 empty_metadata() 代替，不写入索引，下次加载时重试）；
+        save_metadata_many(items) 在一个事务中保存 [(jpg_path, jpg_stat, metadata)]。workers <= 0 时不在后台读取。
+        """
+        self._read_metadata = read_metadata
+        self._save_metadata_many = save_metadata_many
+        self._workers = max(0, workers)
+        self._batch_size = max(1, batch_size)
+        self._condition = threading.Condition()
+        self._executor = None
+        self._dispatcher = None
+        self._shutdown = False
+        self._generation = 0
+        self._queue = deque() # 按读取顺序排列的图片对
+        self._urgent = deque() # request 提交的图片对，先于 _queue 读取
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats():
+        return {"total": 0, "loaded": 0, "failed": 0}
+
+    @property
+    def enabled(self):
+        return self._workers > 0
+
+    def start(self, image_pairs, order, focus_position=0):
+        """为新加载的文件夹开始读取尚未附带元数据的图片对，丢弃上一次加载中尚未读取的部分。"""
+        if not self.enabled:
+            return
+        positions = sorted(range(len(order)), key=lambda position: abs(position - focus_position))
+        pending = [image_pairs[order[position]] for position in positions
+                   if image_pairs[order[position]].get('metadata') is None]
+        with self._condition:
+            self._generation += 1
+            self._queue = deque(pending)
+            self._urgent.clear()
+            self._stats = self._empty_stats()
+            self._stats["total"] = len(pending)
+            self._ensure_started()
+            self._condition.notify_all()
+        if pending:
+            logger.info(f"开始在后台读取 {len(pending)} 张图片的 EXIF 元数据（{self._workers} 个线程）。")
+
+    def request(self, pair):
+        """尽快读取 pair 的元数据（用户切换到了尚未读取的图片）。未启用后台读取时不做任何事。"""
+        if not self.enabled or pair.get('metadata') is not None:
+            return
+        with self._condition:
+            self._urgent.append(pair)
+            self._ensure_started()
+            self._condition.notify_all()
+
+    def load_all(self, image_pairs):
+        """在调用线程中等待，并行读取所有尚未附带元数据的图片对（例如首次按拍摄时间排序），返回读取的数量。"""
+        pending = [pair for pair in image_pairs if pair.get('metadata') is None]
+        for start in range(0, len(pending), self._batch_size):
+            self._load_batch(pending[start:start + self._batch_size])
+        return len(pending)
+
+    def cancel(self):
+        """丢弃所有尚未读取的图片对（例如重新加载文件夹或加载失败）。"""
+        with self._condition:
+            self._generation += 1
+            self._queue.clear()
+            self._urgent.clear()
+            self._stats = self._empty_stats()
+
+    def get_status(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                "enabled": self.enabled,
+                "workers": self._workers,
+                "queue_depth": len(self._queue) + len(self._urgent),
+                "running": bool(self._queue or self._urgent),
+            })
+            return stats
+
+    def shutdown(self):
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _ensure_started(self):
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch, name="metadata-loader", daemon=True)
+            self._dispatcher.start()
+            atexit.register(self.shutdown)
+
+    def _get_executor(self):
+        with self._condition:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, self._workers),
+                                                    thread_name_prefix="metadata-reader")
+            return self._executor
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while not self._shutdown and not (self._queue or self._urgent):
+                    self._condition.wait()
+                if self._shutdown:
+                    return
+                generation = self._generation
+                batch = []
+                while len(batch) < self._batch_size and (self._urgent or self._queue):
+                    pair = (self._urgent or self._queue).popleft()
+                    if pair.get('metadata') is None:
+                        batch.append(pair)
+            if not batch:
+                continue
+            try:
+                loaded, failed = self._load_batch(batch)
+            except Exception as e:
+                logger.error(f"后台读取 EXIF 元数据失败: {e}", exc_info=True)
+                continue
+            with self._condition:
+                if generation == self._generation:
+                    self._stats["loaded"] += loaded
+                    self._stats["failed"] += failed
+
+    def _load_batch(self, batch):
+        """读取一批图片对的元数据并写回，返回 (成功数, 失败数)。"""
+        results = list(self._get_executor().map(self._read_metadata, [pair['jpg_path'] for pair in batch]))
+        to_save = []
+        for pair, metadata in zip(batch, results):
+            if metadata is None:
+                pair['metadata'] = empty_metadata()
+                continue
+            pair['metadata'] = metadata
+            to_save.append((pair['jpg_path'], pair.get('jpg_stat'), metadata))
+        self._save_metadata_many(to_save)
+        return len(to_save), len(batch) - len(to_save)
@@ -0,0 +1,110 @@
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# record_request 的结果 -> 统计项
+_OUTCOME_STATS = {"hit": "preview_hits", "miss": "preview_misses", "passthrough": "passthrough"}
+
+
+class PreviewPrefetcher:
+    """
+    在少量后台线程中预先生成相邻图片的预览图（以及读取 EXIF），用户按方向键切换时预览通常已在缓存中。
+    Pillow 解码与编码时释放 GIL，线程即可并行，而且结果直接写入本进程的预览缓存。
+
+    每次导航调用 schedule 提交新的一组任务（按优先级排列，数量由调用方限定），同时取消上一组中尚未开始的任务；
+    已经开始的任务无法中断，会正常完成并写入缓存。
+    另外统计导航后浏览器请求的第一张预览是否已在缓存中（由 record_request 报告），用于评估预取效果。
+    """
+
+    def __init__(self, workers):
+        """workers 为线程数，<= 0 时不启用预取（仍统计命中率）。"""
+        self._workers = max(0, workers)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._futures = []
+        self._expected_path = None # 最近一次导航到的图片，等待浏览器请求它的预览
+        self._stats = {"scheduled": 0, "completed": 0, "cancelled": 0, "failed": 0,
+                       "navigations": 0, "preview_hits": 0, "preview_misses": 0, "passthrough": 0}
+
+    @property
+    def enabled(self):
+        return self._workers > 0
+
+    def schedule(self, navigated_path, tasks):
+        """
+        记录导航到了 navigated_path，取消上一组未开始的任务，并按顺序提交 tasks（无参数的可调用对象）。
+        """
+        with self._lock:
+            self._cancel_pending()
+            self._expected_path = navigated_path
+            if not self.enabled:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="preview-prefetch")
+                atexit.register(self.shutdown)
+            generation = self._generation
+            self._futures = [self._executor.submit(self._run, generation, task) for task in tasks]
+            self._stats["scheduled"] += len(tasks)
+
+    def cancel(self):
+        """取消所有尚未开始的任务（例如用户跳转到别处或重新加载文件夹）。"""
+        with self._lock:
+            self._cancel_pending()
+            self._expected_path = None
+
+    def record_request(self, file_path, outcome):
+        """
+        报告一次预览请求的结果：'hit'（已在缓存中）、'miss'（需要生成）或 'passthrough'（直接发送原图）。
+        只统计导航后对导航目标的第一次请求；浏览器自身缓存命中时不会发出请求，也就不计入。
+        """
+        with self._lock:
+            if file_path != self._expected_path:
+                return
+            self._expected_path = None
+            self._stats["navigations"] += 1
+            self._stats[_OUTCOME_STATS[outcome]] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        rendered = stats["preview_hits"] + stats["preview_misses"]
+        stats.update({
+            "enabled": self.enabled,
+            "workers": self._workers,
+            # 需要生成预览的导航中，预览已在缓存中的比例
+            "hit_rate": stats["preview_hits"] / rendered if rendered else 0.0,
+        })
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            self._cancel_pending()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _cancel_pending(self):
+        self._generation += 1
+        for future in self._futures:
+            if future.cancel():
+                self._stats["cancelled"] += 1
+        self._futures = []
+
+    def _run(self, generation, task):
+        # 已被新的导航取代但在取消前就已出队的任务直接跳过
+        if generation != self._generation:
+            with self._lock:
+                self._stats["cancelled"] += 1
+            return
+        try:
+            task()
+        except Exception as e:
+            logger.warning(f"预取预览图失败: {e}")
+            with self._lock:
+                self._stats["failed"] += 1
+            return
+        with self._lock:
+            self._stats["completed"] += 1
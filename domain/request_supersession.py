@@ -0,0 +1,47 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+# 记录最新请求的客户端数量上限，超出时忘记最久没有请求的客户端
+MAX_TRACKED_CLIENTS = 256
+
+
+class RequestSupersession:
+    """
+    记录每个客户端（浏览器标签页）最新一次请求的序号。按住方向键快速切换时浏览器只会显示最后一张预览，
+    更早的请求一旦有了更新的请求就被取代（superseded），渲染流程在解码前和编码前检查，尽早放弃这些请求。
+    """
+
+    def __init__(self, max_clients=MAX_TRACKED_CLIENTS):
+        self._max_clients = max_clients
+        self._latest = OrderedDict() # 客户端标识 -> 最新请求的序号
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._superseded = 0
+
+    def begin(self, client_id):
+        """
+        登记 client_id 的一次新请求，返回无参数的函数：该请求已被同一客户端更新的请求取代时返回 True。
+        client_id 为空时不跟踪，返回的函数总是 False。
+        """
+        if not client_id:
+            return lambda: False
+        with self._lock:
+            sequence = next(self._counter)
+            self._latest[client_id] = sequence
+            self._latest.move_to_end(client_id)
+            while len(self._latest) > self._max_clients:
+                self._latest.popitem(last=False)
+
+        def is_superseded():
+            with self._lock:
+                superseded = self._latest.get(client_id, sequence) != sequence
+                if superseded:
+                    self._superseded += 1
+                return superseded
+
+        return is_superseded
+
+    def get_stats(self):
+        with self._lock:
+            return {"clients": len(self._latest), "superseded": self._superseded}
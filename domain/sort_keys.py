@@ -0,0 +1,94 @@
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# 支持的排序方式。time_filename 为原有的默认方式（修改时间，其次文件名）。
+SORT_MODES = ("time_filename", "capture_time", "filename", "size", "edited_first")
+DEFAULT_SORT_MODE = "time_filename"
+
+_DIGITS_RE = re.compile(r'(\d+)')
+
+
+def natural_key(name):
+    """
+    自然排序键：数字部分按数值比较，例如 IMG_2 排在 IMG_10 之前。
+    re.split 带捕获组时结果总是 字符串, 数字, 字符串, ... 交替，因此同一位置上的元素类型一致、可以直接比较。
+    """
+    parts = _DIGITS_RE.split(name.lower())
+    parts[1::2] = [int(part) for part in parts[1::2]]
+    return tuple(parts)
+
+
+class SortKeys:
+    """
+    每次扫描后为全部图片对预先计算一次的排序键（按列保存），切换排序方式时只需重新排列下标，
+    不再访问磁盘或重新读取 EXIF。每种排序方式的结果（稳定编号的排列）会被缓存。
+    拍摄时间依赖 EXIF，只在首次需要时通过 set_capture_times 填充。
+    """
+
+    def __init__(self, image_pairs):
+        self._count = len(image_pairs)
+        self._file_names = [os.path.basename(pair['jpg_path']) for pair in image_pairs]
+        self._natural_names = [natural_key(pair['base_name']) for pair in image_pairs]
+        self._mtimes = [pair['jpg_stat']['mtime'] if pair.get('jpg_stat') else 0.0 for pair in image_pairs]
+        self._sizes = [pair['jpg_stat']['size'] if pair.get('jpg_stat') else 0 for pair in image_pairs]
+        self._modified = [bool(pair.get('is_modified', False)) for pair in image_pairs]
+        self._capture_times = None
+        self._orders = {}
+
+    @staticmethod
+    def normalize_mode(sort_mode):
+        """无效或未提供的排序方式退化为默认方式。"""
+        if sort_mode in SORT_MODES:
+            return sort_mode
+        if sort_mode is not None:
+            logger.warning(f"未知的排序方式 '{sort_mode}'，使用默认排序方式 {DEFAULT_SORT_MODE}。")
+        return DEFAULT_SORT_MODE
+
+    @property
+    def has_capture_times(self):
+        return self._capture_times is not None
+
+    def set_capture_times(self, image_pairs):
+        """
+        由图片对的 metadata['date_taken']（EXIF 格式 "YYYY:MM:DD HH:MM:SS"，可直接按字符串比较）计算拍摄时间键。
+        没有拍摄时间的图片排在最后。
+        """
+        self._capture_times = [
+            (pair.get('metadata') or {}).get('date_taken') or None
+            for pair in image_pairs
+        ]
+        self._orders.pop("capture_time", None)
+
+    def set_modified(self, index, is_modified):
+        """RAW 编辑状态变化后更新对应的键；edited_first 的排列在下次使用时重新计算。"""
+        if self._modified[index] != is_modified:
+            self._modified[index] = is_modified
+            self._orders.pop("edited_first", None)
+
+    def order(self, sort_mode):
+        """返回按 sort_mode 排序后的稳定编号列表（升序）。"""
+        sort_mode = self.normalize_mode(sort_mode)
+        cached = self._orders.get(sort_mode)
+        if cached is not None:
+            return cached
+
+        if sort_mode == "capture_time":
+            if self._capture_times is None:
+                raise ValueError("按拍摄时间排序前需要先调用 set_capture_times。")
+            captures = self._capture_times
+            key = lambda i: (captures[i] is None, captures[i] or "", self._mtimes[i], self._natural_names[i])
+        elif sort_mode == "filename":
+            key = lambda i: (self._natural_names[i], self._file_names[i])
+        elif sort_mode == "size":
+            key = lambda i: (self._sizes[i], self._natural_names[i])
+        elif sort_mode == "edited_first":
+            key = lambda i: (not self._modified[i], self._mtimes[i], self._file_names[i])
+        else:
+            key = lambda i: (self._mtimes[i], self._file_names[i])
+
+        order = sorted(range(self._count), key=key)
+        self._orders[sort_mode] = order
+        return order
@@ -0,0 +1,249 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from domain.image_encoder import DEFAULT_IMAGE_FORMAT
+from domain.thumbnail_renderer import generate_thumbnail_bytes
+from domain.work_scheduler import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# 图片对的预生成状态
+_PENDING = 0
+_IN_FLIGHT = 1
+_DONE = 2
+
+
+class ThumbnailPregenerator:
+    """
+    在后台进程池中预生成缩略图缓存，Pillow 解码可在多个 CPU 核心上并行，不占用 Flask 请求线程。
+
+    调度线程按显示顺序从当前位置向两侧交替推进（当前、后一张、前一张、后两张……），
+    用户跳转到别处时调用 prioritize 即可从新位置重新向外推进；进程池中同时只保留少量任务，
+    因此重新排优先级后很快就会轮到新位置附近的图片。已有有效缓存的图片在调度线程中直接跳过，不提交给进程池。
+    子进程只负责解码与编码，编码结果交回主进程写入缓存，缓存存储因此只有一个写入者。
+    """
+
+    def __init__(self, resolve_cache_key, store_thumbnail, box_size, workers, image_format=DEFAULT_IMAGE_FORMAT,
+                 encode_options=None, scheduler=None):
+        """
+        resolve_cache_key(file_path, file_stat) 返回需要生成的缓存键，缓存已有效时返回 None；
+        store_thumbnail(cache_key, data) 在主进程中保存生成的字节。workers 为进程数，<= 0 时不启用预生成。
+        缩略图按 image_format 与 encode_options 编码（见 encode_image），与 resolve_cache_key 返回的缓存键一致。
+        提供 scheduler（WorkScheduler）时，每个任务提交前按后台优先级申请名额，完成后归还。
+        """
+        self._resolve_cache_key = resolve_cache_key
+        self._store_thumbnail = store_thumbnail
+        self._box_size = box_size
+        self._image_format = image_format
+        self._encode_options = encode_options or {}
+        self._scheduler = scheduler
+        self._workers = max(0, workers)
+        self._max_in_flight = self._workers * 2
+
+        self._condition = threading.Condition()
+        self._executor = None
+        self._dispatcher = None
+        self._shutdown = False
+
+        self._generation = 0
+        self._jobs = [] # 稳定编号 -> (file_path, file_stat)
+        self._order = [] # 显示顺序（稳定编号列表）
+        self._states = bytearray()
+        self._focus = 0
+        self._lower = -1 # 向前推进的下一个显示位置
+        self._upper = 0 # 向后推进的下一个显示位置
+        self._in_flight = 0
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats():
+        return {"total": 0, "generated": 0, "already_cached": 0, "failed": 0}
+
+    @property
+    def enabled(self):
+        return self._workers > 0
+
+    def start(self, jobs, order, focus_position=0):
+        """
+        开始为新加载的文件夹预生成缩略图，丢弃上一次加载中尚未开始的任务（已提交给进程的任务会自然完成）。
+        jobs 按稳定编号排列 [(file_path, file_stat)]，order 为显示顺序。
+        """
+        if not self.enabled:
+            return
+        with self._condition:
+            self._generation += 1
+            self._jobs = list(jobs)
+            self._order = list(order)
+            self._states = bytearray(len(self._jobs))
+            self._stats = self._empty_stats()
+            self._stats["total"] = len(self._jobs)
+            self._set_focus(focus_position)
+            self._ensure_started()
+            self._condition.notify_all()
+        logger.info(f"开始后台预生成 {len(self._jobs)} 张缩略图（{self._workers} 个进程）。")
+
+    def set_order(self, order, focus_position):
+        """显示顺序变化（切换排序方式）后按新顺序继续向外推进，已完成的图片不会重复生成。"""
+        with self._condition:
+            if len(order) != len(self._jobs):
+                return
+            self._order = list(order)
+            self._set_focus(focus_position)
+            self._condition.notify_all()
+
+    def prioritize(self, focus_position):
+        """用户跳转后从新的显示位置重新向外推进。"""
+        with self._condition:
+            if not self._order:
+                return
+            self._set_focus(focus_position)
+            self._condition.notify_all()
+
+    def cancel(self):
+        """丢弃所有尚未开始的任务（例如加载失败或文件夹被清空）。"""
+        with self._condition:
+            self._generation += 1
+            self._jobs = []
+            self._order = []
+            self._states = bytearray()
+            self._stats = self._empty_stats()
+            self._condition.notify_all()
+
+    def get_status(self):
+        with self._condition:
+            stats = dict(self._stats)
+            completed = stats["generated"] + stats["already_cached"] + stats["failed"]
+            stats.update({
+                "enabled": self.enabled,
+                "workers": self._workers,
+                "completed": completed,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, stats["total"] - completed - self._in_flight),
+                "focus_position": self._focus,
+                "running": completed < stats["total"],
+            })
+            return stats
+
+    def shutdown(self):
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _set_focus(self, focus_position):
+        total = len(self._order)
+        self._focus = min(max(0, focus_position), max(0, total - 1))
+        self._upper = self._focus
+        self._lower = self._focus - 1
+
+    def _ensure_started(self):
+        if self._executor is None:
+            # 使用 spawn 启动进程：与 Windows 行为一致，也避免在已有多个线程（Flask、SQLite）的进程中 fork
+            self._executor = ProcessPoolExecutor(max_workers=self._workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(self.shutdown)
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="thumbnail-pregenerator", daemon=True)
+            self._dispatcher.start()
+
+    def _next_pending(self):
+        """
+        从当前位置向两侧交替取下一个待生成的稳定编号，没有时返回 None。
+        两个游标只会单调向外移动，整个过程对每个位置最多访问一次（重新设置焦点时重置）。
+        """
+        total = len(self._order)
+        while self._lower >= 0 or self._upper < total:
+            take_upper = self._upper < total and (self._lower < 0 or self._upper - self._focus <= self._focus - self._lower)
+            if take_upper:
+                index = self._order[self._upper]
+                self._upper += 1
+            else:
+                index = self._order[self._lower]
+                self._lower -= 1
+            if self._states[index] == _PENDING:
+                return index
+        return None
+
+    def _dispatch_loop(self):
+        while True:
+            with self._condition:
+                while not self._shutdown:
+                    if self._in_flight < self._max_in_flight:
+                        index = self._next_pending()
+                        if index is not None:
+                            break
+                    self._condition.wait()
+                if self._shutdown:
+                    return
+                generation = self._generation
+                file_path, file_stat = self._jobs[index]
+                self._states[index] = _IN_FLIGHT
+
+            # 缓存检查在锁外进行
+            try:
+                cache_key = self._resolve_cache_key(file_path, file_stat)
+            except Exception as e:
+                logger.warning(f"无法确定缩略图缓存键，跳过预生成: {file_path}: {e}")
+                self._finish(generation, index, "failed")
+                continue
+            if cache_key is None:
+                self._finish(generation, index, "already_cached")
+                continue
+
+            # 用户等待的预览与可见缩略图优先：名额不足时在这里等待
+            ticket = self._scheduler.acquire(BACKGROUND, file_path) if self._scheduler else None
+            with self._condition:
+                if generation != self._generation:
+                    self._release_slot(ticket)
+                    continue
+                self._in_flight += 1
+            try:
+                future = self._executor.submit(generate_thumbnail_bytes, file_path, self._box_size,
+                                               self._image_format, self._encode_options)
+            except RuntimeError as e:
+                # 进程池已关闭（应用退出中）
+                logger.debug(f"进程池不可用，停止预生成: {e}")
+                self._release_slot(ticket)
+                with self._condition:
+                    self._in_flight -= 1
+                return
+            future.add_done_callback(
+                lambda f, g=generation, i=index, k=cache_key, t=ticket: self._on_done(g, i, k, t, f))
+
+    def _release_slot(self, ticket):
+        if ticket is not None:
+            self._scheduler.release(ticket)
+
+    def _on_done(self, generation, index, cache_key, ticket, future):
+        self._release_slot(ticket)
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+        if future.cancelled():
+            return
+        try:
+            data = future.result()
+        except Exception as e:
+            logger.warning(f"后台生成缩略图失败: {e}")
+            data = None
+        if data:
+            try:
+                self._store_thumbnail(cache_key, data)
+            except Exception as e:
+                logger.warning(f"保存后台生成的缩略图失败: {e}")
+                data = None
+        self._finish(generation, index, "generated" if data else "failed")
+
+    def _finish(self, generation, index, outcome):
+        with self._condition:
+            if generation != self._generation:
+                return
+            self._states[index] = _DONE
+            self._stats[outcome] += 1
+            if self._stats["generated"] + self._stats["already_cached"] + self._stats["failed"] == self._stats["total"]:
+                logger.info(f"缩略图后台预生成完成: {self._stats}")
+            self._condition.notify_all()
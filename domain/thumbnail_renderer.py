@@ -0,0 +1,135 @@
+import io
+import logging
+import sys
+
+from PIL import Image
+
+from domain.image_decoder import open_image_for_size, open_embedded_thumbnail, fit_size, replace_image, REDUCING_GAP
+from domain.image_encoder import encode_image, DEFAULT_IMAGE_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# 本模块只依赖 Pillow，不引用 file_manager 等单例，供后台预生成进程直接导入使用。
+
+
+def render_thumbnail(file_path, box_size, reducing_gap=REDUCING_GAP):
+    """
+    生成按比例缩放到 box_size（(宽, 高) 边界框）之内的 RGB 缩略图，不做填充，无法生成时返回 None。
+    JPEG 内嵌的 EXIF 缩略图足够大时直接使用，只读取文件头部；否则只解码到缩略图所需的分辨率（见 open_image_for_size）。
+    reducing_gap 见 open_image_for_size（内存紧张时调用方可传入更小的值，结果尺寸不变）。
+    处理阶段的意外错误会直接抛出，由调用方决定如何处理。
+    """
+    img = None
+    try:
+        img = _open_embedded_thumbnail(file_path, box_size) or open_image_for_size(file_path, box_size, reducing_gap)
+
+        if img is None:
+            logger.error(f"打开图片后 img 对象为 None: {file_path}")
+            print(f"--- open_image_for_size returned None: {file_path} ---", file=sys.stderr,
+                  flush=True)
+            return None
+
+    except RecursionError:
+        print(f"--- Thumbnail generator RecursionError (suppressed): {file_path} ---", file=sys.stderr,
+              flush=True)
+        try:
+            logger.error(f"生成缩略图时捕获到 RecursionError: {file_path}")
+        except Exception:
+            pass
+        return None
+
+    except FileNotFoundError:
+        logger.error(f"生成缩略图文件未找到: {file_path}")
+        print(f"--- Thumbnail FileNotFoundError: {file_path} ---", file=sys.stderr, flush=True)
+        return None
+
+    except Exception as e:
+        logger.error(f"打开或转置图片 '{file_path}' 时发生错误: {e}")
+        print(f"--- Error opening/transposing thumbnail {file_path}: {e} ---", file=sys.stderr, flush=True)
+        return None
+
+    img_width, img_height = img.size
+    if img_width <= 0 or img_height <= 0:
+        logger.warning(f"图片尺寸无效 ({img_width}x{img_height})，无法生成缩略图: {file_path}")
+        print(f"--- Thumbnail invalid size {file_path}: {img_width}x{img_height} ---", file=sys.stderr,
+              flush=True)
+        return None
+
+    resized_img = img
+    try:
+        # 比边界框小的图片不放大，前端按比例显示即可
+        if img_width > box_size[0] or img_height > box_size[1]:
+            resized_img = replace_image(img, img.resize(fit_size(img.size, box_size), Image.Resampling.LANCZOS))
+    except Exception as e:
+        logger.error(f"缩放图片 '{file_path}' 时发生错误: {e}")
+        print(f"--- Error resizing thumbnail {file_path}: {e} ---", file=sys.stderr, flush=True)
+        return None
+
+    if resized_img is None:
+        logger.error(f"缩放图片后 resized_img 对象为 None: {file_path}")
+        print(f"--- Resized image is None: {file_path} ---", file=sys.stderr, flush=True)
+        return None
+
+    # JPEG 不支持 Alpha 通道，调色板等模式也统一转换为 RGB
+    if resized_img.mode != 'RGB':
+        resized_img = replace_image(resized_img, resized_img.convert('RGB'))
+
+    return resized_img
+
+
+def downscale_thumbnail(data, box_size):
+    """
+    把已缓存的较大缩略图（编码后的字节）缩小到 box_size 边界框内，返回 RGB 图像。
+    较大的缩略图只有几百 KB，解码远比再次解码原图便宜。
+    """
+    with Image.open(io.BytesIO(data)) as handle:
+        handle.draft('RGB', box_size)
+        img = handle.convert('RGB') if handle.mode != 'RGB' else handle.copy()
+    if img.width > box_size[0] or img.height > box_size[1]:
+        img = replace_image(img, img.resize(fit_size(img.size, box_size), Image.Resampling.LANCZOS))
+    return img
+
+
+def thumbnail_from_frame(frame, box_size):
+    """由已解码的帧（见 DecodedFrameCache，不修改也不关闭）缩小得到 box_size 边界框内的 RGB 缩略图。"""
+    if frame.width > box_size[0] or frame.height > box_size[1]:
+        img = frame.resize(fit_size(frame.size, box_size), Image.Resampling.LANCZOS)
+    else:
+        img = frame.copy()
+    if img.mode != 'RGB':
+        img = replace_image(img, img.convert('RGB'))
+    return img
+
+
+def _open_embedded_thumbnail(file_path, box_size):
+    """内嵌缩略图损坏时不影响缩略图生成，记录后回退到解码原图。"""
+    try:
+        return open_embedded_thumbnail(file_path, box_size)
+    except FileNotFoundError:
+        raise
+    except Exception as e:
+        logger.debug(f"读取内嵌缩略图失败，改为解码原图: {file_path}: {e}")
+        return None
+
+
+def encode_thumbnail(img_thumb, image_format=DEFAULT_IMAGE_FORMAT, encode_options=None):
+    """把 render_thumbnail 的结果编码为 image_format 格式的字节（缩略图缓存与接口返回的格式），参数见 encode_image。"""
+    return encode_image(img_thumb, image_format, encode_options or {})
+
+
+def generate_thumbnail_bytes(file_path, box_size, image_format=DEFAULT_IMAGE_FORMAT, encode_options=None):
+    """
+    后台预生成进程的任务入口：生成缩略图并返回编码后的字节，由主进程写入缓存。
+    图片无法处理时返回 None（不抛出，避免中断整个任务队列）。
+    """
+    try:
+        img_thumb = render_thumbnail(file_path, box_size)
+        if img_thumb is None:
+            return None
+        try:
+            return encode_thumbnail(img_thumb, image_format, encode_options)
+        finally:
+            img_thumb.close()
+    except Exception as e:
+        logger.error(f"生成缩略图: '{file_path}' 时发生未预料错误 (处理阶段): {e}")
+        return None
@@ -0,0 +1,338 @@
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from domain.image_encoder import is_encoded_image
+
+logger = logging.getLogger(__name__)
+
+# 单个包文件的大小上限；压缩时每次最多复制一个包中仍然有效的数据
+PACK_MAX_BYTES = 64 * 1024 * 1024
+# 超出磁盘预算时按最近访问时间淘汰，直到有效数据降到预算的该比例，避免每次写入都触发回收
+GC_LOW_WATERMARK = 0.8
+# 有效数据少于该比例的包文件会被压缩（有效条目复制到当前包后删除原文件）
+COMPACT_LIVE_RATIO = 0.5
+# 命中时只在内存中记录访问时间，每隔该秒数批量写入索引
+ACCESS_FLUSH_INTERVAL = 30.0
+# 写入的索引条目累计到该数量或距上次提交超过 COMMIT_INTERVAL 秒时才提交；异常退出最多丢失这段时间内的缓存
+COMMIT_BATCH_SIZE = 200
+COMMIT_INTERVAL = 1.0
+
+_PACK_NAME_RE = re.compile(r'^pack_(\d{5})\.bin$')
+# 旧版本每个缩略图一个文件：<sha256>_<文件名>_thumb.jpeg
+_LEGACY_FILE_RE = re.compile(r'^[0-9a-f]{64}_.*_thumb\.jpeg$')
+
+
+class ThumbnailStore:
+    """
+    缩略图缓存的存储：缩略图依次追加到少量大的包文件（pack_00001.bin ...）中，
+    SQLite 索引记录每个缓存键所在的包、偏移、长度和最近访问时间，命中时通过 mmap 切片读取。
+
+    缓存键包含原图的 mtime，原图修改后旧条目不再被访问，会随 LRU 淘汰；
+    包文件总大小超出 max_bytes 时淘汰最久未访问的条目并压缩有效数据不足一半的包。
+    只应由一个进程写入（后台预生成进程把编码结果交回主进程写入）。
+    预览图缓存使用另一个目录中的同一种存储，label 只用于日志。
+    """
+
+    def __init__(self, directory, max_bytes, label="缩略图"):
+        self._directory = directory
+        self._label = label
+        self._max_bytes = max(0, max_bytes)
+        self._lock = threading.RLock()
+        self._conn = None
+        self._maps = {} # 包编号 -> mmap
+        self._pack_sizes = {} # 包编号 -> 文件大小
+        self._live_bytes = {} # 包编号 -> 仍被索引引用的字节数
+        self._active_pack = None
+        self._active_file = None
+        self._touched = {} # 缓存键 -> 尚未写入索引的访问时间
+        self._last_access_flush = time.time()
+        self._pending_writes = 0
+        self._last_commit = time.time()
+        self._evictions = 0
+        self._compactions = 0
+        self._hits = 0
+        self._misses = 0
+
+        if self._max_bytes <= 0:
+            logger.info(f"{self._label}磁盘缓存已关闭。")
+            return
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(directory, "thumbnail_store.sqlite3"), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    pack INTEGER NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_pack ON entries (pack);
+                CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access);
+            """)
+            self._load_packs()
+            self._conn.commit()
+            logger.info(f"{self._label}缓存已打开: {directory}，{len(self._pack_sizes)} 个包文件，"
+                        f"{sum(self._pack_sizes.values()) / 1e6:.1f} MB")
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"无法打开{self._label}缓存 {directory}: {e}. {self._label}将不会被缓存。", exc_info=True)
+            self._conn = None
+
+    def _pack_path(self, pack):
+        return os.path.join(self._directory, f"pack_{pack:05d}.bin")
+
+    def _load_packs(self):
+        """读取现有包文件的大小与有效字节数，删除指向不存在的包或超出文件末尾的索引条目（例如异常退出）。"""
+        for name in os.listdir(self._directory):
+            match = _PACK_NAME_RE.match(name)
+            if match:
+                self._pack_sizes[int(match.group(1))] = os.path.getsize(os.path.join(self._directory, name))
+
+        for pack, end in self._conn.execute("SELECT pack, MAX(offset + length) FROM entries GROUP BY pack").fetchall():
+            if end > self._pack_sizes.get(pack, 0):
+                logger.warning(f"{self._label}缓存包 {pack} 缺失或不完整，丢弃其索引条目。")
+                self._conn.execute("DELETE FROM entries WHERE pack = ?", (pack,))
+
+        self._live_bytes = {pack: 0 for pack in self._pack_sizes}
+        for pack, live in self._conn.execute("SELECT pack, SUM(length) FROM entries GROUP BY pack").fetchall():
+            self._live_bytes[pack] = live
+
+    @property
+    def enabled(self):
+        return self._conn is not None
+
+    def contains(self, key):
+        if self._conn is None:
+            return False
+        try:
+            with self._lock:
+                return self._conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+        except sqlite3.Error as e:
+            logger.warning(f"读取{self._label}缓存索引失败: {e}")
+            return False
+
+    def get(self, key, count=True):
+        """返回缓存的图片字节，不存在或数据损坏时返回 None（count 为真时计入命中率统计）。"""
+        if self._conn is None:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT pack, offset, length FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    if count:
+                        self._misses += 1
+                    return None
+                pack, offset, length = row
+                data = self._map(pack, offset + length)[offset:offset + length]
+                if not is_encoded_image(data):
+                    logger.warning(f"{self._label}缓存条目已损坏，将重新生成: {key}")
+                    self._remove_entry(key, pack, length)
+                    self._commit()
+                    if count:
+                        self._misses += 1
+                    return None
+                if count:
+                    self._hits += 1
+                self._touched[key] = time.time()
+                if time.time() - self._last_access_flush > ACCESS_FLUSH_INTERVAL:
+                    self._flush_access_times()
+                return data
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logger.warning(f"读取{self._label}缓存失败 ({key}): {e}")
+            return None
+
+    def put(self, key, data):
+        """追加一条数据（替换同一缓存键的旧数据），超出磁盘预算时执行回收。"""
+        if self._conn is None or not data:
+            return
+        try:
+            with self._lock:
+                self._append(key, data, time.time())
+                self._pending_writes += 1
+                if self._pending_writes >= COMMIT_BATCH_SIZE or time.time() - self._last_commit > COMMIT_INTERVAL:
+                    self._commit()
+                if sum(self._pack_sizes.values()) > self._max_bytes:
+                    self._collect_garbage()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"写入{self._label}缓存失败 ({key}): {e}")
+
+    def _append(self, key, data, last_access):
+        row = self._conn.execute("SELECT pack, length FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._live_bytes[row[0]] -= row[1]
+
+        if self._active_file is None or self._pack_sizes[self._active_pack] + len(data) > PACK_MAX_BYTES:
+            self._open_active_pack(len(data))
+        offset = self._pack_sizes[self._active_pack]
+        self._active_file.write(data)
+        # 刷新到操作系统，随后的 mmap 读取才能看到新数据
+        self._active_file.flush()
+        self._pack_sizes[self._active_pack] += len(data)
+        self._live_bytes[self._active_pack] += len(data)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (key, pack, offset, length, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, self._active_pack, offset, len(data), last_access))
+        self._touched.pop(key, None)
+
+    def _commit(self):
+        self._conn.commit()
+        self._pending_writes = 0
+        self._last_commit = time.time()
+
+    def _open_active_pack(self, needed):
+        """打开用于追加的包：启动后继续使用编号最大且未满的包，否则新建一个。"""
+        if self._active_file is not None:
+            self._active_file.close()
+            self._active_file = None
+        last_pack = max(self._pack_sizes, default=0)
+        if last_pack and last_pack != self._active_pack and self._pack_sizes[last_pack] + needed <= PACK_MAX_BYTES:
+            self._active_file = open(self._pack_path(last_pack), 'ab')
+            self._active_pack = last_pack
+            return
+        pack = last_pack + 1
+        self._active_file = open(self._pack_path(pack), 'ab')
+        self._active_pack = pack
+        self._pack_sizes[pack] = 0
+        self._live_bytes[pack] = 0
+
+    def _map(self, pack, end):
+        """返回覆盖到 end 的只读映射；包文件追加后原有映射长度不够时重新映射。"""
+        mapped = self._maps.get(pack)
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(self._pack_path(pack), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[pack] = mapped
+        return mapped
+
+    def _remove_entry(self, key, pack, length):
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._live_bytes[pack] -= length
+        self._touched.pop(key, None)
+
+    def _flush_access_times(self):
+        if self._touched:
+            self._conn.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                                   [(accessed, key) for key, accessed in self._touched.items()])
+            self._touched.clear()
+        self._commit()
+        self._last_access_flush = time.time()
+
+    def _collect_garbage(self):
+        """淘汰最久未访问的条目直到有效数据低于预算的 GC_LOW_WATERMARK，然后压缩或删除稀疏的包文件。"""
+        self._flush_access_times()
+        target = self._max_bytes * GC_LOW_WATERMARK
+        live_total = sum(self._live_bytes.values())
+        evicted = 0
+        if live_total > target:
+            cursor = self._conn.execute("SELECT key, pack, length FROM entries ORDER BY last_access")
+            victims = []
+            for key, pack, length in cursor:
+                if live_total <= target:
+                    break
+                victims.append((key, pack, length))
+                live_total -= length
+            for key, pack, length in victims:
+                self._remove_entry(key, pack, length)
+            evicted = len(victims)
+            self._evictions += evicted
+
+        # 先压缩有效数据不足一半的包；仍超出预算时再从最稀疏的包开始继续压缩
+        candidates = sorted((pack for pack in self._pack_sizes
+                             if pack != self._active_pack and self._live_bytes[pack] < self._pack_sizes[pack]),
+                            key=lambda pack: self._live_bytes[pack] / self._pack_sizes[pack])
+        compacted = 0
+        for pack in candidates:
+            if (self._live_bytes[pack] / self._pack_sizes[pack] >= COMPACT_LIVE_RATIO
+                    and sum(self._pack_sizes.values()) <= self._max_bytes):
+                break
+            self._compact_pack(pack)
+            compacted += 1
+        self._commit()
+        self._compactions += compacted
+        logger.info(f"{self._label}缓存回收: 淘汰 {evicted} 条，压缩 {compacted} 个包文件，"
+                    f"现占用 {sum(self._pack_sizes.values()) / 1e6:.1f} MB")
+
+    def _compact_pack(self, pack):
+        """把包中仍然有效的条目复制到当前包，然后删除该包文件。"""
+        rows = self._conn.execute(
+            "SELECT key, offset, length, last_access FROM entries WHERE pack = ? ORDER BY offset", (pack,)).fetchall()
+        if rows:
+            mapped = self._map(pack, max(offset + length for _, offset, length, _ in rows))
+            for key, offset, length, last_access in rows:
+                self._append(key, mapped[offset:offset + length], last_access)
+        mapped = self._maps.pop(pack, None)
+        if mapped is not None:
+            mapped.close()
+        os.remove(self._pack_path(pack))
+        del self._pack_sizes[pack]
+        del self._live_bytes[pack]
+
+    @classmethod
+    def remove_legacy_files(cls, legacy_dir, dry_run=False):
+        """
+        删除旧版本按文件保存的缩略图（<sha256>_<文件名>_thumb.jpeg）及写到一半留下的临时文件，返回找到的数量。
+        旧文件名中的哈希由原图路径、mtime 与旧后缀计算，无法还原出现在的缓存键；旧缩略图填充为固定大小的正方形，
+        与现在不填充的缩略图也不同，因此不导入包文件。dry_run 为真时只统计数量、不删除（见 THUMBNAIL_LEGACY_CLEANUP）。
+        """
+        found = 0
+        try:
+            with os.scandir(legacy_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.tmp') or _LEGACY_FILE_RE.match(entry.name):
+                        if not dry_run:
+                            cls._remove_file(entry.path)
+                        found += 1
+        except OSError as e:
+            logger.warning(f"检查旧缩略图缓存失败 ({legacy_dir}): {e}")
+        if found and dry_run:
+            logger.info(f"缓存目录中有 {found} 个旧版本的缩略图缓存文件，现在不再使用；"
+                        f"设置 THUMBNAIL_LEGACY_CLEANUP=true 后启动时删除。")
+        elif found:
+            logger.info(f"已删除 {found} 个旧版本的缩略图缓存文件。")
+        return found
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "packs": len(self._pack_sizes),
+                "disk_bytes": sum(self._pack_sizes.values()),
+                "live_bytes": sum(self._live_bytes.values()),
+                "max_bytes": self._max_bytes,
+                "evictions": self._evictions,
+                "compactions": self._compactions,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._flush_access_times()
+                except sqlite3.Error:
+                    pass
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            if self._active_file is not None:
+                self._active_file.close()
+                self._active_file = None
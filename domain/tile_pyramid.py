@@ -0,0 +1,172 @@
+import contextlib
+import logging
+import math
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from domain.decoded_frame_cache import frame_bytes
+from domain.image_decoder import get_display_size, replace_image, PREVIEW_REDUCING_GAP
+from domain.keyed_locks import KeyedLocks
+
+logger = logging.getLogger(__name__)
+
+
+def max_pyramid_level(width, height):
+    """Deep Zoom 层级：层级 0 为 1x1 像素，每升一级宽高加倍，最高层级为原始分辨率。"""
+    return math.ceil(math.log2(max(width, height, 1)))
+
+
+def level_size(width, height, level):
+    """原图 (width, height) 在 level 层级的尺寸。"""
+    scale = 2 ** (max_pyramid_level(width, height) - level)
+    return max(1, math.ceil(width / scale)), max(1, math.ceil(height / scale))
+
+
+class _Level:
+    __slots__ = ("image", "leases", "evicted", "retained")
+
+    def __init__(self, image):
+        self.image = image
+        self.leases = 0 # 正在从该层级裁剪瓦片的调用方数量
+        self.evicted = False # 已不在缓存中，最后一个调用方结束使用时关闭
+        self.retained = False # 曾保留在缓存中，关闭前计入缓存占用
+
+
+class TilePyramid:
+    """
+    按需从原图生成 Deep Zoom 风格的瓦片（level/x/y，无重叠）。
+    同一层级的多个瓦片通常同时被请求：每个层级只解码一次（JPEG 在解码时按比例缩小），解码结果保存在按像素字节数
+    （与 DecodedFrameCache 相同的计算方式）限制的 LRU 中，之后的瓦片直接从中裁剪；同一层级正在解码时，其它请求等待它完成而不是重复解码。
+    超出上限的层级不保留，只供本次请求裁剪；被淘汰的层级如仍有请求在裁剪，等最后一个请求结束后关闭，在此之前仍计入上限。
+    编码后的瓦片由调用方缓存。层级图像由 frames（DecodedFrameCache）中的帧缩放得到，与预览共用同一次解码。
+    """
+
+    def __init__(self, tile_size, max_decoded_bytes, frames):
+        self._tile_size = tile_size
+        self._frames = frames
+        self._max_decoded_bytes = max(0, max_decoded_bytes)
+        self._levels = OrderedDict() # (路径, mtime, 大小, 层级) -> _Level
+        self._decoded_bytes = 0 # 保留的层级与已淘汰、仍在使用中的层级
+        self._lock = threading.Lock()
+        self._decode_locks = KeyedLocks() # 按 (路径, mtime, 大小, 层级) 加锁，同一层级同时只解码一次
+
+    @property
+    def tile_size(self):
+        return self._tile_size
+
+    def get_info(self, file_path):
+        """返回原图（显示方向）的尺寸、瓦片边长与最高层级，只读取文件头。"""
+        width, height = get_display_size(file_path)
+        return {
+            "width": width,
+            "height": height,
+            "tile_size": self._tile_size,
+            "max_level": max_pyramid_level(width, height),
+        }
+
+    def tile_box(self, info, level, x, y):
+        """瓦片在层级图像中的区域 (left, upper, right, lower)；层级或坐标超出范围时返回 None。"""
+        if not 0 <= level <= info["max_level"] or x < 0 or y < 0:
+            return None
+        width, height = level_size(info["width"], info["height"], level)
+        left, upper = x * self._tile_size, y * self._tile_size
+        if left >= width or upper >= height:
+            return None
+        return left, upper, min(left + self._tile_size, width), min(upper + self._tile_size, height)
+
+    def render_tile(self, file_path, file_stat, info, level, box):
+        """从 level 层级的图像中裁剪出 box 区域（见 tile_box），返回 RGB 图像。"""
+        with self._level_image(file_path, file_stat, info, level) as level_image:
+            return level_image.crop(box)
+
+    @contextlib.contextmanager
+    def _level_image(self, file_path, file_stat, info, level):
+        """在 with 块中产出 level 层级的图像，可能与其它线程共用：只能读取，不能修改或关闭。"""
+        key = (file_path, file_stat['mtime'], file_stat['size'], level)
+        entry = self._lease(key)
+        if entry is None:
+            with self._decode_locks.hold(key):
+                # 等待期间另一个线程可能已解码了该层级
+                entry = self._lease(key)
+                if entry is None:
+                    entry = _Level(self._decode_level(file_path, file_stat, info, level))
+                    entry.leases = 1
+                    self._remember(key, entry)
+        try:
+            yield entry.image
+        finally:
+            self._release(entry)
+
+    def _decode_level(self, file_path, file_stat, info, level):
+        size = level_size(info["width"], info["height"], level)
+        box_size = None if level == info["max_level"] else size
+        # 层级尺寸是瓦片坐标的一部分，不能改用更小的解码比例，内存紧张时只能等待
+        with self._frames.frame(file_path, file_stat, box_size, (PREVIEW_REDUCING_GAP,)) as frame:
+            # 帧可能与其它渲染共用，层级图像总是新生成的
+            if frame.size != size:
+                img = frame.resize(size, Image.Resampling.LANCZOS)
+                if img.mode != 'RGB':
+                    img = replace_image(img, img.convert('RGB'))
+            else:
+                img = frame.convert('RGB') if frame.mode != 'RGB' else frame.copy()
+        logger.debug(f"解码瓦片层级 {level} ({size[0]}x{size[1]}): {file_path}")
+        return img
+
+    def _lease(self, key):
+        """返回已保留的层级并登记一次使用（之后必须调用 _release），没有时返回 None。"""
+        with self._lock:
+            entry = self._levels.get(key)
+            if entry is None:
+                return None
+            self._levels.move_to_end(key)
+            entry.leases += 1
+            return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.leases -= 1
+            if entry.leases == 0 and entry.evicted:
+                self._close(entry)
+
+    def _remember(self, key, entry):
+        """放得下时保留解码结果，超出上限时淘汰最久未使用的层级；不保留的层级在调用方结束使用时关闭。"""
+        size = frame_bytes(entry.image)
+        with self._lock:
+            if size <= self._max_decoded_bytes:
+                while self._levels and self._decoded_bytes + size > self._max_decoded_bytes:
+                    self._evict(next(iter(self._levels)))
+            # 已淘汰但仍在使用中的层级关闭前也计入上限
+            if self._decoded_bytes + size > self._max_decoded_bytes:
+                entry.evicted = True
+                logger.debug(f"瓦片层级 {entry.image.width}x{entry.image.height} 超出内存上限，不保留: {key[0]}")
+                return
+            self._levels[key] = entry
+            entry.retained = True
+            self._decoded_bytes += size
+
+    def _evict(self, key):
+        entry = self._levels.pop(key)
+        entry.evicted = True
+        # 其它线程仍在裁剪时，由最后一个结束使用的线程关闭
+        if entry.leases == 0:
+            self._close(entry)
+
+    def _close(self, entry):
+        if entry.retained:
+            self._decoded_bytes -= frame_bytes(entry.image)
+        entry.image.close()
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._levels):
+                self._evict(key)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "decoded_levels": len(self._levels),
+                "decoded_bytes": self._decoded_bytes,
+                "max_decoded_bytes": self._max_decoded_bytes,
+            }
@@ -0,0 +1,143 @@
+import contextlib
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# 优先级（数值越小越优先）：用户正在等待的预览与瓦片、网格中可见的缩略图、后台预取与预生成
+INTERACTIVE = 0
+VISIBLE = 1
+BACKGROUND = 2
+PRIORITY_NAMES = ("interactive", "visible", "background")
+
+# 缓存的目录 -> 存储设备编号的数量上限
+_MAX_CACHED_DEVICES = 4096
+
+
+class _Ticket:
+    __slots__ = ("priority", "device", "enqueued")
+
+    def __init__(self, priority, device):
+        self.priority = priority
+        self.device = device
+        self.enqueued = time.perf_counter()
+
+
+class WorkScheduler:
+    """
+    读取并解码原图的工作（缓存未命中时的预览、瓦片、缩略图生成，后台预取与预生成）在开始前向调度器申请名额。
+
+    - 每个优先级有各自的并发上限；
+    - 同一存储设备（按 st_dev 区分，例如慢速的 USB 读卡器）上同时读取的任务数有上限；
+    - 可见缩略图与后台任务合计不超过 capacity（通常为 CPU 核心数）；交互请求不受 capacity 限制，
+      因此后台工作占满 CPU 时，用户等待的预览也能立即开始；
+    - 有更高优先级的任务可以开始时，低优先级任务继续等待；同一优先级内先到先得。
+    解码无法中途打断，调度只决定等待中的任务谁先开始。
+    """
+
+    def __init__(self, class_limits, capacity, device_limit):
+        """class_limits 按优先级排列的并发上限；capacity 为非交互任务的总并发上限；device_limit 为每个存储设备的上限。"""
+        self._class_limits = [max(1, limit) for limit in class_limits]
+        self._capacity = max(1, capacity)
+        self._device_limit = max(1, device_limit)
+        self._condition = threading.Condition()
+        self._waiting = [deque() for _ in PRIORITY_NAMES]
+        self._running = [0] * len(PRIORITY_NAMES)
+        self._device_running = {}
+        self._devices = {} # 目录 -> st_dev
+        self._completed = [0] * len(PRIORITY_NAMES)
+        self._wait_seconds = [0.0] * len(PRIORITY_NAMES)
+
+    @contextlib.contextmanager
+    def slot(self, priority, file_path):
+        """在 with 块中占用一个名额，等待期间阻塞当前线程。"""
+        ticket = self.acquire(priority, file_path)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def acquire(self, priority, file_path):
+        """等待并占用一个名额，返回交给 release 的凭据（用于在其它线程中结束的工作，如进程池任务）。"""
+        ticket = _Ticket(priority, self._device_of(file_path))
+        with self._condition:
+            self._waiting[priority].append(ticket)
+            while not self._can_start(ticket):
+                self._condition.wait()
+            self._waiting[priority].remove(ticket)
+            self._running[priority] += 1
+            self._device_running[ticket.device] = self._device_running.get(ticket.device, 0) + 1
+            self._wait_seconds[priority] += time.perf_counter() - ticket.enqueued
+            # 其它等待者的条件可能因队列变化而改变
+            self._condition.notify_all()
+        return ticket
+
+    def release(self, ticket):
+        with self._condition:
+            self._running[ticket.priority] -= 1
+            self._completed[ticket.priority] += 1
+            remaining = self._device_running[ticket.device] - 1
+            if remaining:
+                self._device_running[ticket.device] = remaining
+            else:
+                del self._device_running[ticket.device]
+            self._condition.notify_all()
+
+    def get_stats(self):
+        with self._condition:
+            classes = {}
+            for priority, name in enumerate(PRIORITY_NAMES):
+                completed = self._completed[priority]
+                classes[name] = {
+                    "limit": self._class_limits[priority],
+                    "running": self._running[priority],
+                    "waiting": len(self._waiting[priority]),
+                    "completed": completed,
+                    "average_wait_ms": self._wait_seconds[priority] * 1000 / completed if completed else 0.0,
+                }
+            return {
+                "capacity": self._capacity,
+                "device_limit": self._device_limit,
+                "busy_devices": len(self._device_running),
+                "classes": classes,
+            }
+
+    def _admissible(self, priority, device):
+        if self._running[priority] >= self._class_limits[priority]:
+            return False
+        if self._device_running.get(device, 0) >= self._device_limit:
+            return False
+        if priority != INTERACTIVE and self._running[VISIBLE] + self._running[BACKGROUND] >= self._capacity:
+            return False
+        return True
+
+    def _can_start(self, ticket):
+        priority = ticket.priority
+        if not self._admissible(priority, ticket.device):
+            return False
+        for higher in range(priority):
+            if any(self._admissible(higher, waiting.device) for waiting in self._waiting[higher]):
+                return False
+        # 同一优先级中排在前面、也能开始的任务先开始（设备已满的任务不阻塞其它设备上的任务）
+        for waiting in self._waiting[priority]:
+            if waiting is ticket:
+                return True
+            if self._device_running.get(waiting.device, 0) < self._device_limit:
+                return False
+        return True
+
+    def _device_of(self, file_path):
+        directory = os.path.dirname(os.path.abspath(file_path))
+        device = self._devices.get(directory)
+        if device is None:
+            try:
+                device = os.stat(directory).st_dev
+            except OSError:
+                device = directory
+            if len(self._devices) >= _MAX_CACHED_DEVICES:
+                self._devices.clear()
+            self._devices[directory] = device
+        return device
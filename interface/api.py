@@ -1,14 +1,18 @@
 import platform
+import struct
 import subprocess
 import sys
+from urllib.parse import quote
 
-from flask import Flask, request, jsonify, send_file, render_template, Response
+from flask import Flask, request, jsonify, send_file, render_template, Response, stream_with_context
 from application.image_selector_app import app_state
 from utils.config_loader import app_config
 from domain.file_manager import file_manager
+from domain.sort_keys import SORT_MODES
+from domain.image_encoder import mimetype_for, DEFAULT_IMAGE_FORMAT
 from utils.exceptions import (
     FolderNotFoundError, NoImagePairsFoundError, ImageProcessingError,
-    InvalidIndexError, ImageSelectorError, ExternalToolError, ConfigError
+    InvalidIndexError, ImageSelectorError, ExternalToolError, ConfigError, RenderSupersededError
 )
 
 import logging
@@ -26,6 +30,15 @@ static_dir = os.path.join(os.path.dirname(__file__), 'static')
 
 app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
 
+SENDFILE_MODES = ('', 'x-sendfile', 'x-accel-redirect')
+SENDFILE_MODE = app_config.get('SENDFILE_MODE', '')
+if SENDFILE_MODE not in SENDFILE_MODES:
+    logger.warning(f"无效的 SENDFILE_MODE: '{SENDFILE_MODE}'，将由 WSGI 服务器直接发送文件。")
+    SENDFILE_MODE = ''
+# 反向代理（Apache / lighttpd）根据 X-Sendfile 头发送文件，Flask 的 send_file 会自动添加该头
+app.config['USE_X_SENDFILE'] = SENDFILE_MODE == 'x-sendfile'
+X_ACCEL_REDIRECT_PREFIX = app_config.get('X_ACCEL_REDIRECT_PREFIX', '/_sendfile')
+
 # History file path (放在项目根目录)
 HISTORY_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'history.json')
 
@@ -61,7 +74,9 @@ def index():
     logger.info("Serving index.html...")
     default_jpg_folder = app_config.get('DEFAULT_JPG_FOLDER', '')
     default_raw_folder = app_config.get('DEFAULT_RAW_FOLDER', '')
-    return render_template('index.html', default_jpg_folder=default_jpg_folder, default_raw_folder=default_raw_folder)
+    return render_template('index.html', default_jpg_folder=default_jpg_folder, default_raw_folder=default_raw_folder,
+                           thumbnail_width=file_manager.get_thumbnail_width(),
+                           thumbnail_sizes=','.join(str(size) for size in file_manager.get_thumbnail_sizes()))
 
 
 @app.route('/api/select_folder', methods=['GET'])
@@ -169,8 +184,9 @@ def load_folders():
         # load_folders 现在接受可选的 initial_index 和 sort_order
         initial_index = data.get('initial_index')
         sort_order = data.get('sort_order') # 接收前端传递的排序方式
+        rescan = bool(data.get('rescan', False)) # 为 True 时忽略持久化索引，强制重新扫描
 
-        load_result = app_state.load_folders(jpg_folder, raw_folder, initial_index=initial_index, sort_order=sort_order)
+        load_result = app_state.load_folders(jpg_folder, raw_folder, initial_index=initial_index, sort_order=sort_order, rescan=rescan)
         is_viewer_mode = not bool(raw_folder) # 如果 raw_folder 为空，则为看图模式
         load_result['is_viewer_mode'] = is_viewer_mode
 
@@ -187,10 +203,117 @@ def load_folders():
          logger.error(f"/api/load_folders 发生未捕获的意外错误: {e}", exc_info=True)
          return jsonify({"success": False, "message": "加载图片时发生未知的服务器内部错误。"}), 500
 
+@app.route('/api/load_folders/stream', methods=['POST'])
+def load_folders_stream():
+    """
+    流式版本的 load_folders，响应为 NDJSON：扫描过程中逐行返回 {"type": "pairs", ...}，
+    结束时返回 {"type": "done", ...}，出错时返回 {"type": "error", ...}。
+    """
+    logger.info("接收到 /api/load_folders/stream 请求。")
+    data = request.get_json(silent=True)
+    if not data:
+        logger.warning("/api/load_folders/stream 请求体为空或不是有效的 JSON。")
+        return jsonify({"success": False, "message": "请求需要有效的 JSON 主体。"}), 400
+
+    jpg_folder = data.get('jpg_folder')
+    raw_folder = data.get('raw_folder')
+    initial_index = data.get('initial_index')
+    sort_order = data.get('sort_order')
+    rescan = bool(data.get('rescan', False))
+    preview_limit = data.get('preview_limit') # 只随流返回前 N 个图片对，其余通过 /api/pairs 分页获取
+    if preview_limit is not None and not isinstance(preview_limit, int):
+        return jsonify({"success": False, "message": "preview_limit 必须是整数。"}), 400
+    include_order = preview_limit is None
+
+    logger.debug(f"接收到的流式加载请求参数: JPG='{jpg_folder}', RAW='{raw_folder}'")
+
+    def _line(message):
+        return json.dumps(message, ensure_ascii=False) + "\n"
+
+    def generate():
+        try:
+            for message in app_state.iter_load_folders(jpg_folder, raw_folder, initial_index=initial_index,
+                                                       sort_order=sort_order, rescan=rescan,
+                                                       preview_limit=preview_limit, include_order=include_order):
+                if message["type"] == "done":
+                    message["is_viewer_mode"] = not bool(raw_folder) # 如果 raw_folder 为空，则为看图模式
+                    logger.info("/api/load_folders/stream 处理成功。")
+                yield _line(message)
+        except (FolderNotFoundError, NoImagePairsFoundError) as e:
+            logger.warning(f"/api/load_folders/stream 处理失败（文件夹/对未找到）: {e}")
+            yield _line({"type": "error", "success": False, "status": 404, "message": str(e)})
+        except (ImageSelectorError, ConfigError, ExternalToolError) as e:
+            logger.error(f"/api/load_folders/stream 处理失败: {e}", exc_info=True)
+            yield _line({"type": "error", "success": False, "status": 500, "message": f"加载图片时发生错误: {e}"})
+        except Exception as e:
+            logger.error(f"/api/load_folders/stream 发生未捕获的意外错误: {e}", exc_info=True)
+            yield _line({"type": "error", "success": False, "status": 500, "message": "加载图片时发生未知的服务器内部错误。"})
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # 禁止反向代理缓冲，保证分批到达浏览器
+    return response
+
+PAIRS_WINDOW_MAX_LIMIT = 1000
+
+@app.route('/api/pairs', methods=['GET'])
+def get_pairs():
+    """按显示顺序分页返回图片对信息：/api/pairs?offset=0&limit=200&descending=0"""
+    try:
+        offset = request.args.get('offset', default=0, type=int)
+        limit = request.args.get('limit', default=200, type=int)
+        descending = request.args.get('descending', '0').lower() in ('1', 'true')
+        if offset < 0 or limit <= 0:
+            return jsonify({"success": False, "message": "offset 必须 >= 0 且 limit 必须 > 0。"}), 400
+
+        window = app_state.get_pairs_window(offset, min(limit, PAIRS_WINDOW_MAX_LIMIT), descending=descending)
+        return jsonify(window), 200
+    except Exception as e:
+        logger.error(f"/api/pairs 发生未捕获的意外错误: {e}", exc_info=True)
+        return jsonify({"success": False, "message": "获取图片列表时发生未知错误。"}), 500
+
+@app.route('/api/sort', methods=['POST'])
+def set_sort_order():
+    """切换排序方式（不重新扫描），返回新的状态；显示顺序通过 /api/pairs 重新获取。"""
+    data = request.get_json(silent=True) or {}
+    sort_order = data.get('sort_order')
+    if sort_order not in SORT_MODES:
+        return jsonify({"success": False, "message": f"无效的排序方式: {sort_order}. 可选: {', '.join(SORT_MODES)}"}), 400
+
+    logger.info(f"接收到 /api/sort 请求: {sort_order}")
+    try:
+        status = app_state.set_sort_order(sort_order)
+        return jsonify(status), 200
+    except InvalidIndexError as e:
+        logger.warning(f"/api/sort 处理失败: {e}")
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"/api/sort 发生未捕获的意外错误: {e}", exc_info=True)
+        return jsonify({"success": False, "message": "切换排序方式时发生未知错误。"}), 500
+
+@app.route('/api/refresh_modified', methods=['POST'])
+def refresh_modified():
+    """
+    重新检测 RAW 旁车文件，返回编辑状态发生变化的图片对。显示顺序因此改变（edited_first 排序）时
+    reordered 为真并附带新的状态，显示顺序通过 /api/pairs 重新获取。
+    """
+    try:
+        changes, reordered = app_state.refresh_modified_status()
+        response = app_state.get_current_status() if reordered else {"success": True}
+        response.update({"changes": changes, "reordered": reordered})
+        return jsonify(response), 200
+    except ImageSelectorError as e:
+        logger.error(f"/api/refresh_modified 处理失败: {e}", exc_info=True)
+        return jsonify({"success": False, "message": str(e)}), 500
+    except Exception as e:
+        logger.error(f"/api/refresh_modified 发生未捕获的意外错误: {e}", exc_info=True)
+        return jsonify({"success": False, "message": "刷新 RAW 编辑状态时发生未知错误。"}), 500
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     try:
         status = app_state.get_current_status()
+        status.update(app_state.get_subsystem_stats())
         return jsonify(status), 200
     except Exception as e:
          logger.error(f"/api/status 发生未捕获的意外错误: {e}", exc_info=True)
@@ -235,7 +358,8 @@ def save_history():
         history_data = _load_history()
         history_data[jpg_folder] = {
             "last_index": current_index,
-            "sort_order": sort_order
+            "sort_order": sort_order, # 排序方向 asc/desc
+            "sort_mode": data.get('sort_mode') # 后端排序方式，可选
         }
         _save_history(history_data)
 
@@ -289,18 +413,108 @@ def previous_image():
         logger.error(f"/api/previous_image 发生未捕获的意外错误: {e}", exc_info=True)
         return jsonify({"success": False, "message": "切换到上一张图片时发生未知的服务器内部错误。"}), 500
 
+@app.route('/api/image/metadata/<int:index>', methods=['GET'])
+def get_image_metadata(index):
+    """状态中 metadata_pending 为真时，前端通过此接口获取当前图片的 EXIF 元数据，不阻塞导航请求。"""
+    try:
+        metadata = app_state.get_image_metadata(index)
+        return jsonify({"success": True, "index": index, "metadata": metadata}), 200
+    except InvalidIndexError as e:
+         logger.warning(f"/api/image/metadata/{index} 处理失败: {e}")
+         return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"/api/image/metadata/{index} 发生未捕获的意外错误: {e}", exc_info=True)
+        return jsonify({"success": False, "message": "获取图片元数据时发生未知的服务器内部错误。"}), 500
+
+# 带内容版本参数（?v=）的图片 URL 内容永不改变，浏览器可以永久缓存；没有或版本不符时每次重新验证
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# 预览请求中设备像素比的合理上限，超出时视为无效参数
+MAX_DEVICE_PIXEL_RATIO = 8
+
+def _image_cache_validators(index, rendition):
+    """
+    返回 (ETag, 是否可永久缓存)。ETag 由图片内容版本与渲染参数组成，只需扫描时记录的文件状态，不读取图片。
+    请求的 v 参数与当前版本一致时 URL 是内容寻址的，可以标记为 immutable。
+    """
+    version = app_state.get_image_version(index)
+    return f"{version}-{rendition}", request.args.get('v') == version
+
+def _with_cache_headers(response, etag, immutable):
+    response.set_etag(etag)
+    # 输出格式按 Accept 头协商，同一 URL 对不同浏览器可能返回不同格式
+    response.vary.add('Accept')
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    return response
+
+def _not_modified_response(etag, immutable):
+    """If-None-Match 与 ETag 匹配时返回 304 响应（不生成图片），否则返回 None。"""
+    if request.if_none_match.contains(etag):
+        return _with_cache_headers(Response(status=304), etag, immutable)
+    return None
+
+def _send_image_file(file_path, mimetype='image/jpeg'):
+    """
+    按文件路径发送图片，不把文件读入内存：默认由 WSGI 服务器通过 wsgi.file_wrapper 发送（支持时使用 sendfile），
+    配置了 SENDFILE_MODE 时交给前面的反向代理发送。缓存相关的响应头由调用方设置。
+    """
+    if SENDFILE_MODE == 'x-accel-redirect':
+        response = Response(mimetype=mimetype)
+        # nginx 的 internal location 以 alias / 映射到文件系统根目录
+        internal_path = os.path.abspath(file_path).replace(os.sep, '/').lstrip('/')
+        response.headers['X-Accel-Redirect'] = f"{X_ACCEL_REDIRECT_PREFIX}/{quote(internal_path)}"
+        return response
+    return send_file(os.path.abspath(file_path), mimetype=mimetype, as_attachment=False, conditional=False, etag=False)
+
+def _requested_thumbnail_size():
+    """可选的 size 参数对齐到缩略图尺寸阶梯后的尺寸；未提供时为基准尺寸，参数无效时返回 None。"""
+    size = request.args.get('size', type=int)
+    if 'size' in request.args and (size is None or size <= 0):
+        return None
+    return file_manager.resolve_thumbnail_size(size)
+
+def _requested_preview_viewport():
+    """
+    可选的预览区域参数：width / height 为 CSS 像素，dpr 为设备像素比（默认 1）。
+    未提供 width 和 height 时返回空元组，参数无效时返回 None，否则返回 (width, height, dpr)。
+    """
+    width = request.args.get('width', type=int)
+    height = request.args.get('height', type=int)
+    dpr = request.args.get('dpr', type=float)
+    for name, value in (('width', width), ('height', height)):
+        if name in request.args and (value is None or value <= 0):
+            return None
+    if 'dpr' not in request.args:
+        dpr = 1.0
+    elif dpr is None or not 0 < dpr <= MAX_DEVICE_PIXEL_RATIO:
+        return None
+    if width is None and height is None:
+        return ()
+    return width, height, dpr
+
 @app.route('/api/image/thumbnail/<int:index>', methods=['GET'])
 def get_thumbnail(index):
     try:
+        size = _requested_thumbnail_size()
+        if size is None:
+            return jsonify({"success": False, "message": "size 必须是正整数。"}), 400
+        image_format = file_manager.choose_image_format("thumbnail", request.accept_mimetypes)
+        etag, immutable = _image_cache_validators(index, f"thumb-{size}.{image_format}")
+        not_modified = _not_modified_response(etag, immutable)
+        if not_modified is not None:
+            return not_modified
+
         jpg_path = app_state.get_image_file_path(index, 'jpg')
+        jpg_stat = app_state.get_image_file_stat(index, 'jpg')
 
-        img_byte_stream = file_manager.get_thumbnail(jpg_path)
+        thumbnail_bytes = file_manager.get_thumbnail(jpg_path, jpg_stat, image_format, size)
+        if thumbnail_bytes is None:
+            raise ImageProcessingError(f"无法生成缩略图: {os.path.basename(jpg_path)}")
 
-        return send_file(
-            img_byte_stream,
-            mimetype='image/jpeg',
-            as_attachment=False
-        ), 200
+        # 缩略图只有几 KB，直接返回缓存中的字节，不再包装成文件对象分块读取
+        response = Response(thumbnail_bytes, mimetype=mimetype_for(image_format))
+        return _with_cache_headers(response, etag, immutable), 200
 
     except InvalidIndexError as e:
          logger.warning(f"/api/image/thumbnail/{index} 处理失败: {e}")
@@ -315,6 +529,51 @@ def get_thumbnail(index):
         logger.error(f"/api/image/thumbnail/{index} 发生未捕获的意外错误: {e}", exc_info=True)
         return jsonify({"success": False, "message": "获取缩略图时发生未知的服务器内部错误。"}), 500
 
+THUMBNAIL_BATCH_MAX_COUNT = 200
+# 批量缩略图响应中每条记录的头部：大端 uint32 稳定编号 + uint32 JPEG 字节数
+THUMBNAIL_RECORD_HEADER = struct.Struct('>II')
+
+@app.route('/api/image/thumbnails', methods=['GET'])
+def get_thumbnails_batch():
+    """
+    一次返回多张缩略图：/api/image/thumbnails?indices=3,7,12&size=300（稳定编号，最多 THUMBNAIL_BATCH_MAX_COUNT 个；
+    size 可选，含义与单张缩略图接口相同）。
+    响应按请求顺序逐条输出记录（THUMBNAIL_RECORD_HEADER + 图片数据），缓存未命中的图片生成后立即输出；
+    无法生成的图片字节数为 0。响应头 X-Load-Id 为取得路径时的加载编号，X-Image-Type 为按 Accept 头选择的图片格式。
+    """
+    try:
+        indices = [int(value) for value in request.args.get('indices', '').split(',') if value.strip()]
+    except ValueError:
+        return jsonify({"success": False, "message": "indices 必须是以逗号分隔的整数。"}), 400
+    if not indices or len(indices) > THUMBNAIL_BATCH_MAX_COUNT or min(indices) < 0:
+        return jsonify({"success": False, "message": f"indices 需要 1 到 {THUMBNAIL_BATCH_MAX_COUNT} 个非负整数。"}), 400
+
+    size = _requested_thumbnail_size()
+    if size is None:
+        return jsonify({"success": False, "message": "size 必须是正整数。"}), 400
+
+    load_id, sources = app_state.get_thumbnail_sources(indices)
+    image_format = file_manager.choose_image_format("thumbnail", request.accept_mimetypes)
+
+    def generate():
+        for index, jpg_path, jpg_stat in sources:
+            data = b''
+            if jpg_path:
+                try:
+                    data = file_manager.get_thumbnail(jpg_path, jpg_stat, image_format, size) or b''
+                except (FileNotFoundError, ImageProcessingError) as e:
+                    logger.warning(f"/api/image/thumbnails 中索引 {index} 的缩略图生成失败: {e}")
+                except Exception as e:
+                    logger.error(f"/api/image/thumbnails 中索引 {index} 发生未捕获的意外错误: {e}", exc_info=True)
+            yield THUMBNAIL_RECORD_HEADER.pack(index, len(data)) + data
+
+    response = Response(stream_with_context(generate()), mimetype='application/octet-stream')
+    response.headers['X-Load-Id'] = str(load_id)
+    response.headers['X-Image-Type'] = mimetype_for(image_format)
+    response.vary.add('Accept')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @app.route('/api/open_raw', methods=['POST'])
 def open_raw_file():
     logger.info("接收到 /api/open_raw 请求。")
@@ -377,15 +636,56 @@ def get_preview_image(index):
             logger.warning(f"/api/image/preview/{index} 处理失败: 索引 {index} 对应的 JPG 路径不可用。")
             return jsonify({"success": False, "message": f"索引 {index} 对应的图片文件路径不可用。"}), 404
 
-        img_byte_stream = file_manager.get_preview_image(jpg_path)
-
-        logger.info(f"/api/image/preview/{index} 处理成功。返回图片流。")
-        return send_file(
-            img_byte_stream,
-            mimetype='image/jpeg',
-            as_attachment=False
-        ), 200
-
+        # 可选的最长边上限：只解码到所需分辨率（JPEG 解码时即缩小），不提供时返回原始分辨率
+        max_size = request.args.get('max_size', type=int)
+        if max_size is not None and max_size <= 0:
+            return jsonify({"success": False, "message": "max_size 必须 > 0。"}), 400
+        viewport = _requested_preview_viewport()
+        if viewport is None:
+            return jsonify({"success": False, "message": "width、height 必须是正整数，dpr 必须在 0 到 "
+                                                         f"{MAX_DEVICE_PIXEL_RATIO} 之间。"}), 400
+        if viewport:
+            if max_size is not None:
+                return jsonify({"success": False, "message": "max_size 不能与 width / height 同时使用。"}), 400
+            # 对齐到预览档位，同一档位内不同窗口大小共用缓存；超过最大一档时为原始分辨率
+            max_size = file_manager.resolve_preview_size(*viewport)
+
+        # X-Preview-Client 请求头为浏览器标签页标识：同一标签页的新请求会取代尚未开始解码的旧请求（按住方向键快速切换时）。
+        # 不放在 URL 中，预览图 URL 只由索引、版本与尺寸决定，不同标签页与会话共用浏览器缓存；
+        # 也不用 Cookie，Cookie 由同一来源的所有标签页共用，一个标签页的请求会取代另一个标签页的请求
+        is_superseded = file_manager.begin_preview_request(request.headers.get('X-Preview-Client'))
+
+        image_format = file_manager.choose_image_format("preview", request.accept_mimetypes)
+        jpg_stat = app_state.get_image_file_stat(index, 'jpg')
+        # 直接发送原图时响应总是 JPEG，ETag 按实际发送的格式计算；能否直接发送的判断保存在文件夹索引中，
+        # 重新验证（304）时不打开文件
+        passthrough_path = file_manager.get_preview_passthrough_path(jpg_path, max_size=max_size,
+                                                                 image_format=image_format, file_stat=jpg_stat)
+        sent_format = DEFAULT_IMAGE_FORMAT if passthrough_path is not None else image_format
+        etag, immutable = _image_cache_validators(index, f"preview-{max_size or 'full'}.{sent_format}")
+        not_modified = _not_modified_response(etag, immutable)
+        if not_modified is not None:
+            logger.info(f"/api/image/preview/{index} 未修改，返回 304。")
+            return not_modified
+
+        if passthrough_path is not None:
+            logger.info(f"/api/image/preview/{index} 原图无需变换，直接发送文件。")
+            file_manager.record_preview_request(jpg_path, max_size, image_format, "passthrough")
+            return _with_cache_headers(_send_image_file(passthrough_path), etag, immutable), 200
+
+        cached = file_manager.is_preview_cached(jpg_path, max_size, image_format, file_stat=jpg_stat)
+        file_manager.record_preview_request(jpg_path, max_size, image_format, "hit" if cached else "miss")
+        preview_bytes = file_manager.get_preview_image(jpg_path, max_size=max_size, image_format=image_format,
+                                                       file_stat=jpg_stat, is_superseded=is_superseded)
+
+        logger.info(f"/api/image/preview/{index} 处理成功。返回图片。")
+        response = Response(preview_bytes, mimetype=mimetype_for(image_format))
+        return _with_cache_headers(response, etag, immutable), 200
+
+    except RenderSupersededError as e:
+         # 浏览器已切换到更新的图片，不会再使用这个响应
+         logger.info(f"/api/image/preview/{index} 已被同一标签页更新的请求取代。")
+         return jsonify({"success": False, "message": str(e)}), 409
     except InvalidIndexError as e:
          logger.warning(f"/api/image/preview/{index} 处理失败: {e}")
          return jsonify({"success": False, "message": str(e)}), 400
@@ -398,3 +698,58 @@ def get_preview_image(index):
     except Exception as e:
         logger.error(f"/api/image/preview/{index} 发生未捕获的意外错误: {e}", exc_info=True)
         return jsonify({"success": False, "message": "获取预览图片时发生未知的服务器内部错误。"}), 500
+
+@app.route('/api/image/tiles/<int:index>/info', methods=['GET'])
+def get_tile_info(index):
+    """深度缩放瓦片金字塔的描述：原图（显示方向）尺寸、瓦片边长与最高层级，供前端放大时计算可见瓦片。"""
+    try:
+        jpg_path = app_state.get_image_file_path(index, 'jpg')
+        if not jpg_path:
+            return jsonify({"success": False, "message": f"索引 {index} 对应的图片文件路径不可用。"}), 404
+        return jsonify({"success": True, **file_manager.get_tile_info(jpg_path)}), 200
+    except InvalidIndexError as e:
+         logger.warning(f"/api/image/tiles/{index}/info 处理失败: {e}")
+         return jsonify({"success": False, "message": str(e)}), 400
+    except FileNotFoundError as e:
+         logger.warning(f"/api/image/tiles/{index}/info 处理失败，文件未找到: {e}")
+         return jsonify({"success": False, "message": f"索引 {index} 对应的图片文件未找到。"}), 404
+    except ImageProcessingError as e:
+         logger.error(f"/api/image/tiles/{index}/info 处理失败: {e}", exc_info=True)
+         return jsonify({"success": False, "message": str(e)}), 500
+    except Exception as e:
+        logger.error(f"/api/image/tiles/{index}/info 发生未捕获的意外错误: {e}", exc_info=True)
+        return jsonify({"success": False, "message": "获取瓦片信息时发生未知的服务器内部错误。"}), 500
+
+@app.route('/api/image/tile/<int:index>/<int:level>/<int:x>/<int:y>', methods=['GET'])
+def get_tile(index, level, x, y):
+    """深度缩放瓦片（Deep Zoom 层级，最高层级为原始分辨率）：按需从原图生成并缓存，只有视口内的瓦片会被请求。"""
+    try:
+        image_format = file_manager.choose_image_format("preview", request.accept_mimetypes)
+        etag, immutable = _image_cache_validators(index, f"tile-{level}-{x}-{y}.{image_format}")
+        not_modified = _not_modified_response(etag, immutable)
+        if not_modified is not None:
+            return not_modified
+
+        jpg_path = app_state.get_image_file_path(index, 'jpg')
+        if not jpg_path:
+            return jsonify({"success": False, "message": f"索引 {index} 对应的图片文件路径不可用。"}), 404
+        tile_bytes = file_manager.get_tile(jpg_path, level, x, y, image_format,
+                                           file_stat=app_state.get_image_file_stat(index, 'jpg'))
+        if tile_bytes is None:
+            return jsonify({"success": False, "message": f"瓦片 {level}/{x}/{y} 超出范围。"}), 404
+
+        response = Response(tile_bytes, mimetype=mimetype_for(image_format))
+        return _with_cache_headers(response, etag, immutable), 200
+
+    except InvalidIndexError as e:
+         logger.warning(f"/api/image/tile/{index} 处理失败: {e}")
+         return jsonify({"success": False, "message": str(e)}), 400
+    except FileNotFoundError as e:
+         logger.warning(f"/api/image/tile/{index} 处理失败，文件未找到: {e}")
+         return jsonify({"success": False, "message": f"索引 {index} 对应的图片文件未找到。"}), 404
+    except ImageProcessingError as e:
+         logger.error(f"/api/image/tile/{index} 处理失败: {e}", exc_info=True)
+         return jsonify({"success": False, "message": f"生成瓦片失败: {e}"}), 500
+    except Exception as e:
+        logger.error(f"/api/image/tile/{index} 发生未捕获的意外错误: {e}", exc_info=True)
+        return jsonify({"success": False, "message": "获取瓦片时发生未知的服务器内部错误。"}), 500
@@ -1,4 +1,6 @@
 import { FRONTEND_CONFIG } from './config.js';
+import * as pairs from './pairs.js';
+import * as thumbnails from './thumbnails.js';
 
 let api;
 let ui;
@@ -84,7 +86,8 @@ export async function loadFoldersAction() {
     ui.updateNavigationButtons();
 
     let initialIndex = null;
-    let sortOrder = null;
+    let sortOrder = null; // Sort direction from history ('asc' / 'desc')
+    let sortMode = null; // Backend sort mode from history (e.g. 'capture_time')
 
     console.log('Actions: Attempting to load history...'); // Add this log
     // 尝试加载历史记录
@@ -94,7 +97,8 @@ export async function loadFoldersAction() {
         if (historyResponse && historyResponse.success && historyResponse.history) {
             initialIndex = historyResponse.history.last_index;
             sortOrder = historyResponse.history.sort_order;
-            console.log(`Actions: 找到历史记录，初始索引: ${initialIndex}, 排序方式: ${sortOrder}`);
+            sortMode = historyResponse.history.sort_mode || null;
+            console.log(`Actions: 找到历史记录，初始索引: ${initialIndex}, 排序方向: ${sortOrder}, 排序方式: ${sortMode}`);
         } else {
             console.log('Actions: 未找到历史记录或加载失败，使用默认设置。');
         }
@@ -105,20 +109,34 @@ export async function loadFoldersAction() {
 
     console.log('Actions: Proceeding to load folders...'); // Add this log
 
+    // Clear the grid; the first thumbnails are appended batch by batch as the backend scans.
+    resetLoadedState();
+    ui.renderThumbnails();
+
     try {
-        // 调用后端 load_folders，传递历史记录中的索引和排序方式
-        const response = await api.loadFolders(jpgPath, rawPath, initialIndex, sortOrder);
+        // 调用后端流式 load_folders，传递历史记录中的索引和排序方式。
+        // Only the first screenful of pairs travels with the stream; the rest is paged in by the grid.
+        const response = await api.loadFoldersStream(jpgPath, rawPath, initialIndex, sortMode, (message) => {
+            if (message.type === 'pairs') {
+                const startDisplayIndex = appState.totalImages;
+                appState.totalImages = message.total_images;
+                ui.appendThumbnails(message.pairs, startDisplayIndex);
+            } else if (message.type === 'progress') {
+                appState.totalImages = message.total_images;
+                ui.updateInfoLabel();
+            }
+        }, config.STREAM_PREVIEW_LIMIT);
 
         if (response && response.success) {
-            appState.imagePairsInfo = response.image_pairs_info || [];
-            appState.currentIndex = response.current_index;
+            appState.loadId = response.load_id;
             appState.totalImages = response.total_images;
             appState.jpgFolder = response.jpg_folder;
             appState.rawFolder = response.raw_folder;
             appState.isLoaded = true;
-            appState.current_image_metadata = response.current_image_metadata || {};
+            applyMetadataFromStatus(response);
             appState.isViewerMode = response.is_viewer_mode;
             appState.sortOrder = response.sort_order; // Store the sort order from backend
+            ui.updateSortModeSelect();
 
             // Apply initial sort direction
             if (sortOrder !== null && sortOrder !== undefined) {
@@ -127,11 +145,9 @@ export async function loadFoldersAction() {
                 appState.isSortedAscending = true; // Default to ascending if no history
             }
 
-            // Sort the image pairs based on the current sort direction
-            sortImagePairs(); // This will sort appState.imagePairsInfo directly
-
-            // Store the original image pairs info (This is no longer needed if imagePairsInfo is always sorted)
-            // appState.originalImagePairsInfo = [...appState.imagePairsInfo]; // Remove this line
+            // The display order is final now: drop the streamed (scan-order) pairs and page in the sorted list.
+            pairs.clearPairs();
+            applyCurrentFromStatus(response);
 
             ui.renderThumbnails();
             ui.updateUI();
@@ -149,26 +165,18 @@ export async function loadFoldersAction() {
             });
         } else {
             const message = response && response.message ? `后端错误: ${response.message}` : '加载图片对时发生未知错误。';
-            appState.imagePairsInfo = [];
-            appState.currentIndex = -1;
-            appState.totalImages = 0;
-            appState.isLoaded = false;
-            appState.sortOrder = "time_filename"; // Reset sort order on failure
+            resetLoadedState();
 
-            ui.renderThumbnails([]);
+            ui.renderThumbnails();
             ui.updateUI();
             ui.showErrorMessage(message, false);
         }
 
     } catch (error) {
         console.error('Actions: loadFolders API 调用失败:', error);
-        appState.imagePairsInfo = [];
-        appState.currentIndex = -1;
-        appState.totalImages = 0;
-        appState.isLoaded = false;
-        appState.sortOrder = "time_filename"; // Reset sort order on failure
+        resetLoadedState();
 
-        ui.renderThumbnails([]);
+        ui.renderThumbnails();
         ui.updateUI();
         ui.showErrorMessage(`加载图片对失败: ${error.message}`, false);
     } finally {
@@ -189,30 +197,28 @@ export async function selectImageAction(displayIndex) {
         return;
     }
 
-    // Get the original index from the imagePairsInfo array using the displayIndex
-    const originalIndex = appState.imagePairsInfo[displayIndex].index;
-    console.log(`Actions: 尝试选择显示索引 ${displayIndex} (原始索引 ${originalIndex})`);
-
     ui.updateNavigationButtons();
 
+    let originalIndex;
     try {
+        // Get the original index of the pair at this display index (fetching its page if it is not cached)
+        const pair = await pairs.getPair(displayIndex);
+        if (!pair) {
+            ui.showErrorMessage(`无效的图片索引: ${displayIndex + 1}.`, true);
+            return;
+        }
+        originalIndex = pair.index;
+        console.log(`Actions: 尝试选择显示索引 ${displayIndex} (原始索引 ${originalIndex})`);
+
         // Pass the original index to the backend API
         const response = await api.selectImage(originalIndex);
 
         if (response && response.success) {
-            // Backend returns the original index, but we need to find its new display index
-            // This is crucial for maintaining the correct highlight and preview after selection
-            const newDisplayIndex = appState.imagePairsInfo.findIndex(pair => pair.index === response.current_index);
-            if (newDisplayIndex !== -1) {
-                appState.currentIndex = newDisplayIndex; // Update appState.currentIndex with the display index
-            } else {
-                console.warn(`Actions: selectImageAction 无法在排序后的列表中找到原始索引 ${response.current_index} 对应的显示索引。`);
-                appState.currentIndex = 0; // Fallback
-            }
-
-            appState.current_image_metadata = response.current_image_metadata || {};
+            // Backend reports the position in its own order; map it to the display index
+            applyCurrentFromStatus(response);
+            applyMetadataFromStatus(response);
             ui.updateUI();
-            saveHistoryAction(); // Save history with the original index
+            saveHistoryAction(); // Save history with the backend position
         } else {
             const message = response && response.message ? `后端错误: ${response.message}` : '选择图片时发生未知错误。';
             ui.showErrorMessage(message, false);
@@ -241,11 +247,12 @@ export async function nextImageAction() {
     ui.updateNavigationButtons();
 
     try {
-        const response = await api.nextImage();
+        // The backend walks its own (ascending) display order, so "next" is its previous when descending.
+        const response = appState.isSortedAscending ? await api.nextImage() : await api.prevImage();
 
         if (response && response.success) {
-            appState.currentIndex = response.current_index;
-            appState.current_image_metadata = response.current_image_metadata || {}; // 添加此行
+            applyCurrentFromStatus(response);
+            applyMetadataFromStatus(response);
             ui.updateUI();
             saveHistoryAction(); // 保存历史记录
         } else {
@@ -276,11 +283,11 @@ export async function prevImageAction() {
     ui.updateNavigationButtons();
 
     try {
-        const response = await api.prevImage();
+        const response = appState.isSortedAscending ? await api.prevImage() : await api.nextImage();
 
         if (response && response.success) {
-            appState.currentIndex = response.current_index;
-            appState.current_image_metadata = response.current_image_metadata || {}; // 添加此行
+            applyCurrentFromStatus(response);
+            applyMetadataFromStatus(response);
             ui.updateUI();
             saveHistoryAction(); // 保存历史记录
         } else {
@@ -321,6 +328,38 @@ export async function openRawAction() {
     }
 }
 
+/**
+ * Re-checks the RAW sidecar files (.xmp/.acr) and updates the edit markers of the affected thumbnails,
+ * or reloads the display order when it is sorted by edit status.
+ * Cheap when nothing changed: the backend only stats the RAW folder.
+ */
+export async function refreshModifiedStatusAction() {
+    if (!appState.isLoaded || appState.isViewerMode || appState.isLoading) {
+        return;
+    }
+
+    try {
+        const response = await api.refreshModified();
+        if (!response || !response.success || response.changes.length === 0) {
+            return;
+        }
+        const modifiedByIndex = new Map(response.changes.map(change => [change.index, change.is_modified]));
+        if (response.reordered) {
+            // Sorted by edit status: the changed pairs moved, reload the display order
+            pairs.clearPairs();
+            applyCurrentFromStatus(response);
+            ui.renderThumbnails();
+            ui.updateUI();
+        } else {
+            pairs.updateModifiedStatus(modifiedByIndex);
+            ui.updateThumbnailModifiedStatus(modifiedByIndex);
+        }
+        console.log(`Actions: RAW 编辑状态已刷新，${response.changes.length} 个图片对发生变化。`);
+    } catch (error) {
+        console.error('Actions: refreshModified API 调用失败:', error);
+    }
+}
+
 /**
  * Handles the action of updating default paths from input fields.
  * Triggered when input fields change. Uses debouncing.
@@ -354,18 +393,23 @@ export async function initialLoadAction() {
         const statusResponse = await api.getStatus();
 
         if (statusResponse && statusResponse.success) {
-            appState.currentIndex = statusResponse.current_index;
+            appState.loadId = statusResponse.load_id;
             appState.totalImages = statusResponse.total_images;
+            applyCurrentFromStatus(statusResponse);
             appState.jpgFileName = statusResponse.jpg_file_name;
             appState.rawFileName = statusResponse.raw_file_name;
             appState.jpgFolder = statusResponse.jpg_folder;
             appState.rawFolder = statusResponse.raw_folder;
             appState.isLoaded = statusResponse.is_loaded;
-            appState.current_image_metadata = statusResponse.current_image_metadata || {};
+            applyMetadataFromStatus(statusResponse);
             appState.sortOrder = statusResponse.sort_order; // Initialize sort order from status
+            ui.updateSortModeSelect();
 
             // Removed lines that were overwriting input field values
 
+            if (appState.isLoaded) {
+                ui.renderThumbnails(); // Pages in the grid of a load that is still active on the backend
+            }
             ui.updateInfoLabel();
             ui.updateNavigationButtons();
 
@@ -402,7 +446,9 @@ async function saveHistoryAction() {
     }
 
     try {
-        const response = await api.saveHistory(appState.jpgFolder, appState.currentIndex, appState.isSortedAscending ? 'asc' : 'desc');
+        // The backend expects the position in its own (ascending) display order.
+        const position = toBackendPosition(appState.currentIndex);
+        const response = await api.saveHistory(appState.jpgFolder, position, appState.isSortedAscending ? 'asc' : 'desc', appState.sortOrder);
         if (!response || !response.success) {
             console.warn('Actions: 保存历史记录失败:', response ? response.message : '未知错误');
         } else {
@@ -415,58 +461,128 @@ async function saveHistoryAction() {
 
 /**
  * Toggles the sort direction of the image pairs.
+ * The backend order is unchanged; only the mapping between display index and backend position flips,
+ * so the cached pages are dropped and the grid pages in the reversed windows.
  */
 export function toggleSortDirectionAction() {
-    if (!appState.isLoaded || appState.imagePairsInfo.length === 0) {
+    if (!appState.isLoaded || appState.totalImages === 0) {
         console.warn('Actions: 无法切换排序，未加载图片或图片列表为空。');
         return;
     }
 
-    if (!appState.isLoaded || appState.imagePairsInfo.length === 0) {
-        console.warn('Actions: 无法切换排序，未加载图片或图片列表为空。');
-        return;
-    }
+    const currentPosition = toBackendPosition(appState.currentIndex); // Position of the selected image in backend order
+    console.log(`Actions: 切换排序前，当前选中图片的后端位置: ${currentPosition}, 当前显示索引: ${appState.currentIndex}`);
 
-    const currentOriginalIndex = appState.imagePairsInfo[appState.currentIndex].index; // Get the original index of the currently selected image
-    console.log(`Actions: 切换排序前，当前选中图片的原始索引: ${currentOriginalIndex}, 当前显示索引: ${appState.currentIndex}`);
-    console.log('Actions: 切换排序前 imagePairsInfo (部分):', appState.imagePairsInfo.slice(0, 5), '...', appState.imagePairsInfo.slice(-5));
+    appState.isSortedAscending = !appState.isSortedAscending; // Toggle sort state
+    pairs.clearPairs();
 
+    // Keep the same image selected at its new display index
+    appState.currentIndex = toDisplayIndex(currentPosition);
+    console.log(`Actions: 切换排序后，当前选中图片的新显示索引: ${appState.currentIndex}`);
 
-    appState.isSortedAscending = !appState.isSortedAscending; // Toggle sort state
-    sortImagePairs(); // Sort the array (modifies appState.imagePairsInfo in place)
+    ui.renderThumbnails(); // Re-render the visible window after sorting
+    ui.updateUI(); // Update UI to reflect new current index and highlight
+    saveHistoryAction(); // Save the new sort order to history
+    console.log(`Actions: Toggled sort direction to ${appState.isSortedAscending ? 'ascending' : 'descending'}`);
+}
 
-    // Find the new index of the previously selected image
-    const newCurrentIndex = appState.imagePairsInfo.findIndex(pair => pair.index === currentOriginalIndex);
-    console.log(`Actions: 切换排序后，当前选中图片的原始索引: ${currentOriginalIndex}, 在新列表中的新索引: ${newCurrentIndex}`);
-    console.log('Actions: 切换排序后 imagePairsInfo (部分):', appState.imagePairsInfo.slice(0, 5), '...', appState.imagePairsInfo.slice(-5));
+/**
+ * Switches the backend sort mode (capture time, filename, size, ...).
+ * The backend only permutes precomputed sort keys, so the folders are not rescanned;
+ * the selected image stays selected and the grid pages in the new order.
+ * @param {string} sortMode One of the backend sort modes.
+ */
+export async function changeSortModeAction(sortMode) {
+    if (!appState.isLoaded || appState.totalImages === 0 || sortMode === appState.sortOrder) {
+        ui.updateSortModeSelect(); // Nothing loaded to sort: show the current mode again
+        return;
+    }
+    ui.clearErrorMessage();
 
+    try {
+        const response = await api.setSortOrder(sortMode);
+        if (response && response.success) {
+            appState.sortOrder = response.sort_order;
+            pairs.clearPairs();
+            applyCurrentFromStatus(response);
+            ui.renderThumbnails();
+            ui.updateUI();
+            saveHistoryAction();
+        } else {
+            const message = response && response.message ? `后端错误: ${response.message}` : '切换排序方式时发生未知错误。';
+            ui.showErrorMessage(message, false);
+        }
+    } catch (error) {
+        console.error('Actions: setSortOrder API 调用失败:', error);
+        ui.showErrorMessage(`切换排序方式失败: ${error.message}`, false);
+    } finally {
+        ui.updateSortModeSelect();
+    }
+}
 
-    if (newCurrentIndex !== -1) {
-        appState.currentIndex = newCurrentIndex; // Update current index to maintain selection
-    } else {
-        // Fallback if for some reason the image is not found (shouldn't happen)
-        appState.currentIndex = 0; // Reset to first image if original not found
-        console.warn('Actions: 切换排序后未能找到原选中图片，重置到第一张。');
+/**
+ * Maps a position in the backend (ascending) display order to the display index for the current direction.
+ * The mapping is its own inverse, see toBackendPosition.
+ * @param {number} position
+ * @returns {number} The display index, or -1 if position is -1.
+ */
+function toDisplayIndex(position) {
+    if (position === null || position === undefined || position < 0) {
+        return -1;
     }
+    return appState.isSortedAscending ? position : appState.totalImages - 1 - position;
+}
 
-    console.log(`Actions: 在调用 ui.updateUI() 前，appState.currentIndex: ${appState.currentIndex}`);
-    ui.renderThumbnails(); // Re-render thumbnails after sorting
-    ui.updateUI(); // Update UI to reflect new current index and highlight
-    console.log(`Actions: 在调用 ui.updateUI() 后，appState.currentIndex: ${appState.currentIndex}`);
-    saveHistoryAction(); // Save the new sort order to history
-    console.log(`Actions: Toggled sort direction to ${appState.isSortedAscending ? 'ascending' : 'descending'}`);
+/**
+ * Maps a display index to the position in the backend (ascending) display order.
+ * @param {number} displayIndex
+ * @returns {number}
+ */
+function toBackendPosition(displayIndex) {
+    return toDisplayIndex(displayIndex);
 }
 
 /**
- * Sorts the image pairs based on the current sort direction.
+ * Updates the selection in appState from a backend status response.
+ * @param {object} response A status response with current_index (stable index), current_position and current_version.
  */
-function sortImagePairs() {
-    // The backend already sorts by time then filename.
-    // Here, we sort by the original index to achieve ascending/descending display.
-    if (appState.isSortedAscending) {
-        appState.imagePairsInfo.sort((a, b) => a.index - b.index); // Sort by original index ascending
-    } else {
-        appState.imagePairsInfo.sort((a, b) => b.index - a.index); // Sort by original index descending
+function applyCurrentFromStatus(response) {
+    appState.currentPairIndex = response.current_index;
+    appState.currentPairVersion = response.current_version || null;
+    appState.currentIndex = toDisplayIndex(response.current_position);
+}
+
+/**
+ * Stores the current image's metadata from a status response. When the backend has not read it yet
+ * (metadata_pending), fetches it separately and updates the info label if the user is still on that image.
+ * @param {object} response A status response from the backend.
+ */
+function applyMetadataFromStatus(response) {
+    appState.current_image_metadata = response.current_image_metadata || {};
+    if (!response.metadata_pending) {
+        return;
     }
-    console.log(`Actions: Image pairs sorted in ${appState.isSortedAscending ? 'ascending' : 'descending'} order.`);
+    const index = response.current_index;
+    api.getImageMetadata(index).then(result => {
+        if (result && result.success && appState.currentPairIndex === index) {
+            appState.current_image_metadata = result.metadata || {};
+            ui.updateInfoLabel();
+        }
+    }).catch(error => {
+        console.warn(`Actions: 获取图片 ${index} 的元数据失败:`, error);
+    });
+}
+
+/**
+ * Resets the loaded-folder part of appState, the paged pair cache and the thumbnail cache.
+ */
+function resetLoadedState() {
+    pairs.clearPairs();
+    thumbnails.clearThumbnails(); // Stable indices of the next load refer to other images
+    appState.currentIndex = -1;
+    appState.currentPairIndex = -1;
+    appState.currentPairVersion = null;
+    appState.totalImages = 0;
+    appState.isLoaded = false;
+    appState.sortOrder = "time_filename"; // Reset sort order on failure
 }
@@ -3,6 +3,45 @@ import { appState } from './state.js';
 
 const API_BASE_URL = FRONTEND_CONFIG.API_BASE_URL;
 
+// 1x1 images used to detect which modern formats this browser can decode, most preferred first.
+const IMAGE_FORMAT_PROBES = [
+    ['image/avif', 'data:image/avif;base64,AAAAIGZ0eXBhdmlmAAAAAGF2aWZtaWYxbWlhZk1BMUIAAADrbWV0YQAAAAAAAAAhaGRscgAAAAAAAAAAcGljdAAAAAAAAAAAAAAAAAAAAAAOcGl0bQAAAAAAAQAAAB5pbG9jAAAAAEQAAAEAAQAAAAEAAAETAAAAIQAAAChpaW5mAAAAAAABAAAAGmluZmUCAAAAAAEAAGF2MDFDb2xvcgAAAABqaXBycAAAAEtpcGNvAAAAFGlzcGUAAAAAAAAAAQAAAAEAAAAQcGl4aQAAAAADCAgIAAAADGF2MUOBAAwAAAAAE2NvbHJuY2x4AAEADQAGgAAAABdpcG1hAAAAAAAAAAEAAQQBAoMEAAAAKW1kYXQSAAoIGAAGiAhoNCAyExlHh4Yhh5555oAAAJBAyRxgimo='],
+    ['image/webp', 'data:image/webp;base64,UklGRh4AAABXRUJQVlA4TBEAAAAvAAAAAAfQ//73v/+BiOh/AAA='],
+];
+let imageAcceptPromise = null;
+
+// Identifies this tab to the backend so a newer preview request supersedes older ones still waiting to render.
+// Sent in the X-Preview-Client header of a fetch rather than in the URL, so preview URLs depend only on index, version
+// and size and stay shareable across tabs and sessions in the browser cache. Not a cookie: cookies are shared by all
+// tabs of the origin, so one tab's previews would supersede another's.
+const PREVIEW_CLIENT_ID = (() => {
+    let id = sessionStorage.getItem('previewClientId');
+    if (!id) {
+        id = Math.random().toString(36).slice(2, 10);
+        sessionStorage.setItem('previewClientId', id);
+    }
+    return id;
+})();
+
+/**
+ * Builds the Accept header for image requests made with fetch, which would otherwise send a wildcard Accept and get JPEG.
+ * Image elements send the browser's own image Accept header, so only fetched images need this.
+ * @returns {Promise<string>}
+ */
+function getImageAcceptHeader() {
+    if (!imageAcceptPromise) {
+        const probe = ([type, dataUrl]) => new Promise(resolve => {
+            const img = new Image();
+            img.onload = () => resolve(img.width > 0 ? type : null);
+            img.onerror = () => resolve(null);
+            img.src = dataUrl;
+        });
+        imageAcceptPromise = Promise.all(IMAGE_FORMAT_PROBES.map(probe))
+            .then(types => [...types.filter(Boolean), 'image/jpeg'].join(','));
+    }
+    return imageAcceptPromise;
+}
+
 /**
  * Generic fetch wrapper with error handling and JSON parsing.
  * @param {string} endpoint The API endpoint path (e.g., '/load_folders').
@@ -70,6 +109,80 @@ export const api = {
         return fetchJson('/load_folders', options);
     },
 
+    /**
+     * Streaming variant of loadFolders. The backend answers with NDJSON: one
+     * {type: 'pairs'} message per scanned batch, then a final {type: 'done'} status.
+     * With previewLimit set, only the first previewLimit pairs are sent; later batches
+     * arrive as {type: 'progress'} counts and the full list is paged in through getPairs.
+     * @param {function} onMessage Called with every parsed message as it arrives.
+     * @returns {Promise<object>} Promise resolving with the final 'done' message.
+     * @throws {Error} Throws if the request fails or the stream reports an error.
+     */
+    async loadFoldersStream(jpgPath, rawPath, initialIndex = null, sortOrder = null, onMessage = () => {}, previewLimit = null) {
+        const response = await fetchJson('/load_folders/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                jpg_folder: jpgPath,
+                raw_folder: rawPath,
+                initial_index: initialIndex,
+                sort_order: sortOrder,
+                preview_limit: previewLimit
+            })
+        });
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder('utf-8');
+        let buffered = '';
+        let doneMessage = null;
+
+        const handleLine = (line) => {
+            if (!line.trim()) {
+                return;
+            }
+            const message = JSON.parse(line);
+            if (message.type === 'error') {
+                const error = new Error(`API 请求失败: ${message.message}`);
+                error.status = message.status;
+                error.body = message;
+                throw error;
+            }
+            if (message.type === 'done') {
+                doneMessage = message;
+            }
+            onMessage(message);
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split('\n');
+            buffered = lines.pop();
+            lines.forEach(handleLine);
+        }
+        buffered += decoder.decode();
+        handleLine(buffered);
+
+        if (!doneMessage) {
+            throw new Error('API 请求失败: 加载流意外结束。');
+        }
+        return doneMessage;
+    },
+
+    /**
+     * Fetches one window of pair infos in display order.
+     * @param {number} offset The display index of the first pair.
+     * @param {number} limit The maximum number of pairs to return.
+     * @param {boolean} descending Whether the window is taken from the reversed order.
+     */
+    async getPairs(offset, limit, descending = false) {
+        const params = new URLSearchParams({ offset, limit, descending });
+        return fetchJson(`/pairs?${params.toString()}`);
+    },
+
     /** Calls the backend to get the current application status. */
     async getStatus() {
         return fetchJson('/status');
@@ -93,9 +206,85 @@ export const api = {
         return fetchJson('/previous_image', options);
     },
 
-    /** Returns the URL for a specific thumbnail image by index. No fetch call here. */
-    getThumbnailUrl(index) {
-        return `${API_BASE_URL}/image/thumbnail/${index}`;
+    /**
+     * Fetches the EXIF metadata of a pair's JPG. Used when a status response reports metadata_pending,
+     * so navigation never waits for the file to be read.
+     */
+    async getImageMetadata(index) {
+        return fetchJson(`/image/metadata/${index}`);
+    },
+
+    /**
+     * Returns the URL for a specific thumbnail image by index. No fetch call here.
+     * With the pair's content version the URL is content-addressed and the browser may cache it forever.
+     * @param {?number} size A THUMBNAIL_SIZES entry; the server's base size when omitted.
+     */
+    getThumbnailUrl(index, version = null, size = null) {
+        const params = new URLSearchParams();
+        if (version) {
+            params.append('v', version);
+        }
+        if (size) {
+            params.append('size', size);
+        }
+        const query = params.toString();
+        return `${API_BASE_URL}/image/thumbnail/${index}${query ? `?${query}` : ''}`;
+    },
+
+    /** Returns a srcset listing every thumbnail rendition size of a pair, with width descriptors. */
+    getThumbnailSrcset(index, version = null) {
+        return FRONTEND_CONFIG.THUMBNAIL_SIZES
+            .map(size => `${this.getThumbnailUrl(index, version, size)} ${size}w`)
+            .join(', ');
+    },
+
+    /**
+     * Fetches several thumbnails in one request and parses the length-prefixed response as it streams in.
+     * Each record is a big-endian uint32 stable index, a uint32 byte length and the image bytes (length 0 = failed).
+     * All images in a response share one format, negotiated from the Accept header and reported in X-Image-Type.
+     * @param {Array<number>} indices Stable pair indices.
+     * @param {number} size Rendition size, a THUMBNAIL_SIZES entry.
+     * @param {function(number, ?Uint8Array, string): void} onThumbnail Called with the index, bytes and MIME type of
+     *     every record as soon as it is complete.
+     * @returns {Promise<void>} Resolves when the whole response has been read.
+     */
+    async getThumbnailBatch(indices, size, onThumbnail) {
+        const response = await fetch(`${API_BASE_URL}/image/thumbnails?indices=${indices.join(',')}&size=${size}`, {
+            headers: { 'Accept': await getImageAcceptHeader() },
+        });
+        if (!response.ok || !response.body) {
+            throw new Error(`API 请求失败: HTTP 状态码 ${response.status}`);
+        }
+        const type = response.headers.get('X-Image-Type') || 'image/jpeg';
+
+        const reader = response.body.getReader();
+        let buffer = new Uint8Array(0);
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            const merged = new Uint8Array(buffer.length + value.length);
+            merged.set(buffer);
+            merged.set(value, buffer.length);
+            buffer = merged;
+
+            let offset = 0;
+            while (buffer.length - offset >= 8) {
+                const view = new DataView(buffer.buffer, buffer.byteOffset + offset, 8);
+                const index = view.getUint32(0);
+                const length = view.getUint32(4);
+                if (buffer.length - offset - 8 < length) {
+                    break;
+                }
+                onThumbnail(index, length > 0 ? buffer.subarray(offset + 8, offset + 8 + length) : null, type);
+                offset += 8 + length;
+            }
+            buffer = buffer.subarray(offset);
+        }
+        if (buffer.length > 0) {
+            throw new Error('缩略图批量响应不完整。');
+        }
     },
 
     /** Calls the backend to open the current RAW file with an external application. */
@@ -104,6 +293,12 @@ export const api = {
         return fetchJson('/open_raw', options);
     },
 
+    /** Asks the backend to re-check RAW sidecar files; resolves with the pairs whose edit status changed. */
+    async refreshModified() {
+        const options = { method: 'POST' };
+        return fetchJson('/refresh_modified', options);
+    },
+
     /** Calls the backend to update the default folder paths in the .env file. */
     async updatePaths(jpgPath, rawPath) {
         const options = {
@@ -114,9 +309,61 @@ export const api = {
         return fetchJson('/update_paths', options);
     },
 
-    /** Returns the URL for the current preview image. No fetch call here. */
-    getPreviewUrl(index) {
-        return `${API_BASE_URL}/image/preview/${index}`;
+    /**
+     * Returns the URL for a preview image (content-addressed when the version is known). No fetch call here;
+     * load it with fetchPreview so the request carries this tab's client id.
+     * @param {number} index The pair's original index.
+     * @param {string|null} version The pair's content version.
+     * @param {{width: number, height: number, dpr: number}|null} viewport The preview area in CSS pixels and the
+     *     device pixel ratio; the backend snaps it to a cacheable size. Omit for full resolution.
+     */
+    getPreviewUrl(index, version = null, viewport = null) {
+        const params = new URLSearchParams();
+        if (version) {
+            params.append('v', version);
+        }
+        if (viewport) {
+            params.append('width', Math.ceil(viewport.width));
+            params.append('height', Math.ceil(viewport.height));
+            params.append('dpr', viewport.dpr);
+        }
+        const query = params.toString();
+        return `${API_BASE_URL}/image/preview/${index}${query ? `?${query}` : ''}`;
+    },
+
+    /**
+     * Fetches a preview URL from getPreviewUrl with this tab's client id, so it supersedes this tab's older preview
+     * requests still waiting to render. The response goes through the browser's HTTP cache like an image element's.
+     * @param {string} url A URL from getPreviewUrl.
+     * @param {AbortSignal} signal Aborts the request once the preview is no longer wanted.
+     * @returns {Promise<Blob>}
+     * @throws {Error} Throws an error with a status property if the response status is not OK.
+     */
+    async fetchPreview(url, signal) {
+        const response = await fetch(url, {
+            headers: { 'Accept': await getImageAcceptHeader(), 'X-Preview-Client': PREVIEW_CLIENT_ID },
+            signal,
+        });
+        if (!response.ok) {
+            const error = new Error(`API 请求失败: HTTP 状态码 ${response.status}`);
+            error.status = response.status;
+            throw error;
+        }
+        return response.blob();
+    },
+
+    /**
+     * Fetches the deep-zoom pyramid description of a pair's JPG: { width, height, tile_size, max_level }.
+     * Level max_level is the original resolution; each lower level halves both sides.
+     */
+    async getTileInfo(index, version = null) {
+        return fetchJson(`/image/tiles/${index}/info${version ? `?v=${version}` : ''}`);
+    },
+
+    /** Returns the URL of one deep-zoom tile (content-addressed when the version is known). No fetch call here. */
+    getTileUrl(index, version, level, x, y) {
+        const url = `${API_BASE_URL}/image/tile/${index}/${level}/${x}/${y}`;
+        return version ? `${url}?v=${version}` : url;
     },
 
     /** Calls the backend to load history for a specific JPG folder. */
@@ -126,15 +373,29 @@ export const api = {
         return fetchJson(`/load_history?${params.toString()}`);
     },
 
+    /**
+     * Calls the backend to switch the sort mode of the loaded pairs.
+     * @param {string} sortMode One of 'time_filename', 'capture_time', 'filename', 'size', 'edited_first'.
+     */
+    async setSortOrder(sortMode) {
+        const options = {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ sort_order: sortMode })
+        };
+        return fetchJson('/sort', options);
+    },
+
     /** Calls the backend to save history for the current state. */
-    async saveHistory(jpgFolder, currentIndex, sortOrder) {
+    async saveHistory(jpgFolder, currentIndex, sortOrder, sortMode = null) {
         const options = {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 jpg_folder: jpgFolder,
                 current_index: currentIndex,
-                sort_order: sortOrder
+                sort_order: sortOrder,
+                sort_mode: sortMode
             })
         };
         return fetchJson('/save_history', options);
@@ -1,4 +1,25 @@
+// Thumbnail sizes follow the server's THUMBNAIL_WIDTH and THUMBNAIL_SIZES settings (rendered into index.html).
+const serverSettings = document.body.dataset;
+const THUMBNAIL_WIDTH_PIXELS = Number(serverSettings.thumbnailWidth) || 150;
+// Space below the image for the file name, plus the item's padding and border.
+const THUMBNAIL_LABEL_HEIGHT = 26;
+
 export const FRONTEND_CONFIG = {
-    THUMBNAIL_WIDTH_PIXELS: 150,
+    THUMBNAIL_WIDTH_PIXELS,
+    // Available thumbnail rendition sizes, ascending; the grid picks one by slot size and device pixel ratio.
+    THUMBNAIL_SIZES: (serverSettings.thumbnailSizes || String(THUMBNAIL_WIDTH_PIXELS)).split(',').map(Number),
     API_BASE_URL: '/api',
+    // Virtualized thumbnail grid: pair infos are paged in from /api/pairs around the viewport.
+    PAIRS_PAGE_SIZE: 200,
+    PAIRS_MAX_CACHED_PAGES: 10,
+    STREAM_PREVIEW_LIMIT: 300,
+    THUMBNAIL_ITEM_HEIGHT: THUMBNAIL_WIDTH_PIXELS + THUMBNAIL_LABEL_HEIGHT,
+    THUMBNAIL_GRID_GAP: 5,
+    THUMBNAIL_OVERSCAN_ROWS: 3,
+    // Thumbnails are fetched in batches from /api/image/thumbnails (see thumbnails.js).
+    THUMBNAIL_BATCH_SIZE: 100,
+    THUMBNAIL_BATCH_DELAY_MS: 20,
+    THUMBNAIL_MAX_CACHED_URLS: 1500,
+    // Thumbnails kept in Cache Storage across visits; beyond this count the oldest written are dropped.
+    THUMBNAIL_MAX_PERSISTENT_ENTRIES: 5000,
 };
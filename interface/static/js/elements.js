@@ -24,6 +24,7 @@ export function initElements() {
         elements.nextImageButton = document.getElementById('next-image-button');
         elements.openRawButton = document.getElementById('open-raw-button');
         elements.toggleSortButton = document.getElementById('toggle-sort-button');
+        elements.sortModeSelect = document.getElementById('sort-mode-select');
         elements.prevImageOverlayButton = document.getElementById('prev-image-overlay-button'); // Add this line
         elements.nextImageOverlayButton = document.getElementById('next-image-overlay-button'); // Add this line
 
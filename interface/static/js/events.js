@@ -132,6 +132,9 @@ export function initEventHandlers(elementsRef, actionsRef, panningRef) {
         if (elements.toggleSortButton) { // Add event listener for the new sort button
             elements.toggleSortButton.addEventListener('click', () => actions.toggleSortDirectionAction());
         }
+        if (elements.sortModeSelect) {
+            elements.sortModeSelect.addEventListener('change', () => actions.changeSortModeAction(elements.sortModeSelect.value));
+        }
 
         // Add custom click/double-click and drag handling for the image container
         if (elements.imageContainer) {
@@ -194,6 +197,9 @@ export function initEventHandlers(elementsRef, actionsRef, panningRef) {
             });
         }
 
+        // Returning to the window (e.g. after editing a RAW in Photoshop/ACR) re-checks the .xmp/.acr sidecars
+        window.addEventListener('focus', () => actions.refreshModifiedStatusAction());
+
 
     } catch (error) {
         console.error('模块 js/events.js: 初始化事件监听器时发生错误:', error);
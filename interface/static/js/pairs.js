@@ -0,0 +1,157 @@
+import { FRONTEND_CONFIG } from './config.js';
+
+let api;
+let appState;
+
+const PAGE_SIZE = FRONTEND_CONFIG.PAIRS_PAGE_SIZE;
+const MAX_CACHED_PAGES = FRONTEND_CONFIG.PAIRS_MAX_CACHED_PAGES;
+
+// page number -> array of pair infos, kept in least-recently-used order (Map iteration order).
+const pages = new Map();
+// page number -> pending fetch promise.
+const pendingPages = new Map();
+// Pair infos received from the load stream before the display order is final (display index -> pair).
+const streamedPairs = new Map();
+let cacheGeneration = 0;
+
+/**
+ * Initializes the paged pair-info cache that backs the virtualized thumbnail grid.
+ * Only windows near the viewport are fetched from /api/pairs, so memory stays flat regardless of folder size.
+ * @param {object} apiRef The api module object.
+ * @param {object} appStateRef The frontend application state object.
+ */
+export function initPairs(apiRef, appStateRef) {
+    api = apiRef;
+    appState = appStateRef;
+}
+
+/**
+ * Drops every cached page, e.g. after a new load or when the sort direction changes.
+ */
+export function clearPairs() {
+    pages.clear();
+    pendingPages.clear();
+    streamedPairs.clear();
+    cacheGeneration++;
+}
+
+/**
+ * Records pairs that arrived with the load stream (in scan order) so the first screen renders without a round trip.
+ * @param {Array<object>} pairs The pair infos of the batch.
+ * @param {number} startDisplayIndex The display index of the first pair in the batch.
+ */
+export function addStreamedPairs(pairs, startDisplayIndex) {
+    pairs.forEach((pair, offset) => streamedPairs.set(startDisplayIndex + offset, pair));
+}
+
+/**
+ * Applies edit-status changes to every cached pair info.
+ * @param {Map<number, boolean>} modifiedByIndex Original (stable) index -> new is_modified value.
+ */
+export function updateModifiedStatus(modifiedByIndex) {
+    const apply = pair => {
+        if (pair && modifiedByIndex.has(pair.index)) {
+            pair.is_modified = modifiedByIndex.get(pair.index);
+        }
+    };
+    pages.forEach(page => page.forEach(apply));
+    streamedPairs.forEach(apply);
+}
+
+/**
+ * Returns the cached pair info at a display index, or undefined if its page is not loaded yet.
+ * @param {number} displayIndex
+ * @returns {object|undefined}
+ */
+export function getCachedPair(displayIndex) {
+    const pageNumber = Math.floor(displayIndex / PAGE_SIZE);
+    const page = pages.get(pageNumber);
+    if (page) {
+        // Refresh LRU position.
+        pages.delete(pageNumber);
+        pages.set(pageNumber, page);
+        return page[displayIndex - pageNumber * PAGE_SIZE];
+    }
+    return streamedPairs.get(displayIndex);
+}
+
+/**
+ * Returns the pair info at a display index, fetching its page if needed.
+ * @param {number} displayIndex
+ * @returns {Promise<object|undefined>}
+ */
+export async function getPair(displayIndex) {
+    const cached = getCachedPair(displayIndex);
+    if (cached) {
+        return cached;
+    }
+    await loadPage(Math.floor(displayIndex / PAGE_SIZE));
+    return getCachedPair(displayIndex);
+}
+
+/**
+ * Makes sure every page overlapping [startDisplayIndex, endDisplayIndex) is loaded or being loaded.
+ * @param {number} startDisplayIndex
+ * @param {number} endDisplayIndex Exclusive.
+ * @param {function} onLoaded Called once for every page that is loaded into the cache.
+ */
+export function ensureRange(startDisplayIndex, endDisplayIndex, onLoaded = () => {}) {
+    if (endDisplayIndex <= startDisplayIndex) {
+        return;
+    }
+    const firstPage = Math.floor(startDisplayIndex / PAGE_SIZE);
+    const lastPage = Math.floor((endDisplayIndex - 1) / PAGE_SIZE);
+    for (let pageNumber = firstPage; pageNumber <= lastPage; pageNumber++) {
+        if (!pages.has(pageNumber) && !pendingPages.has(pageNumber)) {
+            loadPage(pageNumber).then(stored => {
+                if (stored) {
+                    onLoaded();
+                }
+            }).catch(error => {
+                console.error(`Pairs: 加载图片列表分页 ${pageNumber} 失败:`, error);
+            });
+        }
+    }
+}
+
+/**
+ * Fetches one page of pair infos from the backend.
+ * Responses belonging to an older load, or arriving after the cache was cleared, are ignored.
+ * @param {number} pageNumber
+ * @returns {Promise<boolean>} Resolves with whether the page was stored in the cache.
+ */
+function loadPage(pageNumber) {
+    if (pendingPages.has(pageNumber)) {
+        return pendingPages.get(pageNumber);
+    }
+
+    const generation = cacheGeneration;
+    const promise = api.getPairs(pageNumber * PAGE_SIZE, PAGE_SIZE, !appState.isSortedAscending)
+        .then(response => {
+            if (generation !== cacheGeneration) {
+                return false;
+            }
+            pendingPages.delete(pageNumber);
+            if (!response || !response.success || response.load_id !== appState.loadId) {
+                return false;
+            }
+            // While a load is still streaming the backend answers in scan order; don't keep those pages.
+            if (!response.is_complete) {
+                return false;
+            }
+            pages.set(pageNumber, response.pairs);
+            while (pages.size > MAX_CACHED_PAGES) {
+                pages.delete(pages.keys().next().value);
+            }
+            return true;
+        })
+        .catch(error => {
+            if (generation === cacheGeneration) {
+                pendingPages.delete(pageNumber);
+            }
+            throw error;
+        });
+
+    pendingPages.set(pageNumber, promise);
+    return promise;
+}
@@ -8,6 +8,14 @@ let panState = {
     imageY: 0,
     currentScale: 1,
 };
+// Deep-zoom tiles of the current image, drawn over the preview once it is zoomed past 1:1 of the loaded rendition.
+let tileSource = null; // { getInfo(): Promise<info>, getTileUrl(level, x, y): string }
+let tileInfo = null;
+let tileInfoPromise = null;
+let tileLayer = null;
+let tileUpdatePending = false;
+// 'level/x/y' -> tile image element in tileLayer.
+const renderedTiles = new Map();
 
 /**
  * Initializes panning and zoom functionality for a given image element within a container.
@@ -31,6 +39,13 @@ export function initPanning(imgElement, contElement) {
     containerElement.addEventListener('wheel', handleZoom);
 
     imageElement.addEventListener('dragstart', (e) => e.preventDefault());
+    // The tile layer sits directly above the image, shares its layout box and transform, and ignores the mouse.
+    tileLayer = document.createElement('div');
+    tileLayer.classList.add('tile-layer');
+    imageElement.after(tileLayer);
+    // A new preview may arrive while already zoomed in.
+    imageElement.addEventListener('load', scheduleTileUpdate);
+    window.addEventListener('resize', scheduleTileUpdate);
 
     resetPanning();
 }
@@ -84,17 +99,164 @@ export function zoomInAt(clickX, clickY) {
 }
 
 
+/**
+ * Sets the deep-zoom tile source of the preview that is about to be shown and removes the previous image's tiles.
+ * @param {{getInfo: function(): Promise<object>, getTileUrl: function(number, number, number): string}|null} source
+ *     getInfo resolves with { width, height, tile_size, max_level }; null disables tiles.
+ */
+export function setTileSource(source) {
+    tileSource = source;
+    tileInfo = null;
+    tileInfoPromise = null;
+    clearTiles();
+}
+
 /**
  * Applies the current scale, translation transform to the image element.
  */
 function applyTransform() {
     if (imageElement) {
         imageElement.style.transform = `translate(calc(-50% + ${panState.imageX}px), calc(-50% + ${panState.imageY}px)) scale(${panState.currentScale})`;
+        if (tileLayer) {
+            tileLayer.style.transform = imageElement.style.transform;
+        }
+        scheduleTileUpdate();
     } else {
         console.warn('Panning: 无法应用形变，imageElement 为 null.');
     }
 }
 
+/**
+ * Updates the visible tiles at most once per animation frame while zooming or panning.
+ */
+function scheduleTileUpdate() {
+    if (tileUpdatePending) {
+        return;
+    }
+    tileUpdatePending = true;
+    requestAnimationFrame(() => {
+        tileUpdatePending = false;
+        updateTiles();
+    });
+}
+
+/**
+ * Shows the tiles of the pyramid level that matches the displayed size, limited to those intersecting the container.
+ * Nothing is requested until the displayed size exceeds the pixels of the loaded preview rendition.
+ */
+function updateTiles() {
+    // Wait until the preview itself has loaded; until then the natural size is the previous image's.
+    if (!tileSource || !tileLayer || !imageElement || !imageElement.complete || !imageElement.naturalWidth) {
+        clearTiles();
+        return;
+    }
+    const displayedWidth = imageElement.offsetWidth * panState.currentScale * (window.devicePixelRatio || 1);
+    if (displayedWidth <= imageElement.naturalWidth) {
+        clearTiles();
+        return;
+    }
+    if (!tileInfo) {
+        loadTileInfo();
+        return;
+    }
+    if (tileInfo.width <= imageElement.naturalWidth) {
+        // The preview is already the original resolution.
+        return;
+    }
+
+    // Lowest level at least as wide as the displayed image (the top level is the original).
+    const levelWidth = level => Math.ceil(tileInfo.width / 2 ** (tileInfo.max_level - level));
+    const levelHeight = level => Math.ceil(tileInfo.height / 2 ** (tileInfo.max_level - level));
+    let level = tileInfo.max_level;
+    while (level > 0 && levelWidth(level - 1) >= displayedWidth) {
+        level--;
+    }
+    const width = levelWidth(level);
+    const height = levelHeight(level);
+    const tileSize = tileInfo.tile_size;
+
+    tileLayer.style.width = `${imageElement.offsetWidth}px`;
+    tileLayer.style.height = `${imageElement.offsetHeight}px`;
+
+    // Visible part of the layer, as fractions of its transformed box.
+    const layerRect = tileLayer.getBoundingClientRect();
+    const containerRect = containerElement.getBoundingClientRect();
+    const left = (Math.max(layerRect.left, containerRect.left) - layerRect.left) / layerRect.width;
+    const right = (Math.min(layerRect.right, containerRect.right) - layerRect.left) / layerRect.width;
+    const top = (Math.max(layerRect.top, containerRect.top) - layerRect.top) / layerRect.height;
+    const bottom = (Math.min(layerRect.bottom, containerRect.bottom) - layerRect.top) / layerRect.height;
+
+    const wanted = new Set();
+    if (right > left && bottom > top) {
+        const lastColumn = Math.ceil(width / tileSize) - 1;
+        const lastRow = Math.ceil(height / tileSize) - 1;
+        const firstX = Math.max(0, Math.floor(left * width / tileSize));
+        const lastX = Math.min(lastColumn, Math.floor(right * width / tileSize));
+        const firstY = Math.max(0, Math.floor(top * height / tileSize));
+        const lastY = Math.min(lastRow, Math.floor(bottom * height / tileSize));
+        for (let y = firstY; y <= lastY; y++) {
+            for (let x = firstX; x <= lastX; x++) {
+                wanted.add(`${level}/${x}/${y}`);
+                addTile(level, x, y, width, height, tileSize);
+            }
+        }
+    }
+    for (const [key, tile] of renderedTiles) {
+        if (!wanted.has(key)) {
+            tile.remove();
+            renderedTiles.delete(key);
+        }
+    }
+}
+
+/**
+ * Adds one tile image, positioned in percent of the layer so it follows the image's layout size.
+ */
+function addTile(level, x, y, levelWidth, levelHeight, tileSize) {
+    const key = `${level}/${x}/${y}`;
+    if (renderedTiles.has(key)) {
+        return;
+    }
+    const tile = document.createElement('img');
+    tile.alt = '';
+    tile.decoding = 'async';
+    tile.style.left = `${x * tileSize / levelWidth * 100}%`;
+    tile.style.top = `${y * tileSize / levelHeight * 100}%`;
+    tile.style.width = `${Math.min(tileSize, levelWidth - x * tileSize) / levelWidth * 100}%`;
+    tile.style.height = `${Math.min(tileSize, levelHeight - y * tileSize) / levelHeight * 100}%`;
+    tile.src = tileSource.getTileUrl(level, x, y);
+    tileLayer.appendChild(tile);
+    renderedTiles.set(key, tile);
+}
+
+/**
+ * Fetches the pyramid description once per image, then updates the tiles if the image has not changed meanwhile.
+ */
+function loadTileInfo() {
+    if (tileInfoPromise) {
+        return;
+    }
+    const source = tileSource;
+    tileInfoPromise = source.getInfo()
+        .then(info => {
+            if (tileSource === source) {
+                tileInfo = info;
+                scheduleTileUpdate();
+            }
+        })
+        .catch(error => {
+            // Keep showing the preview; tileInfoPromise stays set so the request is not retried for this image.
+            console.error('Panning: 获取瓦片信息失败:', error);
+        });
+}
+
+function clearTiles() {
+    for (const tile of renderedTiles.values()) {
+        tile.remove();
+    }
+    renderedTiles.clear();
+}
+
 /**
  * Handles mouse wheel event for zooming.
  * @param {WheelEvent} event
@@ -4,6 +4,8 @@ import { FRONTEND_CONFIG } from './config.js';
 import { api } from './api.js';
 import * as uiModule from './ui.js';
 import * as actionsModule from './actions.js';
+import * as pairsModule from './pairs.js';
+import * as thumbnailsModule from './thumbnails.js';
 import * as eventsModule from './events.js';
 import * as panningModule from './panning.js';
 import * as keyboardModule from './keyboard.js';
@@ -23,6 +25,8 @@ function mainInit() {
             document.body.innerHTML = '<div style="color: red; text-align: center; margin-top: 20%;">应用程序启动失败：缺少关键界面元素。请检查控制台获取详情。</div>';
             return;
         }
+        pairsModule.initPairs(api, appState);
+        thumbnailsModule.initThumbnails(api);
         uiModule.initUI(elements, appState, api);
 
         actionsModule.initActions(api, uiModule, appState, FRONTEND_CONFIG);
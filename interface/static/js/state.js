@@ -1,6 +1,8 @@
 export const appState = {
-    imagePairsInfo: [],
-    currentIndex: -1,
+    currentIndex: -1, // Display index in the current sort direction
+    currentPairIndex: -1, // Stable (scan-order) index of the current pair, as used by the backend
+    currentPairVersion: null, // Content version of the current pair, used for its cacheable preview URL
+    loadId: 0, // Identifies the backend load the paged pair infos belong to
     totalImages: 0,
     jpgFileName: null,
     rawFileName: null,
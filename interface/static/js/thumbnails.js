@@ -0,0 +1,327 @@
+import { FRONTEND_CONFIG } from './config.js';
+
+let api;
+
+const BATCH_SIZE = FRONTEND_CONFIG.THUMBNAIL_BATCH_SIZE;
+const BATCH_DELAY_MS = FRONTEND_CONFIG.THUMBNAIL_BATCH_DELAY_MS;
+const MAX_CACHED_URLS = FRONTEND_CONFIG.THUMBNAIL_MAX_CACHED_URLS;
+const MAX_PERSISTENT_ENTRIES = FRONTEND_CONFIG.THUMBNAIL_MAX_PERSISTENT_ENTRIES;
+// Cache Storage bucket for thumbnails keyed by their content-addressed URL, so repeat visits skip the server.
+// Buckets with the same prefix but another name are left over from earlier versions and deleted on open.
+const PERSISTENT_CACHE_PREFIX = 'thumbnails-';
+const PERSISTENT_CACHE_NAME = `${PERSISTENT_CACHE_PREFIX}v1`;
+// Delay before trimming the persistent cache after writes, so a scroll through the grid trims once.
+const PERSISTENT_TRIM_DELAY_MS = 2000;
+
+// stable index -> object URL of the thumbnail, kept in least-recently-used order (Map iteration order).
+const objectUrls = new Map();
+// stable index -> callback of the rendered item waiting for it.
+const waiting = new Map();
+// Stable indices waiting for the next batch, in request order.
+const queued = new Set();
+// Stable indices whose batch is being fetched, or that are being looked up in the persistent cache.
+const inFlight = new Set();
+// stable index -> content version, for the persistent cache key.
+const versions = new Map();
+let flushTimer = null;
+let cacheGeneration = 0;
+let persistentCachePromise = null;
+let persistentTrimTimer = null;
+// Rendition size (a THUMBNAIL_SIZES entry) currently loaded, and the CSS size of the grid slots it was picked for.
+let thumbnailSize = FRONTEND_CONFIG.THUMBNAIL_WIDTH_PIXELS;
+let displaySize = FRONTEND_CONFIG.THUMBNAIL_WIDTH_PIXELS;
+
+/**
+ * Initializes the batched thumbnail loader.
+ * Thumbnails requested within one frame or so are fetched together from /api/image/thumbnails,
+ * so scrolling through thousands of images costs a few dozen requests instead of one per image.
+ * @param {object} apiRef The api module object.
+ */
+export function initThumbnails(apiRef) {
+    api = apiRef;
+}
+
+/**
+ * Drops every cached thumbnail, e.g. before a new folder is loaded (stable indices are only valid per load).
+ * The sort order does not matter here: thumbnails are cached by stable index and survive re-sorting.
+ */
+export function clearThumbnails() {
+    objectUrls.forEach(url => URL.revokeObjectURL(url));
+    objectUrls.clear();
+    waiting.clear();
+    queued.clear();
+    inFlight.clear();
+    versions.clear();
+    clearTimeout(flushTimer);
+    flushTimer = null;
+    cacheGeneration++;
+}
+
+/**
+ * Picks the rendition size for grid slots of the given CSS size, the same way the browser resolves a srcset with
+ * width descriptors: the smallest size covering the slot at the current device pixel ratio, or the largest one.
+ * Switching to another rendition drops the loaded thumbnails, so callers should recreate their items.
+ * @param {number} cssPixels The longer side of a thumbnail slot in CSS pixels.
+ * @returns {boolean} Whether the rendition size changed.
+ */
+export function setDisplaySize(cssPixels) {
+    displaySize = cssPixels;
+    const sizes = FRONTEND_CONFIG.THUMBNAIL_SIZES;
+    const needed = cssPixels * (window.devicePixelRatio || 1);
+    const size = sizes.find(candidate => candidate >= needed) ?? sizes[sizes.length - 1];
+    if (size === thumbnailSize) {
+        return false;
+    }
+    clearThumbnails();
+    thumbnailSize = size;
+    return true;
+}
+
+/**
+ * Returns the CSS size last passed to setDisplaySize, for the sizes attribute of images that use a srcset.
+ * @returns {number}
+ */
+export function getDisplaySize() {
+    return displaySize;
+}
+
+/**
+ * Requests the thumbnail of a pair. The callback receives an image URL, or null if the thumbnail could not be generated;
+ * it is called synchronously when the thumbnail is already cached in memory.
+ * Thumbnails with a content version are looked up in the persistent cache before they are queued for a batch.
+ * @param {number} index Stable pair index.
+ * @param {?string} version The pair's content version (see /api/pairs), or null if unknown.
+ * @param {function(?string): void} onReady
+ */
+export function requestThumbnail(index, version, onReady) {
+    const url = objectUrls.get(index);
+    if (url) {
+        // Refresh LRU position.
+        objectUrls.delete(index);
+        objectUrls.set(index, url);
+        onReady(url);
+        return;
+    }
+
+    waiting.set(index, onReady);
+    if (queued.has(index) || inFlight.has(index)) {
+        return;
+    }
+    if (version) {
+        versions.set(index, version);
+        inFlight.add(index);
+        lookUpPersistent(index, version);
+        return;
+    }
+    enqueue(index);
+}
+
+/**
+ * Queues a thumbnail for the next batch request.
+ * @param {number} index Stable pair index.
+ */
+function enqueue(index) {
+    queued.add(index);
+    if (queued.size >= BATCH_SIZE) {
+        flushQueue();
+    } else if (flushTimer === null) {
+        flushTimer = setTimeout(flushQueue, BATCH_DELAY_MS);
+    }
+}
+
+/**
+ * Opens the persistent thumbnail cache; resolves with null where Cache Storage is unavailable (e.g. plain http on a LAN address).
+ * @returns {Promise<?Cache>}
+ */
+function openPersistentCache() {
+    if (!persistentCachePromise) {
+        persistentCachePromise = typeof caches === 'undefined'
+            ? Promise.resolve(null)
+            : caches.open(PERSISTENT_CACHE_NAME).then(cache => {
+                deleteStalePersistentCaches();
+                return cache;
+            }).catch(error => {
+                console.warn('Thumbnails: 无法打开缩略图持久缓存:', error);
+                return null;
+            });
+    }
+    return persistentCachePromise;
+}
+
+/**
+ * Deletes thumbnail buckets of earlier versions, which would otherwise keep their entries forever.
+ */
+async function deleteStalePersistentCaches() {
+    try {
+        const names = await caches.keys();
+        await Promise.all(names
+            .filter(name => name.startsWith(PERSISTENT_CACHE_PREFIX) && name !== PERSISTENT_CACHE_NAME)
+            .map(name => caches.delete(name)));
+    } catch (error) {
+        console.warn('Thumbnails: 删除旧的缩略图持久缓存失败:', error);
+    }
+}
+
+/**
+ * Trims the persistent cache to MAX_PERSISTENT_ENTRIES shortly after the last write.
+ * Cache Storage lists entries in insertion order, so the oldest written are dropped first; this also ages out
+ * entries of thumbnails whose content version changed (their URLs are never requested again).
+ */
+function schedulePersistentTrim() {
+    clearTimeout(persistentTrimTimer);
+    persistentTrimTimer = setTimeout(async () => {
+        persistentTrimTimer = null;
+        try {
+            const cache = await openPersistentCache();
+            const requests = cache ? await cache.keys() : [];
+            const excess = requests.length - MAX_PERSISTENT_ENTRIES;
+            if (excess > 0) {
+                await Promise.all(requests.slice(0, excess).map(request => cache.delete(request)));
+            }
+        } catch (error) {
+            console.warn('Thumbnails: 清理缩略图持久缓存失败:', error);
+        }
+    }, PERSISTENT_TRIM_DELAY_MS);
+}
+
+/**
+ * Serves a thumbnail from the persistent cache, or queues it for a batch request on a miss.
+ * @param {number} index Stable pair index.
+ * @param {string} version
+ */
+async function lookUpPersistent(index, version) {
+    const generation = cacheGeneration;
+    let blob = null;
+    try {
+        const cache = await openPersistentCache();
+        const response = cache ? await cache.match(api.getThumbnailUrl(index, version, thumbnailSize)) : undefined;
+        blob = response ? await response.blob() : null;
+    } catch (error) {
+        console.warn(`Thumbnails: 读取缩略图持久缓存失败 (索引 ${index}):`, error);
+    }
+    if (generation !== cacheGeneration) {
+        return;
+    }
+    inFlight.delete(index);
+    if (blob) {
+        deliver(index, storeObjectUrl(index, blob));
+    } else if (waiting.has(index)) {
+        enqueue(index);
+    }
+}
+
+/**
+ * Keeps a thumbnail blob as an object URL in the in-memory LRU and returns the URL.
+ * @param {number} index Stable pair index.
+ * @param {Blob} blob
+ * @returns {string}
+ */
+function storeObjectUrl(index, blob) {
+    const url = URL.createObjectURL(blob);
+    objectUrls.set(index, url);
+    while (objectUrls.size > MAX_CACHED_URLS) {
+        const [oldestIndex, oldestUrl] = objectUrls.entries().next().value;
+        URL.revokeObjectURL(oldestUrl);
+        objectUrls.delete(oldestIndex);
+    }
+    return url;
+}
+
+/**
+ * Hands a thumbnail URL to the item waiting for it, if any.
+ * @param {number} index Stable pair index.
+ * @param {?string} url
+ */
+function deliver(index, url) {
+    const onReady = waiting.get(index);
+    waiting.delete(index);
+    if (onReady) {
+        onReady(url);
+    }
+}
+
+/**
+ * Forgets the callback of an item that left the viewport; a thumbnail that was not requested yet is dropped from the queue.
+ * Does nothing if another item has requested the same thumbnail since.
+ * @param {number} index Stable pair index.
+ * @param {function(?string): void} onReady The callback passed to requestThumbnail.
+ */
+export function releaseThumbnail(index, onReady) {
+    if (waiting.get(index) !== onReady) {
+        return;
+    }
+    waiting.delete(index);
+    queued.delete(index);
+}
+
+/**
+ * Sends the queued indices to the backend in batches of at most BATCH_SIZE.
+ */
+function flushQueue() {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+    while (queued.size > 0) {
+        const batch = [];
+        for (const index of queued) {
+            batch.push(index);
+            if (batch.length >= BATCH_SIZE) {
+                break;
+            }
+        }
+        batch.forEach(index => {
+            queued.delete(index);
+            inFlight.add(index);
+        });
+        loadBatch(batch);
+    }
+}
+
+/**
+ * Fetches one batch and hands every thumbnail to its waiting item as soon as it arrives.
+ * If the batch request fails, the remaining items fall back to the single-thumbnail URL.
+ * @param {Array<number>} batch Stable pair indices.
+ */
+async function loadBatch(batch) {
+    const generation = cacheGeneration;
+    const size = thumbnailSize;
+    const received = new Set();
+    const persistentCache = await openPersistentCache();
+    const writes = [];
+
+    try {
+        await api.getThumbnailBatch(batch, size, (index, bytes, type) => {
+            if (generation !== cacheGeneration) {
+                return;
+            }
+            received.add(index);
+            inFlight.delete(index);
+            if (!bytes) {
+                deliver(index, null);
+                return;
+            }
+            const blob = new Blob([bytes], { type });
+            const version = versions.get(index);
+            if (persistentCache && version) {
+                writes.push(persistentCache.put(api.getThumbnailUrl(index, version, size), new Response(blob, {
+                    headers: { 'Content-Type': type },
+                })).catch(error => console.warn('Thumbnails: 写入缩略图持久缓存失败:', error)));
+            }
+            deliver(index, storeObjectUrl(index, blob));
+        });
+    } catch (error) {
+        console.error('Thumbnails: 批量加载缩略图失败，改为逐张加载:', error);
+    }
+    if (writes.length > 0) {
+        Promise.all(writes).then(schedulePersistentTrim);
+    }
+
+    if (generation !== cacheGeneration) {
+        return;
+    }
+    batch.forEach(index => {
+        if (!received.has(index)) {
+            inFlight.delete(index);
+            deliver(index, api.getThumbnailUrl(index, versions.get(index), size));
+        }
+    });
+}
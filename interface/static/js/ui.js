@@ -1,9 +1,23 @@
 import { FRONTEND_CONFIG } from './config.js';
+import * as pairs from './pairs.js';
+import * as thumbnails from './thumbnails.js';
+import * as panning from './panning.js';
 
 let elements;
 let appState;
 let api;
 
+// display index -> rendered thumbnail item (only the rows around the viewport).
+const renderedItems = new Map();
+// rendered thumbnail item -> its pending thumbnails.requestThumbnail callback.
+const thumbnailCallbacks = new WeakMap();
+let gridSpacer = null;
+let gridRenderPending = false;
+// The latest preview request: its URL, the controller that aborts its fetch and, once fetched, its object URL.
+let previewRequest = null;
+// Object URL currently assigned to the preview image, revoked once another image replaces it.
+let shownPreviewObjectUrl = null;
+
 /**
  * Initializes the UI module with necessary dependencies.
  * @param {object} elementsRef The object holding DOM element references.
@@ -21,6 +35,12 @@ export function initUI(elementsRef, appStateRef, apiRef) {
 
     // Removed elements.toggleSortButton reference acquisition from here, it's handled in elements.js.
 
+    if (elements.thumbnailList) {
+        elements.thumbnailList.style.setProperty('--thumbnail-size', `${FRONTEND_CONFIG.THUMBNAIL_WIDTH_PIXELS}px`);
+        elements.thumbnailList.addEventListener('scroll', scheduleGridRender, { passive: true });
+    }
+    window.addEventListener('resize', scheduleGridRender);
+
     updateUI();
 }
 
@@ -81,8 +101,10 @@ export function updateInfoLabel() {
 }
 
 /**
- * Renders the thumbnail list based on the loaded image pairs info.
- * This should ideally be called once after a successful load, or after sorting.
+ * Renders the thumbnail grid from scratch.
+ * The grid is virtualized: only the rows around the viewport exist in the DOM, positioned absolutely
+ * inside a spacer sized for the whole list; pair infos are paged in through pairs.js as rows come into view.
+ * Call after a load finishes or the sort direction changes.
  */
 export function renderThumbnails() {
     if (!elements.thumbnailList) {
@@ -90,69 +112,246 @@ export function renderThumbnails() {
         return;
     }
 
-    // Save current scroll position
-    const scrollTop = elements.thumbnailList.scrollTop;
+    renderedItems.forEach(removeThumbnailItem);
+    renderedItems.clear();
+    renderVisibleThumbnails();
+}
 
-    elements.thumbnailList.innerHTML = '';
+/**
+ * Records a streamed batch of pairs and renders whichever of them fall inside the viewport.
+ * Used while a folder load is still streaming in; appState.totalImages must already include the batch.
+ * @param {Array<object>} batch The pair infos of the batch, in arrival order.
+ * @param {number} startDisplayIndex The display index of the first pair in the batch.
+ */
+export function appendThumbnails(batch, startDisplayIndex) {
+    pairs.addStreamedPairs(batch, startDisplayIndex);
+    scheduleGridRender();
+}
 
-    // Use the sorted image pairs info from appState directly
-    const imagePairsInfo = appState.imagePairsInfo;
+/**
+ * Updates the RAW edit marker of the rendered thumbnails.
+ * @param {Map<number, boolean>} modifiedByIndex Original (stable) index -> new is_modified value.
+ */
+export function updateThumbnailModifiedStatus(modifiedByIndex) {
+    renderedItems.forEach(item => {
+        const index = parseInt(item.dataset.index, 10);
+        if (!modifiedByIndex.has(index)) {
+            return;
+        }
+        const filenameLabel = item.querySelector('.thumbnail-filename');
+        if (filenameLabel) {
+            filenameLabel.classList.toggle('modified-raw', modifiedByIndex.get(index));
+        }
+    });
+}
 
-    if (!imagePairsInfo || imagePairsInfo.length === 0) {
+/**
+ * Schedules a grid render on the next animation frame; repeated calls within a frame are coalesced.
+ */
+function scheduleGridRender() {
+    if (gridRenderPending) {
         return;
     }
+    gridRenderPending = true;
+    requestAnimationFrame(() => {
+        gridRenderPending = false;
+        renderVisibleThumbnails();
+    });
+}
 
-    console.log('renderThumbnails: isSortedAscending', appState.isSortedAscending); // Log sort state
-    console.log('renderThumbnails: imagePairsInfo', imagePairsInfo); // Log sorted array
+/**
+ * Computes the grid geometry for the current size of the thumbnail list.
+ * @returns {{columns: number, itemWidth: number, rowHeight: number, padding: number}}
+ */
+function getGridLayout() {
+    const list = elements.thumbnailList;
+    const style = getComputedStyle(list);
+    const padding = parseFloat(style.paddingLeft) || 0;
+    const gap = FRONTEND_CONFIG.THUMBNAIL_GRID_GAP;
+    const innerWidth = Math.max(0, list.clientWidth - padding * 2);
+    const columns = Math.max(1, Math.floor((innerWidth + gap) / (FRONTEND_CONFIG.THUMBNAIL_WIDTH_PIXELS + gap)));
+    const itemWidth = Math.max(FRONTEND_CONFIG.THUMBNAIL_WIDTH_PIXELS, (innerWidth - gap * (columns - 1)) / columns);
+    return { columns, itemWidth, rowHeight: FRONTEND_CONFIG.THUMBNAIL_ITEM_HEIGHT + gap, padding };
+}
+
+/**
+ * Creates, positions and removes thumbnail items so that exactly the rows around the viewport are rendered.
+ */
+function renderVisibleThumbnails() {
+    const list = elements.thumbnailList;
+    if (!list) {
+        return;
+    }
+
+    const total = appState.totalImages;
+    const { columns, itemWidth, rowHeight, padding } = getGridLayout();
+    const rows = Math.ceil(total / columns);
+
+    // Wider columns or a denser screen may need a larger thumbnail rendition; items are then recreated with it.
+    if (thumbnails.setDisplaySize(Math.max(itemWidth, FRONTEND_CONFIG.THUMBNAIL_WIDTH_PIXELS))) {
+        renderedItems.forEach(removeThumbnailItem);
+        renderedItems.clear();
+    }
+
+    if (!gridSpacer || gridSpacer.parentNode !== list) {
+        gridSpacer = document.createElement('div');
+        gridSpacer.classList.add('thumbnail-grid-spacer');
+        list.appendChild(gridSpacer);
+    }
+    gridSpacer.style.height = rows > 0 ? `${rows * rowHeight - FRONTEND_CONFIG.THUMBNAIL_GRID_GAP}px` : '0px';
+
+    const overscan = FRONTEND_CONFIG.THUMBNAIL_OVERSCAN_ROWS;
+    const firstRow = Math.max(0, Math.floor((list.scrollTop - padding) / rowHeight) - overscan);
+    const lastRow = Math.min(rows, Math.ceil((list.scrollTop + list.clientHeight) / rowHeight) + overscan);
+    const start = firstRow * columns;
+    const end = Math.min(total, lastRow * columns);
+
+    // While a load is streaming only the streamed pairs are shown; the final order is paged in once it is done.
+    if (appState.isLoaded) {
+        pairs.ensureRange(start, end, scheduleGridRender);
+    }
+
+    // Drop items that scrolled out of range
+    renderedItems.forEach((item, displayIndex) => {
+        if (displayIndex < start || displayIndex >= end) {
+            removeThumbnailItem(item);
+            renderedItems.delete(displayIndex);
+        }
+    });
 
     const fragment = document.createDocumentFragment();
-    imagePairsInfo.forEach((pair, i) => { // Add 'i' as the index parameter
-        const index = pair.index; // Use the original index for data-index and URL
-        const thumbnailItem = document.createElement('div');
-        thumbnailItem.classList.add('thumbnail-item');
-        thumbnailItem.dataset.index = index; // Store original index
-        thumbnailItem.dataset.displayIndex = i; // Store its index in the currently displayed (sorted) list
-
-        const img = new Image();
-        img.classList.add('thumbnail-image');
-        img.alt = `Thumbnail ${index + 1}`;
-        img.loading = 'lazy';
-
-        const filenameLabel = document.createElement('span');
-        filenameLabel.classList.add('thumbnail-filename');
-        // Extract filename without extension
-        const baseName = pair.base_name; // Assuming pair.base_name already exists and is the filename without extension
-        filenameLabel.textContent = baseName;
-
-        // Add 'modified-raw' class if the raw file has been modified
-        if (pair.is_modified) {
-            filenameLabel.classList.add('modified-raw');
+    for (let displayIndex = start; displayIndex < end; displayIndex++) {
+        const pair = pairs.getCachedPair(displayIndex);
+        let item = renderedItems.get(displayIndex);
+        const expectedIndex = pair ? String(pair.index) : undefined;
+        if (item && item.dataset.index !== expectedIndex) {
+            // The slot now holds a different pair (or its placeholder can be filled in)
+            removeThumbnailItem(item);
+            item = undefined;
+        }
+        if (!item) {
+            item = pair ? createThumbnailItem(pair, displayIndex) : createThumbnailPlaceholder(displayIndex);
+            renderedItems.set(displayIndex, item);
+            fragment.appendChild(item);
         }
+        const row = Math.floor(displayIndex / columns);
+        const column = displayIndex % columns;
+        item.style.top = `${padding + row * rowHeight}px`;
+        item.style.left = `${padding + column * (itemWidth + FRONTEND_CONFIG.THUMBNAIL_GRID_GAP)}px`;
+        item.style.width = `${itemWidth}px`;
+        item.classList.toggle('selected', displayIndex === appState.currentIndex);
+    }
+    list.appendChild(fragment);
+}
 
-        thumbnailItem.appendChild(img);
-        thumbnailItem.appendChild(filenameLabel);
+/**
+ * Creates an empty thumbnail slot for a pair whose info has not been paged in yet.
+ * @param {number} displayIndex
+ * @returns {HTMLElement}
+ */
+function createThumbnailPlaceholder(displayIndex) {
+    const thumbnailItem = document.createElement('div');
+    thumbnailItem.classList.add('thumbnail-item', 'placeholder');
+    thumbnailItem.dataset.displayIndex = displayIndex;
+    return thumbnailItem;
+}
 
-        img.src = api.getThumbnailUrl(index); // Use original index for URL
+/**
+ * Creates the DOM element for a single thumbnail.
+ * @param {object} pair The pair info ({ base_name, index, is_modified, version }).
+ * @param {number} displayIndex Its index in the currently displayed (sorted) list.
+ * @returns {HTMLElement}
+ */
+function createThumbnailItem(pair, displayIndex) {
+    const index = pair.index; // Use the original index for data-index and URL
+    const thumbnailItem = document.createElement('div');
+    thumbnailItem.classList.add('thumbnail-item');
+    thumbnailItem.dataset.index = index; // Store original index
+    thumbnailItem.dataset.displayIndex = displayIndex; // Store its index in the currently displayed (sorted) list
+
+    const img = new Image();
+    img.classList.add('thumbnail-image');
+    img.alt = `Thumbnail ${index + 1}`;
+    img.loading = 'lazy';
+
+    const filenameLabel = document.createElement('span');
+    filenameLabel.classList.add('thumbnail-filename');
+    // Extract filename without extension
+    const baseName = pair.base_name; // Assuming pair.base_name already exists and is the filename without extension
+    filenameLabel.textContent = baseName;
+
+    // Add 'modified-raw' class if the raw file has been modified
+    if (pair.is_modified) {
+        filenameLabel.classList.add('modified-raw');
+    }
 
-        img.onerror = () => {
-            console.error(`UI: 加载缩略图失败 for index ${index}. URL: ${img.src}`);
-            thumbnailItem.classList.add('error');
-            img.alt = '加载失败';
-            filenameLabel.textContent = '!Err!'; // Update error text for filename label
-            img.src = '';
-        };
-        img.onload = () => {
-        };
+    thumbnailItem.appendChild(img);
+    thumbnailItem.appendChild(filenameLabel);
+
+    const showError = () => {
+        console.error(`UI: 加载缩略图失败 for index ${index}. URL: ${img.src}`);
+        thumbnailItem.classList.add('error');
+        img.alt = '加载失败';
+        filenameLabel.textContent = '!Err!'; // Update error text for filename label
+        img.removeAttribute('src');
+    };
+    img.onerror = showError;
+    img.onload = () => {
+    };
+
+    // Thumbnails are fetched in batches by original index (see thumbnails.js)
+    const onThumbnail = url => {
+        thumbnailCallbacks.delete(thumbnailItem);
+        if (url && !url.startsWith('blob:')) {
+            // Fallback to per-image requests: let the browser pick the rendition itself.
+            img.sizes = `${thumbnails.getDisplaySize()}px`;
+            img.srcset = api.getThumbnailSrcset(index, pair.version);
+        }
+        if (url) {
+            img.src = url;
+        } else {
+            showError();
+        }
+    };
+    thumbnailCallbacks.set(thumbnailItem, onThumbnail);
+    thumbnails.requestThumbnail(index, pair.version, onThumbnail);
 
-        fragment.appendChild(thumbnailItem);
-    });
+    return thumbnailItem;
+}
 
-    elements.thumbnailList.appendChild(fragment);
+/**
+ * Removes a thumbnail item from the grid and cancels its thumbnail request if it has not been answered yet.
+ * @param {HTMLElement} item
+ */
+function removeThumbnailItem(item) {
+    const onThumbnail = thumbnailCallbacks.get(item);
+    if (onThumbnail) {
+        thumbnails.releaseThumbnail(parseInt(item.dataset.index, 10), onThumbnail);
+        thumbnailCallbacks.delete(item);
+    }
+    item.remove();
+}
 
-    // Restore scroll position
-    elements.thumbnailList.scrollTop = scrollTop;
+/**
+ * Aborts the preview fetch in flight, if any. The image on screen stays until showPreviewObjectUrl replaces it.
+ */
+function clearPreviewRequest() {
+    if (previewRequest) {
+        previewRequest.controller.abort();
+        previewRequest = null;
+    }
+}
 
-    highlightSelectedThumbnail(); // Highlight the currently selected image based on its original index
+/**
+ * Points the preview image at an object URL (or clears it) and releases the object URL it showed before.
+ * @param {?string} objectUrl
+ */
+function showPreviewObjectUrl(objectUrl) {
+    elements.previewImage.src = objectUrl || '';
+    if (shownPreviewObjectUrl && shownPreviewObjectUrl !== objectUrl) {
+        URL.revokeObjectURL(shownPreviewObjectUrl);
+    }
+    shownPreviewObjectUrl = objectUrl;
 }
 
 /**
@@ -164,17 +363,30 @@ export function updatePreviewImage() {
         return;
     }
 
-    const { currentIndex, imagePairsInfo } = appState;
+    const { currentIndex, currentPairIndex, currentPairVersion } = appState;
 
-    if (currentIndex !== -1 && imagePairsInfo.length > 0) {
-        // Get the original index of the currently selected image from the sorted array
-        const originalIndexForPreview = imagePairsInfo[currentIndex].index;
-        const previewUrl = api.getPreviewUrl(originalIndexForPreview);
+    if (currentIndex !== -1 && currentPairIndex !== -1) {
+        // The backend addresses pairs by their original (stable) index
+        const originalIndexForPreview = currentPairIndex;
+        // Request only the resolution the viewer can show.
+        const viewport = {
+            width: elements.imageContainer.clientWidth,
+            height: elements.imageContainer.clientHeight,
+            dpr: window.devicePixelRatio || 1,
+        };
+        const hasViewport = viewport.width > 0 && viewport.height > 0;
+        const previewUrl = api.getPreviewUrl(originalIndexForPreview, currentPairVersion, hasViewport ? viewport : null);
+        // Zooming past 1:1 of the preview loads only the visible deep-zoom tiles of the original.
+        panning.setTileSource({
+            getInfo: () => api.getTileInfo(originalIndexForPreview, currentPairVersion),
+            getTileUrl: (level, x, y) => api.getTileUrl(originalIndexForPreview, currentPairVersion, level, x, y),
+        });
 
         showLoading();
 
         elements.previewImage.style.display = 'block';
-        elements.previewImage.style.transform = 'translate(-50%, -50%) scale(1)';
+        // Each new preview starts at the fitted view; this also keeps the tile layer in step with the image.
+        panning.resetPanning();
         elements.previewImage.style.left = '50%';
         elements.previewImage.style.top = '50%';
         elements.previewImage.style.maxWidth = '100%';
@@ -214,12 +426,38 @@ export function updatePreviewImage() {
             elements.imageContainer.removeChild(existingErrorPlaceholder);
         }
 
-        elements.previewImage.src = previewUrl;
+        if (previewRequest && previewRequest.url === previewUrl) {
+            // Same preview as before (e.g. a metadata update): reuse the fetched image or wait for the pending fetch.
+            if (previewRequest.objectUrl) {
+                showPreviewObjectUrl(previewRequest.objectUrl);
+            }
+            return;
+        }
+        clearPreviewRequest();
+        const request = previewRequest = { url: previewUrl, objectUrl: null, controller: new AbortController() };
+        api.fetchPreview(previewUrl, request.controller.signal)
+            .then(blob => {
+                if (request !== previewRequest) {
+                    return;
+                }
+                request.objectUrl = URL.createObjectURL(blob);
+                showPreviewObjectUrl(request.objectUrl);
+            })
+            .catch(error => {
+                // Aborted or superseded (409) requests belong to a preview this tab no longer shows.
+                if (request !== previewRequest || error.name === 'AbortError') {
+                    return;
+                }
+                previewRequest = null;
+                handlePreviewError();
+            });
 
     } else {
+        clearPreviewRequest();
         if (elements.previewImage) {
+            panning.setTileSource(null);
             elements.previewImage.style.display = 'none';
-            elements.previewImage.src = '';
+            showPreviewObjectUrl(null);
 
             const existingErrorPlaceholder = elements.imageContainer.querySelector('.image-error-placeholder');
             if (existingErrorPlaceholder) {
@@ -265,24 +503,40 @@ export function highlightSelectedThumbnail() {
         return;
     }
 
-    elements.thumbnailList.querySelectorAll('.thumbnail-item.selected').forEach(item => {
-        item.classList.remove('selected');
-    });
+    renderedItems.forEach(item => item.classList.remove('selected'));
 
-    const { currentIndex, imagePairsInfo } = appState;
+    const { currentIndex, totalImages } = appState;
 
-    if (currentIndex !== -1 && 0 <= currentIndex && currentIndex < imagePairsInfo.length) {
-        // Get the original index of the currently selected image from the sorted array
-        const originalIndexToHighlight = imagePairsInfo[currentIndex].index;
+    if (currentIndex !== -1 && 0 <= currentIndex && currentIndex < totalImages) {
+        scrollThumbnailIntoView(currentIndex);
+        renderVisibleThumbnails();
+    }
+}
 
-        // Find the thumbnail item using its data-index (which stores the original index)
-        const selectedItem = elements.thumbnailList.querySelector(`.thumbnail-item[data-index="${originalIndexToHighlight}"]`);
-        if (selectedItem) {
-            selectedItem.classList.add('selected');
-            selectedItem.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
-        } else {
-            console.warn(`UI: 无法找到原始索引为 ${originalIndexToHighlight} 的缩略图进行高亮。`);
-        }
+/**
+ * Scrolls the thumbnail list the least amount needed to show the row of a display index.
+ * The item itself may not be rendered yet, so the position is computed from the grid layout.
+ * @param {number} displayIndex
+ */
+function scrollThumbnailIntoView(displayIndex) {
+    const list = elements.thumbnailList;
+    const { columns, rowHeight, padding } = getGridLayout();
+    const itemTop = padding + Math.floor(displayIndex / columns) * rowHeight;
+    const itemBottom = itemTop + FRONTEND_CONFIG.THUMBNAIL_ITEM_HEIGHT;
+
+    if (itemTop < list.scrollTop) {
+        list.scrollTop = itemTop - padding;
+    } else if (itemBottom > list.scrollTop + list.clientHeight) {
+        list.scrollTop = itemBottom + padding - list.clientHeight;
+    }
+}
+
+/**
+ * Shows the current backend sort mode in the sort mode selector.
+ */
+export function updateSortModeSelect() {
+    if (elements.sortModeSelect && appState.sortOrder) {
+        elements.sortModeSelect.value = appState.sortOrder;
     }
 }
 
@@ -1,12 +1,15 @@
 import logging
 import os
 
-from interface.api import app
 from utils.config_loader import app_config
 
 logger = logging.getLogger(__name__)
 
 def run_app():
+    # 在这里而不是模块顶部导入 Flask 应用：缩略图预生成进程以 spawn 方式启动时会重新导入本模块，
+    # 这样子进程不会各自创建一份 Flask 应用和文件夹索引连接。
+    from interface.api import app
+
     try:
         host = app_config.get("FLASK_RUN_HOST")
         port = app_config.get("FLASK_RUN_PORT")
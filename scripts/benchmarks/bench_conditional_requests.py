@@ -0,0 +1,84 @@
+"""
+对比浏览器重复访问同一批预览图时的开销：无条件请求（每次返回完整图片）与带 If-None-Match 的条件请求（ETag 匹配时返回 304）。
+在本机启动 werkzeug 开发服务器，缩略图缓存已预热。
+
+用法: python scripts/benchmarks/bench_conditional_requests.py [图片数量]
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from bench_utils import make_session, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_conditional_requests_")
+# 在导入应用之前设置：缓存与索引写入临时目录，不启动后台预生成进程
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+
+import logging
+
+from PIL import Image
+from werkzeug.serving import make_server
+
+from interface.api import app, app_state
+
+
+def fetch(url, etag=None):
+    """返回 (状态码, 响应体字节数, ETag)。"""
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, len(response.read()), response.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            raise
+        return 304, 0, e.headers.get("ETag")
+
+
+def load_all(urls, etags=None):
+    statuses = {}
+    total_bytes = 0
+    for url in urls:
+        status, size, _ = fetch(url, etags.get(url) if etags else None)
+        statuses[status] = statuses.get(status, 0) + 1
+        total_bytes += size
+    return statuses, total_bytes
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    jpg_buffer = io.BytesIO()
+    Image.effect_noise((3000, 2000), 64).convert("RGB").save(jpg_buffer, "JPEG", quality=90)
+    jpg_folder, _ = make_session(os.path.join(_TEMP_ROOT, "shoot"), count, with_raw=False, jpg_bytes=jpg_buffer.getvalue())
+    app_state.load_folders(jpg_folder, "")
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        urls = [f"{base_url}/api/image/preview/{index}?v={app_state.get_image_version(index)}&max_size=1600"
+                for index in range(count)]
+        etags = {url: fetch(url)[2] for url in urls}
+
+        for label, etag_map in (("无条件请求", None), ("条件请求（If-None-Match）", etags)):
+            start = time.perf_counter()
+            statuses, total_bytes = load_all(urls, etag_map)
+            print_row(f"{label}（{count} 张预览）", time.perf_counter() - start,
+                      f"状态码 {statuses}, {total_bytes / 1e6:.1f} MB")
+    finally:
+        server.shutdown()
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+同时请求多张超大图片的原始分辨率预览时，对比不限制解码内存（旧行为）与按预算放行解码时的总耗时、
+进程峰值 RSS 和解码中的估算内存峰值。每种情况在单独的子进程中运行，峰值 RSS 互不影响。
+
+用法: python scripts/benchmarks/bench_decode_memory.py [并发请求数] [每张图片的百万像素] [解码内存预算 MB]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_utils import print_row, peak_rss_mb
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_decode_memory_")
+# 在子进程导入 file_manager 之前设置：缓存与索引写入临时目录，不启动后台预生成进程；关闭预览图缓存，每次都需要解码
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+os.environ["PREVIEW_MEMORY_CACHE_MB"] = "0"
+os.environ["PREVIEW_CACHE_MAX_MB"] = "0"
+
+# 子进程最后一行输出的前缀，后面是 总秒数 峰值RSS(MB) 估算峰值(MB) 等待次数
+_RESULT_PREFIX = "RESULT"
+
+
+def run_child(paths):
+    """在子进程中并发请求 paths 的原始分辨率预览。"""
+    import logging
+
+    from domain.file_manager import file_manager
+
+    logging.getLogger().setLevel(logging.WARNING)
+    threads = [threading.Thread(target=file_manager.get_preview_image, args=(path, None, 'jpeg')) for path in paths]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = file_manager.get_decode_memory_stats()
+    print(f"{_RESULT_PREFIX} {elapsed} {peak_rss_mb() or 0} {stats['peak_in_flight_bytes'] / 1e6} {stats['waited']}",
+          flush=True)
+
+
+def run_scenario(paths, budget_mb):
+    # 调度器不限制交互请求的并发（相当于核心数足够多的机器），只比较内存预算的作用
+    env = dict(os.environ, DECODE_MEMORY_BUDGET_MB=str(budget_mb), PREVIEW_RENDER_CONCURRENCY=str(len(paths)),
+               STORAGE_DEVICE_CONCURRENCY=str(len(paths)))
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", *paths], env=env,
+                            capture_output=True, text=True, check=True).stdout
+    line = next(line for line in output.splitlines() if line.startswith(_RESULT_PREFIX))
+    elapsed, peak_rss, peak_in_flight, waited = line.split()[1:]
+    return float(elapsed), float(peak_rss), float(peak_in_flight), int(waited)
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    megapixels = float(sys.argv[2]) if len(sys.argv) > 2 else 48
+    budget_mb = int(sys.argv[3]) if len(sys.argv) > 3 else 512
+    try:
+        from PIL import Image
+
+        width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+        height = width * 3 // 4
+        source = os.path.join(_TEMP_ROOT, "PANO0000.JPG")
+        Image.effect_noise((width // 8, height // 8), 64).convert("RGB").resize((width, height)).save(
+            source, "JPEG", quality=90)
+        paths = [source]
+        for i in range(1, concurrency):
+            paths.append(os.path.join(_TEMP_ROOT, f"PANO{i:04d}.JPG"))
+            shutil.copyfile(source, paths[-1])
+
+        print(f"{concurrency} 个并发请求，每张 {width}x{height}（{width * height / 1e6:.0f} MP），原始分辨率预览")
+        for label, budget in (("不限制解码内存", 0), (f"解码内存预算 {budget_mb} MB", budget_mb)):
+            elapsed, peak_rss, peak_in_flight, waited = run_scenario(paths, budget)
+            print_row(label, elapsed, f"峰值 RSS {peak_rss:.0f} MB，估算解码峰值 {peak_in_flight:.0f} MB，等待 {waited} 次")
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        try:
+            run_child(sys.argv[2:])
+        finally:
+            shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+    else:
+        main()
@@ -0,0 +1,74 @@
+"""
+模拟切换到一张大图后依次请求预览、较大的网格缩略图与适合窗口层级的瓦片，对比不保留解码帧（每种尺寸各自解码原图，旧行为）
+与保留当前图片的解码帧时的总耗时和解码次数。
+
+用法: python scripts/benchmarks/bench_decoded_frames.py [宽] [高] [预览最长边] [缩略图尺寸]
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from bench_utils import time_call, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_decoded_frames_")
+# 在导入 file_manager 之前设置：缓存与索引写入临时目录，不启动后台预生成进程；
+# 关闭预览图、缩略图与瓦片的缓存，每次都需要重新生成
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+os.environ["PREVIEW_MEMORY_CACHE_MB"] = "0"
+os.environ["PREVIEW_CACHE_MAX_MB"] = "0"
+os.environ["THUMBNAIL_MEMORY_CACHE_MB"] = "0"
+os.environ["THUMBNAIL_CACHE_MAX_MB"] = "0"
+os.environ["TILE_CACHE_MAX_MB"] = "0"
+
+import logging
+
+from PIL import Image
+
+from domain.file_manager import file_manager
+
+
+def view_image(file_path, preview_size, thumbnail_size):
+    """切换到 file_path：预览、缩略图，以及不大于预览的最高瓦片层级的全部瓦片。"""
+    file_manager._tile_pyramid.clear()
+    file_manager._decoded_frames.clear()
+    file_manager.get_preview_image(file_path, preview_size, 'webp')
+    file_manager.get_thumbnail(file_path, image_format='webp', size=thumbnail_size)
+    info = file_manager.get_tile_info(file_path)
+    level = info["max_level"]
+    while level > 0 and max(info["width"], info["height"]) >> (info["max_level"] - level) > preview_size:
+        level -= 1
+    tile_count = 0
+    scale = 2 ** (info["max_level"] - level)
+    for y in range(0, -(-info["height"] // scale), info["tile_size"]):
+        for x in range(0, -(-info["width"] // scale), info["tile_size"]):
+            file_manager.get_tile(file_path, level, x // info["tile_size"], y // info["tile_size"], 'webp')
+            tile_count += 1
+    return tile_count
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+    preview_size = int(sys.argv[3]) if len(sys.argv) > 3 else 1920
+    thumbnail_size = int(sys.argv[4]) if len(sys.argv) > 4 else 600
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        file_path = os.path.join(_TEMP_ROOT, "DSC00001.JPG")
+        Image.effect_noise((width // 8, height // 8), 64).convert("RGB").resize((width, height)).save(
+            file_path, "JPEG", quality=90)
+
+        for label, focus in (("不保留解码帧", []), ("保留当前图片的解码帧", [file_path])):
+            file_manager.set_frame_focus(focus)
+            before = file_manager.get_decode_memory_stats()["admitted"]
+            seconds, tile_count = time_call(view_image, file_path, preview_size, thumbnail_size, repeat=3)
+            decodes = (file_manager.get_decode_memory_stats()["admitted"] - before) / 3
+            print_row(label, seconds, f"预览 + {thumbnail_size}px 缩略图 + {tile_count} 个瓦片，每次解码原图 {decodes:.0f} 次")
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+对比冷缓存下生成缩略图的耗时：解码原图（按比例解码，见 bench_reduced_decode.py）与直接使用 EXIF 内嵌缩略图。
+同时给出只读取文件头部（64 KB）与读取整个文件的耗时作为 I/O 参考。
+注意测试文件刚写入、位于页缓存中，实际从磁盘冷读取时 I/O 占比会更高。
+
+用法: python scripts/benchmarks/bench_embedded_thumbnail.py [图片数量] [宽度] [高度]
+"""
+import io
+import os
+import struct
+import sys
+import tempfile
+
+from bench_utils import time_call, print_row
+
+from PIL import Image
+
+from domain.image_decoder import open_image_for_size, open_embedded_thumbnail
+from domain.thumbnail_renderer import render_thumbnail
+
+THUMBNAIL_BOX = (150, 150)
+HEAD_BYTES = 64 * 1024
+
+
+def make_exif_with_thumbnail(thumbnail_jpeg, orientation):
+    """
+    构造带 IFD1 内嵌缩略图的 EXIF（小端 TIFF）：IFD0 只含 Orientation，IFD1 含缩略图的偏移与长度。
+    Pillow 保存 JPEG 时不会写入 IFD1，因此手工拼接。
+    """
+    ifd0_offset = 8
+    ifd1_offset = ifd0_offset + 2 + 12 + 4
+    data_offset = ifd1_offset + 2 + 12 * 2 + 4
+    tiff = b'II*\x00' + struct.pack('<I', ifd0_offset)
+    tiff += struct.pack('<H', 1) + struct.pack('<HHIHH', 0x0112, 3, 1, orientation, 0) + struct.pack('<I', ifd1_offset)
+    tiff += struct.pack('<H', 2)
+    tiff += struct.pack('<HHII', 0x0201, 4, 1, data_offset)
+    tiff += struct.pack('<HHII', 0x0202, 4, 1, len(thumbnail_jpeg))
+    tiff += struct.pack('<I', 0)
+    return b'Exif\x00\x00' + tiff + thumbnail_jpeg
+
+
+def make_test_images(root, count, width, height):
+    """生成 count 张带噪声的 JPEG，内嵌 160 像素宽、宽高比相同的缩略图，一半的 EXIF 方向为 6。"""
+    noise = Image.effect_noise((width // 4, height // 4), 64).resize((width, height))
+    img = Image.merge("RGB", (noise, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT), noise.transpose(Image.Transpose.FLIP_TOP_BOTTOM)))
+    thumbnail_buffer = io.BytesIO()
+    img.resize((160, round(160 * height / width)), Image.Resampling.LANCZOS).save(thumbnail_buffer, "JPEG", quality=85)
+
+    file_paths = []
+    for i in range(count):
+        exif = make_exif_with_thumbnail(thumbnail_buffer.getvalue(), 6 if i % 2 else 1)
+        file_path = os.path.join(root, f"DSC{i:05d}.JPG")
+        img.save(file_path, "JPEG", quality=90, exif=exif)
+        file_paths.append(file_path)
+    return file_paths
+
+
+def run_all(func, file_paths):
+    for file_path in file_paths:
+        func(file_path)
+
+
+def decode_thumbnail(file_path):
+    """原有路径：按比例解码原图后缩放（render_thumbnail 中的填充与编码两种方式相同，不计入）。"""
+    return open_image_for_size(file_path, THUMBNAIL_BOX)
+
+
+def embedded_thumbnail(file_path):
+    return open_embedded_thumbnail(file_path, THUMBNAIL_BOX)
+
+
+def render_thumbnail_default(file_path):
+    return render_thumbnail(file_path, THUMBNAIL_BOX)
+
+
+def read_head(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read(HEAD_BYTES)
+
+
+def read_whole(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 6000
+    height = int(sys.argv[3]) if len(sys.argv) > 3 else 4000
+    with tempfile.TemporaryDirectory() as root:
+        file_paths = make_test_images(root, count, width, height)
+        print(f"{count} 张 {width}x{height} JPEG，平均 {os.path.getsize(file_paths[0]) / 1e6:.1f} MB，内嵌缩略图 160 像素宽")
+
+        assert all(embedded_thumbnail(file_path) is not None for file_path in file_paths)
+        for label, func in (("读取文件头部 64 KB", read_head),
+                            ("读取整个文件", read_whole),
+                            ("按比例解码原图", decode_thumbnail),
+                            ("使用内嵌缩略图", embedded_thumbnail),
+                            ("render_thumbnail（含填充）", render_thumbnail_default)):
+            seconds, _ = time_call(run_all, func, file_paths, repeat=3)
+            print_row(label, seconds, f"每张 {seconds * 1000 / count:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+读取一个拍摄文件夹全部图片的 EXIF 元数据，对比逐张用 Pillow 打开并解析完整 EXIF（旧行为）、
+逐张只读取文件头，以及在后台线程池中分批只读取文件头（MetadataLoader.load_all）的总耗时。
+
+用法: python scripts/benchmarks/bench_exif_reader.py [图片数] [线程数] [每批数量]
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from bench_utils import time_call, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_exif_reader_")
+
+import logging
+
+from PIL import Image, ExifTags
+
+from domain.exif_reader import read_exif_metadata, empty_metadata
+from domain.metadata_loader import MetadataLoader
+
+
+def read_with_pillow(file_path):
+    """旧实现：打开 Pillow 图像对象并解析全部 EXIF 标签。"""
+    metadata = empty_metadata()
+    with Image.open(file_path) as img:
+        exif_data = img._getexif() if hasattr(img, '_getexif') else None
+        if exif_data:
+            exif = {ExifTags.TAGS[k]: v for k, v in exif_data.items() if k in ExifTags.TAGS}
+            for name in ('DateTimeOriginal', 'DateTimeDigitized', 'DateTime'):
+                if name in exif:
+                    metadata['date_taken'] = exif[name]
+                    break
+            metadata['camera_make'] = exif.get('Make')
+            metadata['camera_model'] = exif.get('Model')
+            metadata['lens_model'] = exif.get('LensModel')
+    return metadata
+
+
+def make_photos(count):
+    """生成 count 张带相机 EXIF（IFD0 与 Exif IFD）的 JPEG，返回路径列表。"""
+    exif = Image.Exif()
+    exif[ExifTags.Base.Make] = "Sony"
+    exif[ExifTags.Base.Model] = "ILCE-7M4"
+    exif[ExifTags.Base.DateTime] = "2023:05:06 07:08:09"
+    exif_ifd = exif.get_ifd(ExifTags.IFD.Exif)
+    exif_ifd[ExifTags.Base.DateTimeOriginal] = "2023:05:06 07:08:09"
+    exif_ifd[ExifTags.Base.LensModel] = "FE 24-70mm F2.8 GM II"
+    exif_ifd[ExifTags.Base.ExposureTime] = 1 / 250
+    exif_ifd[ExifTags.Base.FNumber] = 2.8
+    exif_ifd[ExifTags.Base.ISOSpeedRatings] = 400
+    exif_ifd[ExifTags.Base.MakerNote] = bytes(32 * 1024) # 相机厂商数据，实际文件中常有几十 KB
+
+    source = os.path.join(_TEMP_ROOT, "DSC00000.JPG")
+    Image.effect_noise((1200, 800), 64).convert("RGB").save(source, "JPEG", quality=90, exif=exif)
+    paths = [source]
+    for i in range(1, count):
+        paths.append(os.path.join(_TEMP_ROOT, f"DSC{i:05d}.JPG"))
+        shutil.copyfile(source, paths[-1])
+    return paths
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        paths = make_photos(count)
+        assert read_with_pillow(paths[0]) == read_exif_metadata(paths[0])
+
+        seconds, _ = time_call(lambda: [read_with_pillow(path) for path in paths], repeat=3)
+        print_row("逐张用 Pillow 解析 EXIF", seconds, f"{count} 张")
+        seconds, _ = time_call(lambda: [read_exif_metadata(path) for path in paths], repeat=3)
+        print_row("逐张只读取文件头", seconds, f"{count} 张")
+
+        saved_batches = []
+        loader = MetadataLoader(read_exif_metadata, saved_batches.append, workers, batch_size)
+
+        def load_all():
+            saved_batches.clear()
+            return loader.load_all([{'jpg_path': path, 'metadata': None} for path in paths])
+
+        seconds, _ = time_call(load_all, repeat=3)
+        print_row(f"{workers} 个线程分批读取文件头", seconds, f"{count} 张，写入索引 {len(saved_batches)} 次")
+        loader.shutdown()
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+对比旧的 os.listdir + getmtime 排序扫描与新的 os.scandir 单次扫描（不使用文件夹索引，每次都完整扫描），
+以及文件夹未变化时复用索引的重新加载。
+
+用法: python scripts/benchmarks/bench_folder_scan.py [图片数量]
+"""
+import os
+import sys
+import tempfile
+
+from bench_utils import make_session, time_call, count_calls, print_row
+
+from domain.file_manager import file_manager
+
+JPG_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+RAW_EXTENSIONS = ('.arw', '.cr2', '.nef', '.dng')
+
+
+def legacy_find_image_pairs(jpg_folder_path, raw_folder_path):
+    """基线提交中 find_image_pairs 的扫描、配对与排序方式（去掉日志）。"""
+    jpg_files = {}
+    for filename in os.listdir(jpg_folder_path):
+        name, ext = os.path.splitext(filename)
+        if ext.lower() in JPG_EXTENSIONS:
+            jpg_files[name.lower()] = os.path.join(jpg_folder_path, filename)
+    raw_files = {}
+    for filename in os.listdir(raw_folder_path):
+        name, ext = os.path.splitext(filename)
+        if ext.lower() in RAW_EXTENSIONS:
+            raw_files[name.lower()] = os.path.join(raw_folder_path, filename)
+
+    image_pairs = []
+    for base_name_lower in sorted(list(set(jpg_files.keys()).intersection(set(raw_files.keys())))):
+        jpg_path = jpg_files.get(base_name_lower)
+        raw_path = raw_files.get(base_name_lower)
+        if jpg_path and raw_path:
+            image_pairs.append({
+                "base_name": os.path.splitext(os.path.basename(jpg_path))[0],
+                "jpg_path": jpg_path,
+                "raw_path": raw_path,
+            })
+    image_pairs.sort(key=lambda pair: (os.path.getmtime(pair['jpg_path']), os.path.basename(pair['jpg_path'])))
+    return image_pairs
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as root:
+        jpg_folder, raw_folder = make_session(root, count)
+        print(f"图片对数量: {count}")
+
+        with count_calls(os, "stat") as legacy_calls:
+            legacy_time, _ = time_call(legacy_find_image_pairs, jpg_folder, raw_folder, repeat=1)
+        legacy_time, _ = time_call(legacy_find_image_pairs, jpg_folder, raw_folder)
+        print_row("旧实现 (listdir + getmtime)", legacy_time, f"os.stat 调用: {legacy_calls['stat']}")
+
+        with count_calls(os, "stat") as scandir_calls:
+            time_call(file_manager.find_image_pairs, jpg_folder, raw_folder, use_index=False, repeat=1)
+        scandir_time, _ = time_call(file_manager.find_image_pairs, jpg_folder, raw_folder, use_index=False)
+        print_row("新实现 (scandir 单次扫描)", scandir_time, f"os.stat 调用: {scandir_calls['stat']}")
+
+        file_manager.find_image_pairs(jpg_folder, raw_folder)
+        indexed_time, _ = time_call(file_manager.find_image_pairs, jpg_folder, raw_folder)
+        print_row("复用文件夹索引重新加载", indexed_time)
+
+        print(f"加速比 (scandir): {legacy_time / scandir_time:.2f}x")
+        print("注: DirEntry.stat() 不经过 os.stat，不计入上面的调用次数；"
+              "Windows/SMB 上它直接复用目录枚举结果，POSIX 上每个配对的 JPG 仍需一次 fstatat。")
+
+
+if __name__ == '__main__':
+    main()
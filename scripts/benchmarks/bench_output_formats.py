@@ -0,0 +1,66 @@
+"""
+对比缩略图与预览按 JPEG、WebP、AVIF 编码（使用配置的质量与速度参数）时的编码耗时和字节数。
+当前 Pillow 不支持 AVIF 时会报错。
+
+用法: python scripts/benchmarks/bench_output_formats.py [预览最长边] [缩略图数量]
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from bench_utils import time_call, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_output_formats_")
+# 在导入 file_manager 之前设置：缓存与索引写入临时目录，不启动后台预生成进程
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+# 关闭预览图缓存，每次都测量解码与编码
+os.environ["PREVIEW_MEMORY_CACHE_MB"] = "0"
+os.environ["PREVIEW_CACHE_MAX_MB"] = "0"
+
+import logging
+
+from PIL import Image
+
+from domain.file_manager import file_manager
+from domain.image_encoder import DEFAULT_IMAGE_FORMAT
+from domain.thumbnail_renderer import render_thumbnail, encode_thumbnail
+
+
+def make_photo(path, size):
+    """生成带平滑渐变、细节和少量噪点的测试图，比纯噪点更接近照片的压缩特性。"""
+    width, height = size
+    detail = Image.effect_mandelbrot(size, (-0.75, -0.25, -0.5, 0.25), 200)
+    gradient = Image.linear_gradient('L').resize(size)
+    noise = Image.effect_noise(size, 12)
+    Image.merge('RGB', (detail, gradient, Image.blend(gradient, noise, 0.3))).save(path, "JPEG", quality=92)
+
+
+def encode_thumbnails(thumbnails, image_format):
+    return sum(len(encode_thumbnail(img, image_format, file_manager._encode_options)) for img in thumbnails)
+
+
+def main():
+    preview_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1600
+    thumbnail_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        file_path = os.path.join(_TEMP_ROOT, "DSC00001.JPG")
+        make_photo(file_path, (6000, 4000))
+        thumbnail = render_thumbnail(file_path, (150, 150))
+        thumbnails = [thumbnail] * thumbnail_count
+
+        for image_format in ('avif', 'webp', DEFAULT_IMAGE_FORMAT):
+            seconds, total = time_call(encode_thumbnails, thumbnails, image_format, repeat=3)
+            print_row(f"{image_format.upper()} 缩略图 x {thumbnail_count}", seconds, f"共 {total / 1e3:.1f} KB")
+            seconds, data = time_call(file_manager.get_preview_image, file_path, preview_size, image_format, repeat=3)
+            print_row(f"{image_format.upper()} 预览（最长边 {preview_size}）", seconds,
+                      f"{len(data) / 1e3:.1f} KB（含解码与缩放）")
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
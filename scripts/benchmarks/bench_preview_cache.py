@@ -0,0 +1,62 @@
+"""
+模拟在两张图片之间来回切换时获取预览图的耗时：首次生成、磁盘缓存命中（清空内存缓存后）与内存缓存命中。
+
+用法: python scripts/benchmarks/bench_preview_cache.py [预览最长边] [切换次数]
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from bench_utils import time_call, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_preview_cache_")
+# 在导入 file_manager 之前设置：缓存与索引写入临时目录，不启动后台预生成进程
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+
+import logging
+
+from PIL import Image
+
+from domain.file_manager import file_manager
+
+
+def flip(paths, max_size, count):
+    for i in range(count):
+        file_manager.get_preview_image(paths[i % len(paths)], max_size, 'webp')
+
+
+def main():
+    max_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1600
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        paths = []
+        for i in range(2):
+            path = os.path.join(_TEMP_ROOT, f"DSC{i:05d}.JPG")
+            Image.effect_noise((750, 500), 64 + i).convert("RGB").resize((6000, 4000)).save(path, "JPEG", quality=90)
+            paths.append(path)
+
+        seconds, _ = time_call(flip, paths, max_size, len(paths), repeat=1)
+        print_row(f"首次生成（{len(paths)} 张）", seconds)
+
+        def flip_from_disk():
+            for i in range(count):
+                file_manager._preview_memory_cache.clear()
+                file_manager.get_preview_image(paths[i % len(paths)], max_size, 'webp')
+
+        seconds, _ = time_call(flip_from_disk, repeat=3)
+        print_row(f"磁盘缓存命中（切换 {count} 次）", seconds)
+        seconds, _ = time_call(flip, paths, max_size, count, repeat=3)
+        print_row(f"内存缓存命中（切换 {count} 次）", seconds)
+
+        stats = file_manager.get_preview_cache_stats()
+        print(f"内存命中率 {stats['memory']['hit_rate']:.0%}，磁盘命中率 {stats['disk']['hit_rate']:.0%}")
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+对比无需旋转的原图作为全尺寸预览时，解码后重新编码（get_preview_image）与直接发送原文件（get_preview_passthrough_path）的耗时与 Python 堆内存峰值。
+
+用法: python scripts/benchmarks/bench_preview_passthrough.py [宽] [高]
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+from bench_utils import time_call, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_preview_passthrough_")
+# 在导入 file_manager 之前设置：缓存与索引写入临时目录，不启动后台预生成进程
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+# 关闭预览图缓存，每次都测量解码与编码
+os.environ["PREVIEW_MEMORY_CACHE_MB"] = "0"
+os.environ["PREVIEW_CACHE_MAX_MB"] = "0"
+
+import logging
+
+from PIL import Image
+
+from domain.file_manager import file_manager
+
+
+def reencode(file_path):
+    return len(file_manager.get_preview_image(file_path))
+
+
+def passthrough(file_path):
+    # WSGI 服务器按路径发送文件（wsgi.file_wrapper / sendfile），这里按 8 KB 分块读取模拟最坏情况
+    path = file_manager.get_preview_passthrough_path(file_path)
+    total = 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(8192):
+            total += len(chunk)
+    return total
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        file_path = os.path.join(_TEMP_ROOT, "DSC00001.JPG")
+        Image.effect_noise((width // 4, height // 4), 64).convert("RGB").resize((width, height)).save(
+            file_path, "JPEG", quality=90)
+
+        for label, func in (("解码并重新编码", reencode), ("直接发送原文件", passthrough)):
+            seconds, size = time_call(func, file_path, repeat=3)
+            print_row(f"{label}（{width}x{height}）", seconds,
+                      f"{size / 1e6:.1f} MB, Python 堆峰值 {peak_memory(func, file_path) / 1e6:.1f} MB")
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
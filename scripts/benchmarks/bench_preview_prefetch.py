@@ -0,0 +1,79 @@
+"""
+模拟按方向键逐张浏览：每次导航后立即请求当前图片的预览（与预览接口的处理相同），停留一段时间后再前往下一张。
+对比关闭与开启相邻预取时，导航后等待预览的平均耗时与预览已在缓存中的比例。
+
+用法: python scripts/benchmarks/bench_preview_prefetch.py [图片数] [停留毫秒] [预览最长边]
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from bench_utils import make_session, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_preview_prefetch_")
+# 在导入 file_manager 之前设置：缓存与索引写入临时目录，不启动后台预生成进程；预览只使用内存缓存
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+os.environ["PREVIEW_CACHE_MAX_MB"] = "0"
+
+import logging
+
+from PIL import Image
+
+from application.image_selector_app import ImageSelectorApp
+from domain.file_manager import file_manager
+from domain.preview_prefetcher import PreviewPrefetcher
+
+
+def serve_preview(app, max_size):
+    """与 /api/image/preview 相同：记录请求结果后取得预览字节。"""
+    index = app._current_index
+    file_path = app.get_image_file_path(index)
+    file_stat = app.get_image_file_stat(index)
+    cached = file_manager.is_preview_cached(file_path, max_size, 'webp', file_stat)
+    file_manager.record_preview_request(file_path, max_size, 'webp', "hit" if cached else "miss")
+    return file_manager.get_preview_image(file_path, max_size, 'webp', file_stat)
+
+
+def browse(jpg_folder, count, dwell, max_size):
+    app = ImageSelectorApp()
+    app.load_folders(jpg_folder, "")
+    serve_preview(app, max_size)
+    waits = []
+    for _ in range(count - 1):
+        app.next_image()
+        start = time.perf_counter()
+        serve_preview(app, max_size)
+        waits.append(time.perf_counter() - start)
+        time.sleep(dwell)
+    return sum(waits) / len(waits)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    dwell = (int(sys.argv[2]) if len(sys.argv) > 2 else 300) / 1000
+    max_size = int(sys.argv[3]) if len(sys.argv) > 3 else 1920
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        buffer = io.BytesIO()
+        Image.effect_noise((1500, 1000), 64).convert("RGB").resize((6000, 4000)).save(buffer, "JPEG", quality=90)
+        jpg_folder, _ = make_session(_TEMP_ROOT, count, with_raw=False, jpg_bytes=buffer.getvalue())
+
+        for label, workers in (("关闭预取", 0), ("开启预取", 2)):
+            file_manager._preview_memory_cache.clear()
+            file_manager._preview_prefetcher = PreviewPrefetcher(workers)
+            average = browse(jpg_folder, count, dwell, max_size)
+            stats = file_manager.get_preview_prefetch_stats()
+            print_row(f"{label}（停留 {dwell * 1000:.0f} ms）", average,
+                      f"导航 {stats['navigations']} 次，预览命中率 {stats['hit_rate']:.0%}")
+            file_manager.cancel_preview_prefetch()
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+对比按视口请求的预览（最长边对齐到 PREVIEW_SIZES 档位）与原始分辨率预览的生成耗时与字节数。
+
+用法: python scripts/benchmarks/bench_preview_sizing.py [宽] [高]
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from bench_utils import time_call, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_preview_sizing_")
+# 在导入 file_manager 之前设置：缓存与索引写入临时目录，不启动后台预生成进程
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+# 关闭预览图缓存，每次都测量解码与编码
+os.environ["PREVIEW_MEMORY_CACHE_MB"] = "0"
+os.environ["PREVIEW_CACHE_MAX_MB"] = "0"
+
+import logging
+
+from PIL import Image
+
+from domain.file_manager import file_manager
+
+# (预览区域宽, 高, 设备像素比)，None 表示原始分辨率
+VIEWPORTS = ((1280, 720, 1.0), (1920, 1080, 1.0), (1440, 900, 2.0), None)
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        file_path = os.path.join(_TEMP_ROOT, "DSC00001.JPG")
+        Image.effect_noise((width // 4, height // 4), 64).convert("RGB").resize((width, height)).save(
+            file_path, "JPEG", quality=90)
+
+        for viewport in VIEWPORTS:
+            max_size = file_manager.resolve_preview_size(*viewport) if viewport else None
+            label = f"{viewport[0]}x{viewport[1]}@{viewport[2]:g}x" if viewport else "原始分辨率"
+            seconds, data = time_call(file_manager.get_preview_image, file_path, max_size, 'webp', repeat=3)
+            print_row(f"{label} -> 最长边 {max_size or max(width, height)}", seconds, f"{len(data) / 1e3:.1f} KB")
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+模拟按住方向键快速切换：按键间隔 interval 毫秒，每次按键都在新线程中请求下一张图片的预览（与 Flask 多线程处理请求相同）。
+对比每个请求都完整渲染（旧行为）与同一标签页的新请求取代旧请求时：松开按键后最后一张预览的等待时间、
+实际完成的渲染数与每秒处理完的导航请求数（持续切换的吞吐量）。
+
+用法: python scripts/benchmarks/bench_rapid_navigation.py [按键次数] [按键间隔毫秒] [预览最长边]
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from bench_utils import make_session, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_rapid_navigation_")
+# 在导入 file_manager 之前设置：缓存与索引写入临时目录，不启动后台预生成进程；关闭预览图缓存，每张都需要渲染
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+os.environ["PREVIEW_MEMORY_CACHE_MB"] = "0"
+os.environ["PREVIEW_CACHE_MAX_MB"] = "0"
+
+import logging
+
+from PIL import Image
+
+from domain.file_manager import file_manager
+from utils.exceptions import RenderSupersededError
+
+
+def hold_arrow_key(paths, interval, max_size, client_id):
+    """返回 (松开按键后等待最后一张预览的秒数, 完成的渲染数, 被取代的请求数)。"""
+    results = {"rendered": 0, "superseded": 0}
+    lock = threading.Lock()
+    last_ready = {}
+
+    def request_preview(file_path, is_last):
+        is_superseded = file_manager.begin_preview_request(client_id) if client_id else None
+        try:
+            file_manager.get_preview_image(file_path, max_size, 'webp', is_superseded=is_superseded)
+        except RenderSupersededError:
+            with lock:
+                results["superseded"] += 1
+            return
+        with lock:
+            results["rendered"] += 1
+        if is_last:
+            last_ready["time"] = time.perf_counter()
+
+    threads = []
+    for i, file_path in enumerate(paths):
+        thread = threading.Thread(target=request_preview, args=(file_path, i == len(paths) - 1))
+        thread.start()
+        threads.append(thread)
+        if i < len(paths) - 1:
+            time.sleep(interval)
+    released = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return last_ready["time"] - released, results["rendered"], results["superseded"]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    interval = (int(sys.argv[2]) if len(sys.argv) > 2 else 80) / 1000
+    max_size = int(sys.argv[3]) if len(sys.argv) > 3 else 1920
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        buffer = io.BytesIO()
+        Image.effect_noise((1500, 1000), 64).convert("RGB").resize((6000, 4000)).save(buffer, "JPEG", quality=90)
+        jpg_folder, _ = make_session(_TEMP_ROOT, count, with_raw=False, jpg_bytes=buffer.getvalue())
+        paths = sorted(os.path.join(jpg_folder, name) for name in os.listdir(jpg_folder))
+        held = interval * (count - 1)
+
+        for label, client_id in (("每个请求都渲染", None), ("新请求取代旧请求", "bench-tab")):
+            start = time.perf_counter()
+            settle, rendered, superseded = hold_arrow_key(paths, interval, max_size, client_id)
+            total = time.perf_counter() - start
+            print_row(f"{label}：松开后等待最后一张", settle,
+                      f"渲染 {rendered} 张，放弃 {superseded} 个，每秒处理 {len(paths) / total:.1f} 个请求（按住 {held:.1f} 秒）")
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+对比缩略图/预览的两种解码方式的耗时与峰值内存（RSS）：
+旧实现完整解码原图后再用 LANCZOS 缩放；新实现 JPEG 在解码时按 1/2、1/4、1/8 缩小（Image.draft），PNG 完整解码后用 reduce。
+
+每种方式在单独的子进程中运行，峰值 RSS 互不影响（依赖 resource 模块，Windows 上不显示内存）。
+测试图片同样在子进程中生成：Linux 上 ru_maxrss 会继承 exec 之前父进程的峰值，主进程需保持较小的内存占用。
+
+用法: python scripts/benchmarks/bench_reduced_decode.py [JPEG 宽度] [JPEG 高度]
+"""
+import io
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench_utils import time_call, print_row
+
+from PIL import Image, ImageOps
+
+from domain.image_decoder import open_image_for_size, fit_size, PREVIEW_REDUCING_GAP
+from domain.thumbnail_renderer import render_thumbnail
+
+THUMBNAIL_BOX = (150, 150)
+PREVIEW_MAX_SIZE = 1600
+
+
+def legacy_thumbnail(file_path):
+    """基线提交中 get_thumbnail 的解码与缩放方式（不含填充与编码）。"""
+    with Image.open(file_path) as handle:
+        img = ImageOps.exif_transpose(handle)
+    return img.resize(fit_size(img.size, THUMBNAIL_BOX), Image.Resampling.LANCZOS)
+
+
+def reduced_thumbnail(file_path):
+    return render_thumbnail(file_path, THUMBNAIL_BOX)
+
+
+def legacy_preview(file_path):
+    """完整解码后缩放到预览尺寸并编码。"""
+    with Image.open(file_path) as handle:
+        img = ImageOps.exif_transpose(handle)
+    img = img.convert('RGB').resize(fit_size(img.size, (PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE)), Image.Resampling.LANCZOS)
+    img.save(io.BytesIO(), format='JPEG', quality=80)
+
+
+def reduced_preview(file_path):
+    img = open_image_for_size(file_path, (PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE),
+                              reducing_gap=PREVIEW_REDUCING_GAP).convert('RGB')
+    img = img.resize(fit_size(img.size, (PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE)), Image.Resampling.LANCZOS)
+    img.save(io.BytesIO(), format='JPEG', quality=80)
+
+
+VARIANTS = {
+    "legacy_thumbnail": legacy_thumbnail,
+    "reduced_thumbnail": reduced_thumbnail,
+    "legacy_preview": legacy_preview,
+    "reduced_preview": reduced_preview,
+}
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_variant(name, file_path):
+    """子进程入口：执行一种方式并输出 耗时秒数 与 峰值 RSS。"""
+    seconds, _ = time_call(VARIANTS[name], file_path, repeat=3)
+    rss = peak_rss_mb()
+    print(f"{seconds} {rss if rss is not None else -1}")
+
+
+def make_test_images(root, width, height):
+    """生成带噪声的大尺寸 JPEG（EXIF 方向为 6）和 PNG，返回路径列表。"""
+    noise = Image.effect_noise((width // 4, height // 4), 64).resize((width, height))
+    img = Image.merge("RGB", (noise, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT), noise.transpose(Image.Transpose.FLIP_TOP_BOTTOM)))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    jpg_path = os.path.join(root, "large.jpg")
+    img.save(jpg_path, "JPEG", quality=90, exif=exif)
+    png_path = os.path.join(root, "large.png")
+    img.resize((width // 2, height // 2)).save(png_path, "PNG", compress_level=1)
+    return [jpg_path, png_path]
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+    with tempfile.TemporaryDirectory() as root:
+        file_paths = subprocess.run([sys.executable, __file__, "--make", root, str(width), str(height)],
+                                    capture_output=True, text=True, check=True).stdout.split()
+        for file_path in file_paths:
+            with Image.open(file_path) as img:
+                print(f"\n{os.path.basename(file_path)}: {img.size[0]}x{img.size[1]}, {os.path.getsize(file_path) / 1e6:.1f} MB")
+            for name in VARIANTS:
+                output = subprocess.run([sys.executable, __file__, "--variant", name, file_path],
+                                        capture_output=True, text=True, check=True).stdout.split()
+                seconds, rss = float(output[-2]), float(output[-1])
+                print_row(name, seconds, f"峰值 RSS: {rss:.0f} MB" if rss >= 0 else "")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == "--variant":
+        run_variant(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 5 and sys.argv[1] == "--make":
+        print("\n".join(make_test_images(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))))
+    else:
+        main()
@@ -0,0 +1,113 @@
+"""
+在后台预取与一批缩略图未命中同时进行时请求一张预览，对比不做调度（所有工作在各自线程中同时执行，旧行为）
+与按优先级调度时这张预览的等待时间，以及全部工作完成的总耗时。
+
+随后复现优先级反转：后台名额已占满时开始预取一张预览，紧接着交互请求同一张预览；
+交互请求必须立即生成，不能等到后台名额释放（等待时间接近 HOLD_SECONDS 时以非零状态退出）。
+
+用法: python scripts/benchmarks/bench_scheduler.py [后台任务数] [缩略图数] [预览最长边]
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from bench_utils import make_session, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_scheduler_")
+# 在导入 file_manager 之前设置：缓存与索引写入临时目录，不启动后台预生成进程；关闭预览图与缩略图缓存，每次都需要解码
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+os.environ["PREVIEW_MEMORY_CACHE_MB"] = "0"
+os.environ["PREVIEW_CACHE_MAX_MB"] = "0"
+os.environ["THUMBNAIL_MEMORY_CACHE_MB"] = "0"
+os.environ["THUMBNAIL_CACHE_MAX_MB"] = "0"
+
+import logging
+
+from PIL import Image
+
+from domain.file_manager import file_manager
+from domain.work_scheduler import WorkScheduler, BACKGROUND
+
+# 不限制并发的调度器，相当于引入调度之前所有工作直接在请求线程中执行
+UNLIMITED = 1 << 20
+# 复现优先级反转时占住后台名额的秒数
+HOLD_SECONDS = 2.0
+
+
+def run_burst(paths, background_count, thumbnail_count, max_size):
+    """返回 (交互预览的等待秒数, 全部完成的秒数)。"""
+    threads = []
+    start = time.perf_counter()
+    for i in range(background_count):
+        threads.append(threading.Thread(target=file_manager.get_preview_image,
+                                        args=(paths[1 + i], max_size, 'webp'), kwargs={"priority": BACKGROUND}))
+    for i in range(thumbnail_count):
+        threads.append(threading.Thread(target=file_manager.get_thumbnail,
+                                        args=(paths[1 + background_count + i],), kwargs={"image_format": 'webp'}))
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    requested = time.perf_counter()
+    file_manager.get_preview_image(paths[0], max_size, 'webp')
+    interactive = time.perf_counter() - requested
+    for thread in threads:
+        thread.join()
+    return interactive, time.perf_counter() - start
+
+
+def run_inversion(path, max_size):
+    """
+    后台名额被占满（相当于一批预生成任务）时，path 的后台预取在排队；交互请求同一张预览，返回其等待秒数。
+    """
+    scheduler = WorkScheduler([UNLIMITED, 1, 1], 1, UNLIMITED)
+    file_manager._scheduler = scheduler
+    ticket = scheduler.acquire(BACKGROUND, path)
+    release = threading.Timer(HOLD_SECONDS, scheduler.release, args=(ticket,))
+    release.start()
+    prefetch = threading.Thread(target=file_manager.get_preview_image, args=(path, max_size, 'webp'),
+                                kwargs={"priority": BACKGROUND})
+    prefetch.start()
+    time.sleep(0.05)
+    requested = time.perf_counter()
+    file_manager.get_preview_image(path, max_size, 'webp')
+    waited = time.perf_counter() - requested
+    release.join()
+    prefetch.join()
+    return waited
+
+
+def main():
+    background_count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    thumbnail_count = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    max_size = int(sys.argv[3]) if len(sys.argv) > 3 else 1920
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        buffer = io.BytesIO()
+        Image.effect_noise((1500, 1000), 64).convert("RGB").resize((6000, 4000)).save(buffer, "JPEG", quality=90)
+        jpg_folder, _ = make_session(_TEMP_ROOT, 1 + background_count + thumbnail_count, with_raw=False,
+                                     jpg_bytes=buffer.getvalue())
+        paths = sorted(os.path.join(jpg_folder, name) for name in os.listdir(jpg_folder))
+
+        scheduled = file_manager._scheduler
+        for label, scheduler in (("不调度", WorkScheduler([UNLIMITED] * 3, UNLIMITED, UNLIMITED)), ("按优先级调度", scheduled)):
+            file_manager._scheduler = scheduler
+            interactive, total = run_burst(paths, background_count, thumbnail_count, max_size)
+            print_row(f"{label}：交互预览等待", interactive,
+                      f"{background_count} 个后台预取 + {thumbnail_count} 个缩略图，全部完成 {total * 1000:.0f} ms")
+
+        waited = run_inversion(paths[0], max_size)
+        print_row("后台预取排队时请求同一张预览", waited, f"后台名额占用 {HOLD_SECONDS * 1000:.0f} ms")
+        if waited >= HOLD_SECONDS:
+            raise SystemExit("优先级反转：交互请求等到了后台名额释放之后")
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
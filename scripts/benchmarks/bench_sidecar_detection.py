@@ -0,0 +1,79 @@
+"""
+对比 RAW 编辑状态（.xmp/.acr 旁车文件）的两种检测方式：
+旧实现对每个 RAW 调用 os.path.exists（含调试日志共 4 次），新实现在扫描 RAW 文件夹的同一次遍历中收集旁车文件集合后查表。
+同时统计增量刷新（get_sidecar_bases）在目录未变化与新增旁车文件两种情况下的开销。
+
+用法: python scripts/benchmarks/bench_sidecar_detection.py [图片数量]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from bench_utils import make_session, time_call, count_calls, print_row
+
+from domain.file_manager import file_manager
+
+
+def legacy_check_raw_modified_status(raw_file_path):
+    """基线提交中 check_raw_modified_status 的检查方式（调试日志中的两次 exists 也会实际执行）。"""
+    base_name = os.path.splitext(os.path.basename(raw_file_path))[0]
+    raw_dir = os.path.dirname(raw_file_path)
+    acr_path = os.path.join(raw_dir, f"{base_name}.acr")
+    xmp_path = os.path.join(raw_dir, f"{base_name}.xmp")
+    is_modified = os.path.exists(acr_path) or os.path.exists(xmp_path)
+    # 基线的 logger.debug 使用 f-string，即使不输出调试日志也会先求值
+    _log_message = f"ACR 存在={os.path.exists(acr_path)}, XMP 存在={os.path.exists(xmp_path)}"
+    return is_modified
+
+
+def legacy_detect(image_pairs):
+    return [legacy_check_raw_modified_status(pair['raw_path']) for pair in image_pairs]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with tempfile.TemporaryDirectory() as root:
+        jpg_folder, raw_folder = make_session(root, count, sidecar_every=7)
+        print(f"图片对数量: {count}")
+
+        # 新实现：编辑状态在 RAW 扫描中一并确定（不使用持久化索引，保证每次都真实扫描）
+        with count_calls(os, "stat", "scandir") as scan_calls:
+            pairs = file_manager.find_image_pairs(jpg_folder, raw_folder, use_index=False)
+        scan_time, _ = time_call(file_manager.find_image_pairs, jpg_folder, raw_folder, use_index=False)
+        print_row("扫描 + 配对（含编辑状态）", scan_time,
+                  f"os.stat: {scan_calls['stat']}, os.scandir: {scan_calls['scandir']}")
+
+        # 旧实现：在扫描结果之上逐个 RAW 检查旁车文件
+        with count_calls(os, "stat") as legacy_calls:
+            legacy_result = legacy_detect(pairs)
+        legacy_time, _ = time_call(legacy_detect, pairs)
+        print_row("旧实现 额外的逐个 exists 检查", legacy_time, f"os.stat: {legacy_calls['stat']}")
+
+        assert legacy_result == [pair['is_modified'] for pair in pairs], "两种实现的编辑状态不一致"
+
+        # 增量刷新：目录 mtime 未变化时只需一次 stat（需超出目录 mtime 的时间粒度才会信任快照）
+        os.utime(raw_folder, (time.time() - 60, time.time() - 60))
+        file_manager.get_sidecar_bases(raw_folder)
+        with count_calls(os, "stat", "scandir") as unchanged_calls:
+            file_manager.get_sidecar_bases(raw_folder)
+        unchanged_time, _ = time_call(file_manager.get_sidecar_bases, raw_folder)
+        print_row("增量刷新（目录未变化）", unchanged_time,
+                  f"os.stat: {unchanged_calls['stat']}, os.scandir: {unchanged_calls['scandir']}")
+
+        # 模拟在 ACR 中编辑一张照片后新出现的 .xmp
+        with open(os.path.join(raw_folder, "DSC00001.xmp"), "wb"):
+            pass
+        with count_calls(os, "stat", "scandir") as changed_calls:
+            start = time.perf_counter()
+            sidecar_bases, refreshed = file_manager.get_sidecar_bases(raw_folder)
+            changed_time = time.perf_counter() - start
+        assert refreshed and "dsc00001" in sidecar_bases
+        print_row("增量刷新（新增旁车文件）", changed_time,
+                  f"os.stat: {changed_calls['stat']}, os.scandir: {changed_calls['scandir']}")
+
+        print(f"旧实现每对 {legacy_calls['stat'] / count:.1f} 次 stat；新实现每个文件夹 O(1) 次系统调用（不含目录枚举本身）。")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+对比网格加载全部缩略图时逐张请求 /api/image/thumbnail/<index> 与批量请求 /api/image/thumbnails 的请求数和总耗时。
+在本机启动与 app.run 相同的 werkzeug 开发服务器（逐个连接处理请求），缩略图缓存已预热，只比较请求开销。
+
+用法: python scripts/benchmarks/bench_thumbnail_batch.py [图片数量] [每批数量]
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from bench_utils import make_session, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_thumbnail_batch_")
+# 在导入应用之前设置：缓存与索引写入临时目录，不启动后台预生成进程
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+
+import logging
+
+from PIL import Image
+from werkzeug.serving import make_server
+
+from interface.api import app, app_state, THUMBNAIL_RECORD_HEADER
+
+
+def fetch(url):
+    with urllib.request.urlopen(url) as response:
+        return response.read()
+
+
+def load_one_by_one(base_url, count):
+    total_bytes = 0
+    for index in range(count):
+        total_bytes += len(fetch(f"{base_url}/api/image/thumbnail/{index}"))
+    return count, total_bytes
+
+
+def load_batched(base_url, count, batch_size):
+    requests = 0
+    total_bytes = 0
+    for start in range(0, count, batch_size):
+        indices = ",".join(str(index) for index in range(start, min(count, start + batch_size)))
+        body = fetch(f"{base_url}/api/image/thumbnails?indices={indices}")
+        requests += 1
+        offset = 0
+        while offset < len(body):
+            _, length = THUMBNAIL_RECORD_HEADER.unpack_from(body, offset)
+            offset += THUMBNAIL_RECORD_HEADER.size + length
+            total_bytes += length
+    return requests, total_bytes
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    jpg_buffer = io.BytesIO()
+    Image.effect_noise((320, 213), 64).convert("RGB").save(jpg_buffer, "JPEG", quality=85)
+    jpg_folder, _ = make_session(os.path.join(_TEMP_ROOT, "shoot"), count, with_raw=False, jpg_bytes=jpg_buffer.getvalue())
+    app_state.load_folders(jpg_folder, "")
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        start = time.perf_counter()
+        load_batched(base_url, count, batch_size)
+        print_row(f"生成缓存（批量，{count} 张）", time.perf_counter() - start)
+
+        for label, func, args in (("逐张请求", load_one_by_one, (base_url, count)),
+                                  (f"批量请求（每批 {batch_size} 张）", load_batched, (base_url, count, batch_size))):
+            start = time.perf_counter()
+            requests, total_bytes = func(*args)
+            print_row(label, time.perf_counter() - start, f"{requests} 次请求, {total_bytes / 1e6:.1f} MB")
+    finally:
+        server.shutdown()
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
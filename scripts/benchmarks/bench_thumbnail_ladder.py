@@ -0,0 +1,41 @@
+"""
+对比生成较小一级缩略图的两种方式：从原图按比例解码（render_thumbnail）与从已缓存的最大一级缩略图缩小（downscale_thumbnail）。
+
+用法: python scripts/benchmarks/bench_thumbnail_ladder.py [宽] [高]
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from bench_utils import time_call, print_row
+
+from PIL import Image
+
+from domain.thumbnail_renderer import render_thumbnail, downscale_thumbnail, encode_thumbnail
+
+LADDER = (1200, 600, 300, 150)
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+    root = tempfile.mkdtemp(prefix="bench_thumbnail_ladder_")
+    try:
+        file_path = os.path.join(root, "DSC00001.JPG")
+        Image.effect_noise((width // 8, height // 8), 64).convert("RGB").resize((width, height)).save(
+            file_path, "JPEG", quality=90)
+        largest = encode_thumbnail(render_thumbnail(file_path, (LADDER[0], LADDER[0])), 'jpeg', {"quality": 80})
+        print(f"最大一级缓存: {LADDER[0]}px, {len(largest) / 1e3:.1f} KB")
+
+        for size in LADDER[1:]:
+            seconds, _ = time_call(render_thumbnail, file_path, (size, size), repeat=3)
+            print_row(f"{size}px: 从原图 {width}x{height}", seconds)
+            seconds, _ = time_call(downscale_thumbnail, largest, (size, size), repeat=3)
+            print_row(f"{size}px: 从 {LADDER[0]}px 缓存", seconds)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
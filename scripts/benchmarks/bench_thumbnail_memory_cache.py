@@ -0,0 +1,66 @@
+"""
+对比缩略图缓存命中时的开销：只有磁盘缓存（计算 SHA-256 缓存键、查询索引、读取包文件）与内存 LRU 命中。
+模拟在网格中来回滚动：对同一批图片重复获取缩略图。
+
+用法: python scripts/benchmarks/bench_thumbnail_memory_cache.py [图片数量] [轮数]
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+from bench_utils import make_session, time_call, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_thumbnail_memory_cache_")
+# 在导入 file_manager 之前设置：缓存与索引写入临时目录，不启动后台预生成进程
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+
+import logging
+
+from PIL import Image
+
+from domain.byte_lru_cache import ByteLRUCache
+from domain.file_manager import file_manager
+
+
+def scroll(jobs, rounds):
+    for _ in range(rounds):
+        for file_path, file_stat in jobs:
+            file_manager.get_thumbnail(file_path, file_stat)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        jpg_buffer = io.BytesIO()
+        Image.effect_noise((320, 213), 64).convert("RGB").save(jpg_buffer, "JPEG", quality=85)
+        jpg_folder, _ = make_session(os.path.join(_TEMP_ROOT, "shoot"), count, with_raw=False,
+                                     jpg_bytes=jpg_buffer.getvalue())
+        jobs = []
+        for name in sorted(os.listdir(jpg_folder)):
+            file_path = os.path.join(jpg_folder, name)
+            stat = os.stat(file_path)
+            jobs.append((file_path, {"size": stat.st_size, "mtime": stat.st_mtime, "inode": stat.st_ino}))
+
+        memory_cache = file_manager._thumbnail_memory_cache
+        file_manager._thumbnail_memory_cache = ByteLRUCache(0)
+        scroll(jobs, 1) # 生成磁盘缓存
+        seconds, _ = time_call(scroll, jobs, rounds, repeat=3)
+        print_row(f"仅磁盘缓存（{count} 张 x {rounds} 轮）", seconds)
+
+        file_manager._thumbnail_memory_cache = memory_cache
+        seconds, _ = time_call(scroll, jobs, rounds, repeat=3)
+        stats = memory_cache.get_stats()
+        print_row(f"内存 LRU（{count} 张 x {rounds} 轮）", seconds,
+                  f"命中 {stats['hits']}, 未命中 {stats['misses']}, 淘汰 {stats['evictions']}")
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
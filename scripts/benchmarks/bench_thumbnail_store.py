@@ -0,0 +1,80 @@
+"""
+对比旧的每个缩略图一个文件的缓存目录与包文件存储（ThumbnailStore）：写入、列出缓存目录、随机读取命中与清理旧缓存文件的耗时。
+
+用法: python scripts/benchmarks/bench_thumbnail_store.py [缩略图数量]
+"""
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from bench_utils import time_call, print_row
+
+from domain.thumbnail_store import ThumbnailStore
+
+THUMBNAIL_BYTES = 7000
+READ_COUNT = 2000
+
+
+def make_entries(count):
+    payload = b'\xff\xd8' + os.urandom(THUMBNAIL_BYTES - 2)
+    return [(hashlib.sha256(f"/photos/DSC{i:06d}.JPG".encode()).hexdigest(), payload) for i in range(count)]
+
+
+def write_files(directory, entries):
+    for key, data in entries:
+        with open(os.path.join(directory, f"{key}_DSC_thumb.jpeg"), 'wb') as f:
+            f.write(data)
+
+
+def read_files(directory, keys):
+    for key in keys:
+        with open(os.path.join(directory, f"{key}_DSC_thumb.jpeg"), 'rb') as f:
+            f.read()
+
+
+def write_store(store, entries):
+    for key, data in entries:
+        store.put(key, data)
+
+
+def read_store(store, keys):
+    for key in keys:
+        store.get(key)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    entries = make_entries(count)
+    keys = [key for key, _ in random.Random(0).sample(entries, min(READ_COUNT, count))]
+    root = tempfile.mkdtemp(prefix="bench_thumbnail_store_")
+    try:
+        files_dir = os.path.join(root, "files")
+        os.makedirs(files_dir)
+        seconds, _ = time_call(write_files, files_dir, entries, repeat=1)
+        print_row(f"每张一个文件: 写入 {count} 张", seconds, f"{len(os.listdir(files_dir))} 个文件")
+        seconds, _ = time_call(os.listdir, files_dir, repeat=3)
+        print_row("每张一个文件: 列出缓存目录", seconds)
+        seconds, _ = time_call(read_files, files_dir, keys, repeat=3)
+        print_row(f"每张一个文件: 随机读取 {len(keys)} 张", seconds)
+
+        store_dir = os.path.join(root, "store")
+        store = ThumbnailStore(store_dir, 10 * 1024 ** 3)
+        seconds, _ = time_call(write_store, store, entries, repeat=1)
+        print_row(f"包文件: 写入 {count} 张", seconds, f"{len(os.listdir(store_dir))} 个文件")
+        seconds, _ = time_call(os.listdir, store_dir, repeat=3)
+        print_row("包文件: 列出缓存目录", seconds)
+        seconds, _ = time_call(read_store, store, keys, repeat=3)
+        print_row(f"包文件: 随机读取 {len(keys)} 张", seconds)
+        store.close()
+
+        seconds, removed = time_call(ThumbnailStore.remove_legacy_files, files_dir, repeat=1)
+        print_row(f"删除 {removed} 个旧缓存文件", seconds)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+对比放大到 100% 查看大图中央时的两种方式：生成整张原始分辨率预览，与只生成覆盖视口的深度缩放瓦片
+（首次需要解码该层级；之后平移时层级已解码，只需裁剪与编码）。
+
+用法: python scripts/benchmarks/bench_tiles.py [宽] [高] [视口宽] [视口高]
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from bench_utils import time_call, print_row
+
+_TEMP_ROOT = tempfile.mkdtemp(prefix="bench_tiles_")
+# 在导入 file_manager 之前设置：缓存与索引写入临时目录，不启动后台预生成进程
+os.environ["CACHE_DIR_NAME"] = os.path.join(_TEMP_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_TEMP_ROOT, "index.sqlite3")
+os.environ["THUMBNAIL_PREGENERATE_WORKERS"] = "0"
+# 关闭预览图与瓦片的磁盘/内存缓存，每次都测量编码
+os.environ["PREVIEW_MEMORY_CACHE_MB"] = "0"
+os.environ["PREVIEW_CACHE_MAX_MB"] = "0"
+os.environ["TILE_CACHE_MAX_MB"] = "0"
+# 默认参数下原始分辨率层级约 300 MB，放宽内存上限使其能够保留
+os.environ.setdefault("TILE_DECODE_CACHE_MB", "512")
+os.environ.setdefault("DECODE_MEMORY_BUDGET_MB", "2048")
+
+import logging
+
+from PIL import Image
+
+from domain.file_manager import file_manager
+
+
+def viewport_tiles(info, viewport_width, viewport_height):
+    """原始分辨率层级中覆盖图片中央 viewport 区域的瓦片坐标。"""
+    tile_size = info["tile_size"]
+    left = max(0, (info["width"] - viewport_width) // 2)
+    top = max(0, (info["height"] - viewport_height) // 2)
+    right = min(info["width"], left + viewport_width) - 1
+    bottom = min(info["height"], top + viewport_height) - 1
+    return [(x, y) for y in range(top // tile_size, bottom // tile_size + 1)
+            for x in range(left // tile_size, right // tile_size + 1)]
+
+
+def fetch_tiles(file_path, level, tiles):
+    return sum(len(file_manager.get_tile(file_path, level, x, y, 'webp')) for x, y in tiles)
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 7500
+    viewport_width = int(sys.argv[3]) if len(sys.argv) > 3 else 1920
+    viewport_height = int(sys.argv[4]) if len(sys.argv) > 4 else 1080
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        file_path = os.path.join(_TEMP_ROOT, "DSC00001.JPG")
+        Image.effect_noise((width // 4, height // 4), 64).convert("RGB").resize((width, height)).save(
+            file_path, "JPEG", quality=90)
+
+        seconds, data = time_call(file_manager.get_preview_image, file_path, None, 'webp', repeat=1)
+        print_row(f"原始分辨率预览 {width}x{height}", seconds, f"{len(data) / 1e6:.1f} MB")
+
+        info = file_manager.get_tile_info(file_path)
+        tiles = viewport_tiles(info, viewport_width, viewport_height)
+        level = info["max_level"]
+
+        def first_view():
+            file_manager._tile_pyramid.clear()
+            return fetch_tiles(file_path, level, tiles)
+
+        seconds, total = time_call(first_view, repeat=3)
+        print_row(f"{len(tiles)} 个视口瓦片（首次，含解码层级）", seconds, f"{total / 1e6:.1f} MB")
+        seconds, total = time_call(fetch_tiles, file_path, level, tiles, repeat=3)
+        print_row(f"{len(tiles)} 个视口瓦片（层级已解码）", seconds, f"{total / 1e6:.1f} MB")
+    finally:
+        shutil.rmtree(_TEMP_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
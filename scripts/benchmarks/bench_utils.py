@@ -0,0 +1,108 @@
+"""
+基准测试脚本共用的辅助函数：生成模拟拍摄文件夹、计时、统计系统调用次数与峰值内存。
+导入本模块的基准测试在退出时打印进程的峰值 RSS。
+
+导入本模块时把缓存目录与文件夹索引指向临时目录（退出时删除），基准测试之后导入的 file_manager
+不会读写项目中真实的 app_cache 与 folder_index.sqlite3。需要单独目录的基准测试可在导入后再覆盖这两个环境变量。
+"""
+import atexit
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+_DATA_ROOT = tempfile.mkdtemp(prefix="bench_data_")
+os.environ["CACHE_DIR_NAME"] = os.path.join(_DATA_ROOT, "cache")
+os.environ["FOLDER_INDEX_FILE"] = os.path.join(_DATA_ROOT, "index.sqlite3")
+atexit.register(shutil.rmtree, _DATA_ROOT, ignore_errors=True)
+
+
+def make_session(root, count, with_raw=True, sidecar_every=0, jpg_bytes=b"", raw_ext=".ARW"):
+    """
+    在 root 下生成 jpg/ 与 raw/ 两个子目录，各包含 count 个文件。
+    sidecar_every > 0 时，每隔 sidecar_every 个 RAW 生成一个 .xmp 编辑文件。
+    返回 (jpg_folder, raw_folder)，无 RAW 时 raw_folder 为空字符串。
+    """
+    jpg_folder = os.path.join(root, "jpg")
+    raw_folder = os.path.join(root, "raw") if with_raw else ""
+    os.makedirs(jpg_folder, exist_ok=True)
+    if with_raw:
+        os.makedirs(raw_folder, exist_ok=True)
+
+    for i in range(count):
+        base = f"DSC{i:05d}"
+        with open(os.path.join(jpg_folder, f"{base}.JPG"), "wb") as f:
+            f.write(jpg_bytes)
+        if with_raw:
+            with open(os.path.join(raw_folder, f"{base}{raw_ext}"), "wb"):
+                pass
+            if sidecar_every and i % sidecar_every == 0:
+                with open(os.path.join(raw_folder, f"{base}.xmp"), "wb"):
+                    pass
+    return jpg_folder, raw_folder
+
+
+def time_call(func, *args, repeat=5, **kwargs):
+    """重复执行 func，返回 (最短耗时秒数, 最后一次的返回值)。"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+@contextlib.contextmanager
+def count_calls(module, *names):
+    """
+    临时包装 module 上的若干函数，统计调用次数。产出 {函数名: 次数} 字典。
+    用于近似统计 os.stat / os.path.exists 等文件系统调用。
+    """
+    counts = {name: 0 for name in names}
+    originals = {name: getattr(module, name) for name in names}
+
+    def make_wrapper(name, original):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return original(*args, **kwargs)
+        return wrapper
+
+    for name, original in originals.items():
+        setattr(module, name, make_wrapper(name, original))
+    try:
+        yield counts
+    finally:
+        for name, original in originals.items():
+            setattr(module, name, original)
+
+
+def print_row(label, seconds, extra=""):
+    print(f"{label:<40} {seconds * 1000:>10.2f} ms  {extra}")
+
+
+def peak_rss_mb():
+    """本进程迄今为止的峰值常驻内存（MB），平台不支持（Windows）时返回 None。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _print_peak_rss():
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"进程峰值 RSS: {peak:.0f} MB")
+
+
+atexit.register(_print_peak_rss)
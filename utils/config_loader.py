@@ -28,6 +28,64 @@ class Config:
                 "DEFAULT_RAW_FOLDER": os.getenv("DEFAULT_RAW_FOLDER", "").strip(),
                 "CACHE_DIR_NAME": os.getenv("CACHE_DIR_NAME", "app_cache").strip(),
                 "THUMBNAIL_WIDTH": int(os.getenv("THUMBNAIL_WIDTH", "150").strip()),
+                # 缩略图尺寸阶梯（像素，逗号分隔）；较小的一级由已缓存的较大一级缩小得到，前端按显示尺寸与像素密度选择
+                "THUMBNAIL_SIZES": [int(value) for value in os.getenv("THUMBNAIL_SIZES", "150,300,600,1200").split(',') if value.strip()],
+                "FOLDER_INDEX_FILE": os.getenv("FOLDER_INDEX_FILE", "folder_index.sqlite3").strip(),
+                # 后台预生成缩略图的进程数，默认保留一个 CPU 核心给请求处理；0 表示关闭预生成
+                "THUMBNAIL_PREGENERATE_WORKERS": int(os.getenv("THUMBNAIL_PREGENERATE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))).strip()),
+                # 磁盘缩略图缓存（包文件）的大小上限，单位 MB，超出时按最近访问时间淘汰；0 表示关闭
+                "THUMBNAIL_CACHE_MAX_MB": int(os.getenv("THUMBNAIL_CACHE_MAX_MB", "2048").strip()),
+                # 启动时删除旧版本每个缩略图一个文件的缓存（现在不再使用，也无法导入包文件）；默认只在日志中提示数量
+                "THUMBNAIL_LEGACY_CLEANUP": os.getenv("THUMBNAIL_LEGACY_CLEANUP", "false").strip().lower() in ("1", "true", "yes"),
+                # 内存中缩略图缓存（编码后的 JPEG 字节）的大小上限，单位 MB；0 表示关闭
+                "THUMBNAIL_MEMORY_CACHE_MB": int(os.getenv("THUMBNAIL_MEMORY_CACHE_MB", "64").strip()),
+                # 预览图缓存：内存中最近查看的预览图与磁盘（缓存目录下的 previews 子目录）的大小上限，单位 MB；0 表示关闭
+                "PREVIEW_MEMORY_CACHE_MB": int(os.getenv("PREVIEW_MEMORY_CACHE_MB", "128").strip()),
+                "PREVIEW_CACHE_MAX_MB": int(os.getenv("PREVIEW_CACHE_MAX_MB", "1024").strip()),
+                # 按视口请求预览时可用的最长边档位（像素，逗号分隔）：取不小于视口所需像素的最小一档，便于缓存；
+                # 超过最大一档时返回原始分辨率。留空表示总是返回原始分辨率
+                "PREVIEW_SIZES": [int(value) for value in os.getenv("PREVIEW_SIZES", "1280,1920,2560,3840").split(',') if value.strip()],
+                # 读取并解码原图的调度（见 WorkScheduler），按优先级分别限制并发数：
+                # 浏览器等待的预览与瓦片（等待中的预览请求被同一标签页更新的请求取代时直接放弃，不再解码）、
+                # 网格中可见的缩略图、后台预取与预生成；可见缩略图与后台任务合计不超过 DECODE_CAPACITY，
+                # 交互请求不受其限制；STORAGE_DEVICE_CONCURRENCY 为同一存储设备上同时读取的任务数上限（慢速读卡器可调小）
+                "PREVIEW_RENDER_CONCURRENCY": int(os.getenv("PREVIEW_RENDER_CONCURRENCY", str(os.cpu_count() or 1)).strip()),
+                "THUMBNAIL_RENDER_CONCURRENCY": int(os.getenv("THUMBNAIL_RENDER_CONCURRENCY", str(os.cpu_count() or 1)).strip()),
+                "BACKGROUND_RENDER_CONCURRENCY": int(os.getenv("BACKGROUND_RENDER_CONCURRENCY", str(max(1, (os.cpu_count() or 2) - 1))).strip()),
+                "DECODE_CAPACITY": int(os.getenv("DECODE_CAPACITY", str(os.cpu_count() or 1)).strip()),
+                "STORAGE_DEVICE_CONCURRENCY": int(os.getenv("STORAGE_DEVICE_CONCURRENCY", "4").strip()),
+                # 同时进行的解码按文件头估算的内存合计上限（单位 MB，0 表示不限制），超出时等待；
+                # 缩略图在内存紧张时改为只解码到所需尺寸。单张超出上限的图片在没有其它解码时单独解码
+                "DECODE_MEMORY_BUDGET_MB": int(os.getenv("DECODE_MEMORY_BUDGET_MB", "1024").strip()),
+                # 当前图片及其相邻图片保留在内存中的已解码帧上限（单位 MB，0 表示不保留），预览、缩略图与瓦片由同一次解码生成；
+                # 计入 DECODE_MEMORY_BUDGET_MB，最多为其一半
+                "DECODED_FRAME_CACHE_MB": int(os.getenv("DECODED_FRAME_CACHE_MB", "256").strip()),
+                # 加载文件夹后在后台读取 EXIF 元数据的线程数（0 表示只在需要时读取）与每批读取、写入索引的数量
+                "METADATA_WORKERS": int(os.getenv("METADATA_WORKERS", "4").strip()),
+                "METADATA_BATCH_SIZE": int(os.getenv("METADATA_BATCH_SIZE", "64").strip()),
+                # 导航时预取相邻预览图的线程数（0 表示关闭），以及沿浏览方向向前与向后预取的张数
+                "PREVIEW_PREFETCH_WORKERS": int(os.getenv("PREVIEW_PREFETCH_WORKERS", "2").strip()),
+                "PREVIEW_PREFETCH_AHEAD": int(os.getenv("PREVIEW_PREFETCH_AHEAD", "3").strip()),
+                "PREVIEW_PREFETCH_BEHIND": int(os.getenv("PREVIEW_PREFETCH_BEHIND", "1").strip()),
+                # 深度缩放瓦片：边长（像素）、磁盘缓存（缓存目录下的 tiles 子目录）上限与内存中保留的已解码层级的上限，单位 MB；
+                # 已解码层级与 DECODED_FRAME_CACHE_MB 合计计入 DECODE_MEMORY_BUDGET_MB，最多为其一半
+                "TILE_SIZE": int(os.getenv("TILE_SIZE", "512").strip()),
+                "TILE_CACHE_MAX_MB": int(os.getenv("TILE_CACHE_MAX_MB", "1024").strip()),
+                "TILE_DECODE_CACHE_MB": int(os.getenv("TILE_DECODE_CACHE_MB", "256").strip()),
+                # 缩略图与预览可用的输出格式（按优先级），根据浏览器的 Accept 头选择第一个支持的格式，都不支持时使用 JPEG。
+                # 小图上 AVIF 的容器开销明显，缩略图默认只用 WebP；预览默认优先 AVIF
+                "THUMBNAIL_OUTPUT_FORMATS": [value.strip().lower() for value in os.getenv("THUMBNAIL_OUTPUT_FORMATS", "webp").split(',') if value.strip()],
+                "PREVIEW_OUTPUT_FORMATS": [value.strip().lower() for value in os.getenv("PREVIEW_OUTPUT_FORMATS", "avif,webp").split(',') if value.strip()],
+                # 各格式的编码质量（0-100）与编码速度：WEBP_METHOD 为 0（最快）到 6（最慢、最小），AVIF_SPEED 为 0（最慢）到 10（最快）
+                "JPEG_QUALITY": int(os.getenv("JPEG_QUALITY", "80").strip()),
+                "WEBP_QUALITY": int(os.getenv("WEBP_QUALITY", "80").strip()),
+                "WEBP_METHOD": int(os.getenv("WEBP_METHOD", "4").strip()),
+                "AVIF_QUALITY": int(os.getenv("AVIF_QUALITY", "60").strip()),
+                "AVIF_SPEED": int(os.getenv("AVIF_SPEED", "8").strip()),
+                # 原图与缓存文件的发送方式：空（由 WSGI 服务器发送，支持时使用 sendfile）、
+                # "x-sendfile"（Apache / lighttpd）或 "x-accel-redirect"（nginx，需要将 X_ACCEL_REDIRECT_PREFIX 配置为 internal location）
+                "SENDFILE_MODE": os.getenv("SENDFILE_MODE", "").strip().lower(),
+                "X_ACCEL_REDIRECT_PREFIX": os.getenv("X_ACCEL_REDIRECT_PREFIX", "/_sendfile").strip().rstrip('/'),
                 "PHOTOSHOP_PATH": os.getenv("PHOTOSHOP_PATH", "C:\Program Files\Adobe\Adobe Photoshop 2025\Photoshop.exe").strip(),
                 "FLASK_RUN_HOST": os.getenv("FLASK_RUN_HOST", "127.0.0.1").strip(),
                 "FLASK_RUN_PORT": int(os.getenv("FLASK_RUN_PORT", "5000").strip()),
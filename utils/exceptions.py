@@ -18,3 +18,7 @@ class ConfigError(ImageSelectorError):
 
 class ExternalToolError(ImageSelectorError):
      pass
+
+class RenderSupersededError(ImageSelectorError):
+     """同一客户端已有更新的请求，本次渲染在完成前被放弃。"""
+     pass